@@ -1,11 +1,60 @@
 import os
+import sys
 import json
+import pickle
+import sqlite3
+import hashlib
+import inspect
+import functools
+import concurrent.futures
+import multiprocessing
 import math
-import glob
+import array
+import time
+import queue
+import threading
+import bisect
+import fnmatch
+import base64
+import gzip
+import struct
+import zlib
+import types
+import io
+import cProfile
+import pstats
+import contextlib
+import itertools
 import datetime
 import locale # Do formatowania liczb
-from flask import Flask, render_template, abort, url_for, jsonify # Dodano jsonify
-from collections import defaultdict
+import click
+from flask import Flask, Response, render_template, abort, url_for, jsonify, request, g, has_request_context # Dodano jsonify
+from flask import before_render_template, template_rendered
+from flask.cli import AppGroup
+from collections import defaultdict, OrderedDict
+from collections.abc import Mapping, MutableMapping, Sequence
+
+try: import orjson # Opcjonalnie: szybszy parser JSON (pip install orjson)
+except ImportError: orjson = None
+try: import ijson # Opcjonalnie: strumieniowy parser JSON (pip install ijson)
+except ImportError: ijson = None
+try: # Opcjonalnie: powiadomienia systemu plików dla watchera (pip install watchdog)
+    from watchdog import events as watchdog_events, observers as watchdog_observers
+except ImportError: watchdog_events = watchdog_observers = None
+try: from sortedcontainers import SortedList # Opcjonalnie: szybsza aktualizacja rankingów (pip install sortedcontainers)
+except ImportError: SortedList = None
+try: import brotli # Opcjonalnie: kompresja odpowiedzi brotli (pip install brotli)
+except ImportError: brotli = None
+try: import zstandard # Opcjonalnie: lepsza kompresja archiwum rajdów (pip install zstandard)
+except ImportError: zstandard = None
+try: import numpy # Opcjonalnie: wektorowe agregacje analityki (pip install numpy)
+except ImportError: numpy = None
+try: import pyarrow, pyarrow.parquet # Opcjonalnie: eksport rajdów do Parquet (pip install pyarrow)
+except ImportError: pyarrow = None
+try: import fcntl # Blokada pliku współdzielonego cache (Unix)
+except ImportError: fcntl = None
+try: import msvcrt # Blokada pliku współdzielonego cache (Windows)
+except ImportError: msvcrt = None
 
 # Ustawienie polskiego locale dla formatowania liczb (może wymagać instalacji w systemie)
 try:
@@ -30,6 +79,8 @@ TRANSLATE_FOLDER = os.path.join(BASE_DIR, 'translate')
 TRANSLATION_FILENAME = 'pl.json'
 RAID_FILE_PATTERN = 'onEndLocalRaidRequest_request_*.json'
 TRANSLATION_FILE_PATH = os.path.join(TRANSLATE_FOLDER, TRANSLATION_FILENAME)
+RAID_INDEX_PATH = os.path.join(BASE_DIR, 'raid_index.sqlite3') # Trwały indeks przetworzonych rajdów
+RAID_SHARED_CACHE_PATH = os.path.join(BASE_DIR, 'raid_snapshot.pickle') # Dziennik cache dla backendu 'shared' (migawka bazowa + zmiany)
 
 MAP_IMAGES = {
     "Fabryce": "factory.avif",
@@ -45,53 +96,167 @@ MAP_IMAGES = {
     "unknown": "unknown_map.avif"
 }
 
+# --- Metryki (format tekstowy Prometheus, endpoint /metrics) ---
+# Prosty rejestr w procesie: liczniki i histogramy z etykietami. Wystarcza do jednego procesu Flaska;
+# workery parsujące odsyłają swoje przyrosty razem z wynikami (patrz _parse_raid_chunk).
+METRICS_ENABLED = True
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0) # sekundy
+METRICS_HELP = {
+    'statsmods_stage_seconds': ('histogram', "Czas etapów wczytywania rajdów (scan, parse, extract, aggregate, refresh, load_all_raid_data)."),
+    'statsmods_render_seconds': ('histogram', "Czas render_template per trasa i szablon."),
+    'statsmods_cache_requests_total': ('counter', "Odczyty cache danych rajdów (hit/stale/miss)."),
+    'statsmods_cache_rebuilds_total': ('counter', "Przebudowy opublikowanego cache (incremental/full)."),
+    'statsmods_raid_parse_errors_total': ('counter', "Błędy wczytywania/przetwarzania plików rajdów per plik."),
+    'statsmods_raids': ('gauge', "Liczba wczytanych rajdów."),
+    'statsmods_players': ('gauge', "Liczba graczy."),
+    'statsmods_raid_files_with_errors': ('gauge', "Pliki rajdów, których nie udało się przetworzyć."),
+    'statsmods_cache_age_seconds': ('gauge', "Sekundy od ostatniego odświeżenia cache."),
+    'statsmods_shared_snapshot_writes_total': ('counter', "Generacje zapisane do dziennika współdzielonego cache (proces wczytujący)."),
+    'statsmods_shared_snapshot_loads_total': ('counter', "Nowe generacje wczytane z dziennika współdzielonego cache."),
+}
+_metrics = {'counters': defaultdict(float), 'histograms': {}}
+_metrics_lock = threading.Lock()
+
+def inc_metric(name, value=1, **labels):
+    if not METRICS_ENABLED: return
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock: _metrics['counters'][key] += value
+
+def observe_metric(name, seconds, **labels):
+    if not METRICS_ENABLED: return
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        histogram = _metrics['histograms'].get(key)
+        if histogram is None: histogram = _metrics['histograms'][key] = [[0] * (len(METRICS_BUCKETS) + 1), 0.0]
+        histogram[0][bisect.bisect_left(METRICS_BUCKETS, seconds)] += 1; histogram[1] += seconds
+
+@contextlib.contextmanager
+def timed_stage(stage):
+    started = time.perf_counter()
+    try: yield
+    finally: observe_metric('statsmods_stage_seconds', time.perf_counter() - started, stage=stage)
+
+def collect_metrics(reset=False):
+    """Kopia rejestru (do przesłania między procesami); reset=True zeruje go po odczycie."""
+    global _metrics
+    with _metrics_lock:
+        snapshot = {'counters': dict(_metrics['counters']),
+                    'histograms': {key: [list(counts), total] for key, (counts, total) in _metrics['histograms'].items()}}
+        if reset: _metrics = {'counters': defaultdict(float), 'histograms': {}}
+    return snapshot
+
+def merge_metrics(snapshot):
+    with _metrics_lock:
+        for key, value in snapshot['counters'].items(): _metrics['counters'][key] += value
+        for key, (counts, total) in snapshot['histograms'].items():
+            histogram = _metrics['histograms'].setdefault(key, [[0] * (len(METRICS_BUCKETS) + 1), 0.0])
+            histogram[0] = [a + b for a, b in zip(histogram[0], counts)]; histogram[1] += total
+
+def _format_labels(labels):
+    if not labels: return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+def render_metrics(gauges=None):
+    """Rejestr w formacie tekstowym Prometheus (wersja 0.0.4)."""
+    snapshot = collect_metrics()
+    lines_by_name = defaultdict(list)
+    for (name, labels), value in sorted(snapshot['counters'].items()): lines_by_name[name].append(f"{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), (counts, total) in sorted(snapshot['histograms'].items()):
+        cumulative = 0
+        for bound, count in zip(METRICS_BUCKETS + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else f"{bound:g}"
+            lines_by_name[name].append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+        lines_by_name[name].append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+        lines_by_name[name].append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    for name, value in (gauges or {}).items(): lines_by_name[name].append(f"{name} {value:g}")
+    output = []
+    for name, lines in lines_by_name.items():
+        metric_type, help_text = METRICS_HELP.get(name, ('untyped', ''))
+        output += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"] + lines
+    return '\n'.join(output) + '\n'
+
 # --- Wczytywanie Tłumaczeń ---
 translations = {}
+translations_hash = '' # Skrót zawartości pl.json - wchodzi do wersji indeksu rajdów
+translations_mtime_ns = None # Do wykrywania zmian pl.json (hot-reload)
+item_names = {} # Płaska tabela id -> nazwa wyświetlana, budowana raz przy wczytaniu tłumaczeń
+
+# Nazwy dla identyfikatorów, których nie ma w pl.json (role botów, typy obrażeń, części ciała)
+ITEM_NAME_FALLBACKS = {
+    "pmcBEAR": "PMC BEAR", "pmcUSEC": "PMC USEC", "sptBear": "SPT BEAR", "sptUsec": "SPT USEC",
+    "assault": "Szturmowiec (Scav)", "marksman": "Snajper (Scav)", "exUsec": "Renegat",
+    "bossBully": "Reshala", "bossKilla": "Killa", "bossTagilla": "Tagilla", "bossSanitar": "Sanitar",
+    "bossGluhar": "Glukhar", "bossKnight": "Knight", "bossBirdeye": "Birdeye", "bossBigPipe": "Big Pipe",
+    "followerBully": "Strażnik Reshali", "followerKilla": "Strażnik Killi", "followerTagilla": "Strażnik Tagilli",
+    "followerSanitar": "Strażnik Sanitara", "followerGluharAssault": "Strażnik Glukhara (Szturm)",
+    "followerGluharScout": "Strażnik Glukhara (Zwiad)", "followerGluharSecurity": "Strażnik Glukhara (Ochrona)",
+    "followerGluharSnipe": "Strażnik Glukhara (Snajper)", "followerKojaniy": "Shturman", "followerZryachiy": "Zryachiy",
+    "sectantPriest": "Kultysta (Kapłan)", "sectantWarrior": "Kultysta (Wojownik)",
+    "gifter": "Santa Claus",
+    "usec": "USEC", "bear": "BEAR", "savage": "Scav", "Default": "Bot",
+    "Bullet": "Pocisk", "Explosion": "Eksplozja", "Melee": "Broń biała", "Fall": "Upadek",
+    "Structural": "Strukturalne", "HeavyBleeding": "Mocne krwawienie", "LightBleeding": "Lekkie krwawienie",
+    "Poison": "Trucizna", "Stimulator": "Stymulator", "Unknown": "Nieznany", "Undefined": "Niezdefiniowany",
+    "Head": "Głowa", "Chest": "Klatka piersiowa", "Stomach": "Brzuch",
+    "LeftArm": "Lewa ręka", "RightArm": "Prawa ręka",
+    "LeftLeg": "Lewa noga", "RightLeg": "Prawa noga",
+    "Destroyed": "Zniszczona" # Dla efektów
+}
+
+def build_item_name_table(translations_dict):
+    """Spłaszcza tłumaczenia do id -> nazwa w kolejności pierwszeństwa get_item_name:
+    '<id> ShortName' > '<id> Name' > '<id>' > ITEM_NAME_FALLBACKS."""
+    if not translations_dict: return {}
+    table = dict(ITEM_NAME_FALLBACKS)
+    table.update(translations_dict)
+    short_names = []
+    for key, value in translations_dict.items():
+        if key.endswith(' Name'): table[key[:-5]] = value
+        elif key.endswith(' ShortName'): short_names.append((key[:-10], value))
+    table.update(short_names) # ShortName wygrywa z Name, więc nadpisujemy na końcu
+    return table
 
 def load_translations():
-    global translations
-    if not os.path.exists(TRANSLATION_FILE_PATH):
-        print(f"OSTRZEŻENIE: Plik tłumaczeń nie został znaleziony: {TRANSLATION_FILE_PATH}")
-        translations = {}
-        return
+    """Wczytuje pl.json. Przy błędzie (np. plik w trakcie edycji) zostają poprzednie tłumaczenia i wersja indeksu rajdów,
+    więc nieudane przeładowanie nie wymusza przetwarzania wszystkiego od nowa z surowymi identyfikatorami. Zwraca True po wczytaniu."""
+    global translations, translations_hash, translations_mtime_ns, item_names
+    kept = " Pozostają poprzednio wczytane tłumaczenia." if translations else ""
+    try: translations_mtime_ns = os.stat(TRANSLATION_FILE_PATH).st_mtime_ns # Ponowna próba dopiero po kolejnej zmianie pliku
+    except FileNotFoundError:
+        translations_mtime_ns = None
+        print(f"OSTRZEŻENIE: Plik tłumaczeń nie został znaleziony: {TRANSLATION_FILE_PATH}.{kept}")
+        return False
     try:
-        with open(TRANSLATION_FILE_PATH, 'r', encoding='utf-8') as f:
-            translations = json.load(f)
-        print(f"Pomyślnie wczytano tłumaczenia z: {TRANSLATION_FILENAME}")
-    except json.JSONDecodeError as e:
-        print(f"BŁĄD: Nie można sparsować pliku tłumaczeń {TRANSLATION_FILENAME}: {e}")
-        translations = {}
+        with open(TRANSLATION_FILE_PATH, 'rb') as f: raw = f.read()
+        loaded = json.loads(raw.decode('utf-8'))
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        print(f"BŁĄD: Nie można sparsować pliku tłumaczeń {TRANSLATION_FILENAME}: {e}.{kept}")
+        return False
     except Exception as e:
-        print(f"BŁĄD: Nieoczekiwany problem podczas wczytywania tłumaczeń: {e}")
-        translations = {}
+        print(f"BŁĄD: Nieoczekiwany problem podczas wczytywania tłumaczeń: {e}.{kept}")
+        return False
+    translations = loaded; translations_hash = hashlib.sha1(raw).hexdigest()
+    item_names = build_item_name_table(translations)
+    print(f"Pomyślnie wczytano tłumaczenia z: {TRANSLATION_FILENAME}")
+    return True
+
+def reload_translations_if_changed():
+    """Wczytuje pl.json ponownie, jeśli zmienił się od ostatniego wczytania. Zwraca True po przeładowaniu."""
+    try: mtime_ns = os.stat(TRANSLATION_FILE_PATH).st_mtime_ns
+    except FileNotFoundError: mtime_ns = None
+    if mtime_ns == translations_mtime_ns: return False
+    print("Plik tłumaczeń zmienił się - przeładowuję.")
+    return load_translations()
 
 load_translations()
 
 # --- Funkcje Pomocnicze ---
 def get_item_name(item_id):
-    if not translations or not item_id: return str(item_id)
-    short_name_key = f"{item_id} ShortName"; name_key = f"{item_id} Name"; plain_id_key = str(item_id)
-    fallback_keys = {
-        "pmcBEAR": "PMC BEAR", "pmcUSEC": "PMC USEC", "sptBear": "SPT BEAR", "sptUsec": "SPT USEC",
-        "assault": "Szturmowiec (Scav)", "marksman": "Snajper (Scav)", "exUsec": "Renegat",
-        "bossBully": "Reshala", "bossKilla": "Killa", "bossTagilla": "Tagilla", "bossSanitar": "Sanitar",
-        "bossGluhar": "Glukhar", "bossKnight": "Knight", "bossBirdeye": "Birdeye", "bossBigPipe": "Big Pipe",
-        "followerBully": "Strażnik Reshali", "followerKilla": "Strażnik Killi", "followerTagilla": "Strażnik Tagilli",
-        "followerSanitar": "Strażnik Sanitara", "followerGluharAssault": "Strażnik Glukhara (Szturm)",
-        "followerGluharScout": "Strażnik Glukhara (Zwiad)", "followerGluharSecurity": "Strażnik Glukhara (Ochrona)",
-        "followerGluharSnipe": "Strażnik Glukhara (Snajper)", "followerKojaniy": "Shturman", "followerZryachiy": "Zryachiy",
-        "sectantPriest": "Kultysta (Kapłan)", "sectantWarrior": "Kultysta (Wojownik)",
-        "gifter": "Santa Claus",
-        "usec": "USEC", "bear": "BEAR", "savage": "Scav", "Default": "Bot",
-        "Bullet": "Pocisk", "Explosion": "Eksplozja", "Melee": "Broń biała", "Fall": "Upadek",
-        "Structural": "Strukturalne", "HeavyBleeding": "Mocne krwawienie", "LightBleeding": "Lekkie krwawienie",
-        "Poison": "Trucizna", "Stimulator": "Stymulator", "Unknown": "Nieznany", "Undefined": "Niezdefiniowany",
-        "Head": "Głowa", "Chest": "Klatka piersiowa", "Stomach": "Brzuch",
-        "LeftArm": "Lewa ręka", "RightArm": "Prawa ręka",
-        "LeftLeg": "Lewa noga", "RightLeg": "Prawa noga",
-        "Destroyed": "Zniszczona" # Dla efektów
-    }
-    return translations.get(short_name_key, translations.get(name_key, translations.get(plain_id_key, fallback_keys.get(str(item_id), str(item_id)))))
+    if not item_names or not item_id: return str(item_id)
+    plain_id_key = str(item_id)
+    return item_names.get(plain_id_key, plain_id_key)
 
 def format_exp(exp):
     """Formatuje EXP z separatorami."""
@@ -241,12 +406,225 @@ def get_timestamp_from_filename(filename):
             else: return datetime.datetime.min
         except Exception: return datetime.datetime.min
 
+# --- Archiwum starszych plików (segmenty) ---
+# `flask --app app archive pack` przenosi starsze pliki z debug_logs do debug_logs/archive: segment-NNNNNN.dat to dopisywane
+# rekordy [nagłówek | nazwa | skompresowana treść], a segment-NNNNNN.idx to dopisywany indeks przesunięć (JSON lines).
+# Rajd zachowuje w archiwum oryginalną sygnaturę (mtime, rozmiar), więc stan przyrostowy i indeks SQLite nie zauważają
+# przeniesienia, a open_raid_file sięga do archiwum tylko wtedy, gdy pliku nie ma już w folderze.
+RAID_ARCHIVE_DIRNAME = 'archive'
+RAID_ARCHIVE_CODEC = 'auto' # 'auto' (zstd, jeśli zainstalowany, inaczej gzip) | 'zstd' | 'gzip'
+RAID_ARCHIVE_OLDER_THAN_DAYS = 14 # Domyślny wiek (wg czasu w nazwie pliku) plików do spakowania
+RAID_ARCHIVE_SEGMENT_MAX_BYTES = 256 * 1024 * 1024 # Po przekroczeniu zaczynamy nowy segment
+RAID_ARCHIVE_EXTRA_PATTERNS = ('startLocalRaid_request_*.json', 'startLocalRaid_result_*.json') # Pozostałe zrzuty moda
+RAID_ARCHIVE_GZIP_LEVEL = 9
+RAID_ARCHIVE_ZSTD_LEVEL = 10
+RAID_ARCHIVE_MAGIC = b'SMR1'
+RAID_ARCHIVE_HEADER = struct.Struct('>4sBHQqQ') # magic, kodek, długość nazwy, długość treści, mtime_ns, rozmiar oryginału
+RAID_ARCHIVE_CODECS = {'gzip': 0, 'zstd': 1}
+RAID_ARCHIVE_CATALOG_TTL = 5.0 # sekundy; w tym czasie lookup_raid_archive nie skanuje folderu archiwum, jeśli zna plik
+_raid_archive = {'lock': threading.Lock(), 'folder': None, 'indexes': {}, 'entries': {}, 'checked': 0.0}
+
+def raid_archive_folder(folder=None):
+    return os.path.join(folder or DEBUG_LOGS_FOLDER, RAID_ARCHIVE_DIRNAME)
+
+def _read_archive_index(path, position):
+    """Wpisy indeksu segmentu od podanej pozycji. Niedokończona ostatnia linia (trwający zapis) zostaje na później."""
+    with open(path, 'rb') as f: f.seek(position); data = f.read()
+    end = data.rfind(b'\n') + 1
+    return [json.loads(line) for line in data[:end].splitlines() if line.strip()], position + end
+
+def _refresh_raid_archive_catalog(archive_folder):
+    """Doczytuje przyrost indeksów segmentów (wywoływać pod _raid_archive['lock']). Indeksy są tylko dopisywane, więc
+    czytamy jedynie nowe linie (późniejszy wpis tej samej nazwy wygrywa). Katalog zmienia się przez podmianę słownika,
+    więc katalog zwrócony wcześniej można czytać bez blokady."""
+    if _raid_archive['folder'] != archive_folder: _raid_archive.update(folder=archive_folder, indexes={}, entries={})
+    stats = {}
+    try:
+        with os.scandir(archive_folder) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if not entry.name.endswith('.idx'): continue
+                try: stats[entry.name] = entry.stat()
+                except FileNotFoundError: continue
+    except FileNotFoundError: pass
+    indexes = _raid_archive['indexes']
+    # Indeks usunięty lub podmieniony (np. ręczne sprzątanie archiwum) - wczytujemy wszystko od nowa
+    if any(name not in stats or stats[name].st_ino != inode or stats[name].st_size < position for name, (inode, position) in indexes.items()):
+        indexes.clear(); _raid_archive['entries'] = {}
+    catalog = None
+    for name, stat in stats.items():
+        inode, position = indexes.get(name, (stat.st_ino, 0))
+        if stat.st_size == position: continue
+        if catalog is None: catalog = dict(_raid_archive['entries'])
+        segment_path = os.path.join(archive_folder, name[:-len('.idx')] + '.dat')
+        records, position = _read_archive_index(os.path.join(archive_folder, name), position)
+        for record in records: catalog[record['filename']] = (segment_path, record['offset'], record['length'], record['mtime_ns'], record['size'])
+        indexes[name] = (stat.st_ino, position)
+    if catalog is not None: _raid_archive['entries'] = catalog
+    _raid_archive['checked'] = time.monotonic()
+
+def load_raid_archive_catalog(folder=None):
+    """Zwraca {nazwa_pliku: (segment, przesunięcie, długość rekordu, mtime_ns, rozmiar)} - aktualny katalog tylko do odczytu."""
+    with _raid_archive['lock']:
+        _refresh_raid_archive_catalog(raid_archive_folder(folder))
+        return types.MappingProxyType(_raid_archive['entries'])
+
+def lookup_raid_archive(filename, folder=None):
+    """Wpis katalogu dla jednego pliku (albo None). Folder archiwum jest skanowany najwyżej co RAID_ARCHIVE_CATALOG_TTL
+    albo przy nieznanej nazwie, więc otwieranie kolejnych spakowanych plików nie kosztuje skanu na plik."""
+    archive_folder = raid_archive_folder(folder)
+    with _raid_archive['lock']:
+        fresh = _raid_archive['folder'] == archive_folder and time.monotonic() - _raid_archive['checked'] < RAID_ARCHIVE_CATALOG_TTL
+        entry = _raid_archive['entries'].get(filename) if fresh else None
+        if entry is None:
+            _refresh_raid_archive_catalog(archive_folder)
+            entry = _raid_archive['entries'].get(filename)
+        return entry
+
+def _compress_archive_payload(raw, codec):
+    if codec == 'zstd': return zstandard.ZstdCompressor(level=RAID_ARCHIVE_ZSTD_LEVEL).compress(raw)
+    return gzip.compress(raw, compresslevel=RAID_ARCHIVE_GZIP_LEVEL, mtime=0)
+
+def _decompress_archive_payload(payload, codec_id):
+    if codec_id == RAID_ARCHIVE_CODECS['zstd']:
+        if zstandard is None: raise ValueError("Rekord archiwum jest skompresowany zstd, a moduł zstandard nie jest zainstalowany.")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if codec_id == RAID_ARCHIVE_CODECS['gzip']: return gzip.decompress(payload)
+    raise ValueError(f"Nieznany kodek rekordu archiwum: {codec_id}")
+
+def read_archived_raid(entry, filename=None):
+    """Treść pliku z rekordu archiwum. Nagłówek jest sprawdzany, więc błędny wpis indeksu nie zwróci cudzych danych."""
+    segment_path, offset, length, _, size = entry
+    with open(segment_path, 'rb') as f: f.seek(offset); record = f.read(length)
+    if len(record) < RAID_ARCHIVE_HEADER.size: raise ValueError(f"Ucięty rekord archiwum: {os.path.basename(segment_path)}@{offset}")
+    magic, codec_id, name_length, payload_length, _, raw_size = RAID_ARCHIVE_HEADER.unpack_from(record)
+    name_end = RAID_ARCHIVE_HEADER.size + name_length
+    if magic != RAID_ARCHIVE_MAGIC or name_end + payload_length != len(record) or raw_size != size:
+        raise ValueError(f"Uszkodzony rekord archiwum: {os.path.basename(segment_path)}@{offset}")
+    if filename is not None and record[RAID_ARCHIVE_HEADER.size:name_end].decode('utf-8') != filename:
+        raise ValueError(f"Rekord archiwum {os.path.basename(segment_path)}@{offset} należy do innego pliku")
+    raw = _decompress_archive_payload(record[name_end:], codec_id)
+    if len(raw) != raw_size: raise ValueError(f"Niezgodny rozmiar po dekompresji: {os.path.basename(segment_path)}@{offset}")
+    return raw
+
+def open_raid_file(filepath):
+    """Otwiera plik rajdu binarnie - z folderu albo, jeśli został spakowany, z archiwum (jako BytesIO)."""
+    try: return open(filepath, 'rb')
+    except FileNotFoundError:
+        filename = os.path.basename(filepath)
+        entry = lookup_raid_archive(filename, os.path.dirname(filepath))
+        if entry is None: raise
+        return io.BytesIO(read_archived_raid(entry, filename))
+
+def _archive_segment_paths(archive_folder, number):
+    base = os.path.join(archive_folder, f"segment-{number:06d}")
+    return base + '.dat', base + '.idx'
+
+def _commit_archive_batch(data_file, index_path, pending, folder):
+    """Utrwala rekordy (fsync), potem ich wpisy indeksu, i dopiero wtedy usuwa oryginały z folderu."""
+    data_file.flush(); os.fsync(data_file.fileno())
+    with open(index_path, 'ab') as index_file:
+        index_file.write(b''.join(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n' for record in pending))
+        index_file.flush(); os.fsync(index_file.fileno())
+    for record in pending:
+        try: os.remove(os.path.join(folder, record['filename']))
+        except FileNotFoundError: pass
+    pending.clear()
+
+def pack_raid_archive(filenames, codec=None, folder=None):
+    """Przenosi pliki do archiwum. Zwraca (liczba plików, bajty przed, bajty po). Każdy rekord jest przed zapisem
+    sprawdzany dekompresją, a oryginał znika dopiero po utrwaleniu segmentu i indeksu."""
+    folder = folder or DEBUG_LOGS_FOLDER; archive_folder = raid_archive_folder(folder)
+    codec = codec or RAID_ARCHIVE_CODEC
+    if codec == 'auto': codec = 'zstd' if zstandard else 'gzip'
+    if codec == 'zstd' and zstandard is None: raise ValueError("Kodek zstd wymaga modułu zstandard (pip install zstandard).")
+    os.makedirs(archive_folder, exist_ok=True)
+    with open(os.path.join(archive_folder, '.lock'), 'a+b') as lock_file:
+        if not _try_lock_file(lock_file): raise RuntimeError("Archiwum jest właśnie pakowane przez inny proces.")
+        catalog = load_raid_archive_catalog(folder)
+        numbers = [int(name[len('segment-'):-len('.dat')]) for name in os.listdir(archive_folder) if fnmatch.fnmatch(name, 'segment-*.dat')]
+        number = max(numbers, default=1)
+        data_path, index_path = _archive_segment_paths(archive_folder, number)
+        packed_count = raw_total = packed_total = 0; pending = []; already_archived = []
+        data_file = open(data_path, 'ab')
+        try:
+            for filename in filenames:
+                filepath = os.path.join(folder, filename)
+                try:
+                    stat = os.stat(filepath)
+                    with open(filepath, 'rb') as f: raw = f.read()
+                except FileNotFoundError: continue
+                archived = catalog.get(filename)
+                if archived and archived[3:] == (stat.st_mtime_ns, stat.st_size) and read_archived_raid(archived, filename) == raw:
+                    already_archived.append(filepath) # Przerwane wcześniejsze pakowanie - wystarczy usunąć oryginał
+                    continue
+                payload = _compress_archive_payload(raw, codec)
+                if _decompress_archive_payload(payload, RAID_ARCHIVE_CODECS[codec]) != raw: raise ValueError(f"Weryfikacja kompresji {filename} nie powiodła się.")
+                name = filename.encode('utf-8')
+                record = RAID_ARCHIVE_HEADER.pack(RAID_ARCHIVE_MAGIC, RAID_ARCHIVE_CODECS[codec], len(name), len(payload), stat.st_mtime_ns, stat.st_size) + name + payload
+                data_file.seek(0, os.SEEK_END)
+                if data_file.tell() and data_file.tell() + len(record) > RAID_ARCHIVE_SEGMENT_MAX_BYTES:
+                    _commit_archive_batch(data_file, index_path, pending, folder); data_file.close()
+                    number += 1; data_path, index_path = _archive_segment_paths(archive_folder, number)
+                    data_file = open(data_path, 'ab')
+                offset = data_file.tell(); data_file.write(record)
+                pending.append({'filename': filename, 'offset': offset, 'length': len(record), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'codec': codec})
+                packed_count += 1; raw_total += len(raw); packed_total += len(record)
+            _commit_archive_batch(data_file, index_path, pending, folder)
+            for filepath in already_archived: os.remove(filepath)
+        finally: data_file.close()
+    return packed_count, raw_total, packed_total
+
+# --- Wczytywanie JSON rajdu ---
+# 'auto' = orjson, jeśli jest zainstalowany, potem selektywny ijson, na końcu stdlib json.
+# 'selective' wczytuje tylko poddrzewa używane przez process_single_raid_file (mniejsze zużycie pamięci).
+RAID_JSON_PARSER = 'auto'
+# Klucze results.profile potrzebne do ekstrakcji - reszta (Quests, Encyclopedia, Inventory...) jest pomijana
+RAID_PROFILE_KEYS = frozenset(('_id', 'aid', 'karmaValue', 'Info', 'Stats', 'Health', 'Skills'))
+RAID_JSON_DECODE_ERRORS = (json.JSONDecodeError,) + ((ijson.JSONError,) if ijson else ())
+
+def _load_raid_json_selective(f):
+    """Buduje tylko potrzebne poddrzewa na podstawie zdarzeń ijson, pomijając resztę dokumentu."""
+    root = {}
+    containers = {'': root} # Ścieżki, w które schodzimy zamiast budować całą wartość
+    builder = None; depth = 0; target = None; target_key = None
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if event in ('start_map', 'start_array'): depth += 1
+            elif event in ('end_map', 'end_array'): depth -= 1
+            if depth == 0: target[target_key] = builder.value; builder = None
+            continue
+        if event != 'map_key' or prefix not in containers: continue
+        if (prefix, value) in (('', 'results'), ('results', 'profile')):
+            containers[f"{prefix}.{value}" if prefix else value] = containers[prefix][value] = {}
+        elif prefix != 'results.profile' or value in RAID_PROFILE_KEYS:
+            builder = ijson.ObjectBuilder(); target = containers[prefix]; target_key = value
+    return root
+
+def load_raid_json(filepath, parser=None):
+    parser = parser or RAID_JSON_PARSER
+    if parser == 'auto': parser = 'orjson' if orjson else ('selective' if ijson else 'json')
+    if parser == 'orjson' and orjson:
+        with open_raid_file(filepath) as f: raw = f.read()
+        try: return orjson.loads(raw)
+        except orjson.JSONDecodeError: return json.loads(raw.decode('utf-8')) # np. NaN lub duże liczby - stdlib da ten sam wynik/błąd co dotąd
+    if parser == 'selective' and ijson:
+        with open_raid_file(filepath) as f: return _load_raid_json_selective(f)
+    with open_raid_file(filepath) as f: return json.load(io.TextIOWrapper(f, encoding='utf-8'))
+
+def _raid_file_failed(filepath, error_message):
+    inc_metric('statsmods_raid_parse_errors_total', filename=os.path.basename(filepath))
+    return None, error_message
+
 def process_single_raid_file(filepath):
+    started = time.perf_counter()
     try:
-        with open(filepath, 'r', encoding='utf-8') as f: data = json.load(f)
-    except FileNotFoundError: return None, f"Plik nie znaleziony: {os.path.basename(filepath)}"
-    except json.JSONDecodeError as e: return None, f"Błąd parsowania JSON w pliku {os.path.basename(filepath)}: {e}"
-    except Exception as e: return None, f"Nieoczekiwany błąd wczytywania pliku {os.path.basename(filepath)}: {e}"
+        data = load_raid_json(filepath)
+    except FileNotFoundError: return _raid_file_failed(filepath, f"Plik nie znaleziony: {os.path.basename(filepath)}")
+    except RAID_JSON_DECODE_ERRORS as e: return _raid_file_failed(filepath, f"Błąd parsowania JSON w pliku {os.path.basename(filepath)}: {e}")
+    except Exception as e: return _raid_file_failed(filepath, f"Nieoczekiwany błąd wczytywania pliku {os.path.basename(filepath)}: {e}")
+    parsed = time.perf_counter()
+    observe_metric('statsmods_stage_seconds', parsed - started, stage='parse')
 
     processed_data = {}
     error_message = None
@@ -342,81 +720,1747 @@ def process_single_raid_file(filepath):
 
     except ValueError as e: error_message = f"Błąd przetwarzania danych w pliku {os.path.basename(filepath)}: {e}"; print(f"BŁĄD: {error_message}")
     except Exception as e: error_message = f"Nieoczekiwany błąd przetwarzania danych raportu {os.path.basename(filepath)}: {e}"; print(f"BŁĄD: {error_message}"); import traceback; traceback.print_exc()
-    return processed_data if not error_message else None, error_message
+    observe_metric('statsmods_stage_seconds', time.perf_counter() - parsed, stage='extract')
+    if error_message: return _raid_file_failed(filepath, error_message)
+    return processed_data, error_message
 
-def load_all_raid_data():
-    all_processed_raids = []
-    players_summary = defaultdict(lambda: {
-        'raid_ids': [], 'latest_timestamp': datetime.datetime.min, 'latest_level': None, 'latest_side': None,
+# --- Dwupoziomowa reprezentacja rajdu ---
+# W pamięci trzymamy dla każdego rajdu tylko zwarte podsumowanie (RaidSummary, __slots__) z polami pokazywanymi w widokach.
+# Pełne dane (ofiary, przedmioty, umiejętności, zdrowie) są wczytywane na żądanie przez get_raid_details().
+# Agregaty liczone z pełnych danych (kolumny analityki, szeregi czasowe) dostają przy wczytywaniu osobne wejścia
+# (extract_aggregate_inputs), które nie zostają w pamięci - przy usuwaniu rajdu czytamy je ponownie z indeksu.
+RAID_SUMMARY_SLOTS = (
+    'filename', 'timestamp', 'timestamp_formatted', 'raid_result', 'exit_name', 'location_id', 'location',
+    'nickname', 'level', 'side', 'total_experience', 'play_time_seconds', 'play_time_formatted',
+    'total_session_exp_calculated', 'kills_count', 'headshots', 'longest_kill_distance', 'overall_stats')
+
+class RaidSummary:
+    """Zwarte podsumowanie rajdu. Obsługuje .get() i [] jak słownik, więc szablony i trasy nie muszą znać różnicy."""
+    __slots__ = RAID_SUMMARY_SLOTS
+
+    def __init__(self, values):
+        for name, value in zip(RAID_SUMMARY_SLOTS, values): setattr(self, name, value)
+
+    @classmethod
+    def from_raid_data(cls, raid_data):
+        victims = raid_data.get('victims', [])
+        distances = [victim.get('Distance') for victim in victims if isinstance(victim.get('Distance'), (int, float))]
+        derived = {'headshots': sum(1 for victim in victims if victim.get('BodyPart') == 'Head'),
+                   'longest_kill_distance': max(distances, default=0)}
+        return cls([derived[name] if name in derived else raid_data.get(name) for name in RAID_SUMMARY_SLOTS])
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in RAID_SUMMARY_SLOTS else default
+
+    def __getitem__(self, key):
+        if key not in RAID_SUMMARY_SLOTS: raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in RAID_SUMMARY_SLOTS
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in RAID_SUMMARY_SLOTS)
+
+    def __setstate__(self, state):
+        for name, value in zip(RAID_SUMMARY_SLOTS, state): setattr(self, name, value)
+
+    def __eq__(self, other):
+        return isinstance(other, RaidSummary) and self.__getstate__() == other.__getstate__()
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in RAID_SUMMARY_SLOTS}
+
+def extract_aggregate_inputs(raid_data):
+    """Z pełnych danych rajdu: ((ofiary, przedmioty, część ciała przy śmierci) - wejście RaidColumns,
+    (zadane obrażenia, zdobyte punkty umiejętności) - wejście RaidTimeseries). Zwykła krotka, jak podsumowanie w indeksie."""
+    victims = raid_data.get('victims', [])
+    return ((tuple((victim.get('Distance') if isinstance(victim.get('Distance'), (int, float)) else None,
+                    victim.get('WeaponName'), victim.get('BodyPart'), victim.get('RoleTranslated')) for victim in victims),
+             tuple((item.get('name'), item.get('count', 1)) for item in raid_data.get('found_in_raid_items', [])),
+             (raid_data.get('killer_info') or {}).get('killed_by_part_raw')),
+            ((raid_data.get('session_stats') or {}).get('damage_dealt', 0),
+             round(sum(skill.get('PointsEarnedDuringSession') or 0 for skill in raid_data.get('skills_changed', [])), 2)))
+
+# Poza procesem (indeks SQLite, wyniki workerów) podsumowanie jest krotką wartości slotów, a nie obiektem: pickle klasy
+# zapisuje nazwę modułu, a pod `python app.py` jest nim __main__, którego nie znajdzie gunicorn, flask --app app ani asgi.py.
+def dump_raid_summary(summary):
+    return pickle.dumps(summary.__getstate__(), protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_raid_summary(blob):
+    return RaidSummary(pickle.loads(blob)) if blob is not None else None
+
+def load_aggregate_inputs(blob):
+    return pickle.loads(blob) if blob is not None else None
+
+# --- Trwały indeks przetworzonych rajdów (SQLite) ---
+# Wynik process_single_raid_file jest zapisywany na dysku, więc restart procesu (i każdy worker)
+# wczytuje gotowe dane zamiast parsować od nowa cały folder debug_logs.
+RAID_INDEX_ENABLED = True
+RAID_INDEX_FORMAT_VERSION = 4 # Podbić przy zmianie schematu tabeli (2: kolumna summary, 3: summary jako krotka wartości slotów, 4: kolumna inputs)
+RAID_INDEX_CODE_FUNCTIONS = (
+    build_item_name_table, get_item_name, format_time, format_distance, format_timestamp, process_item_list, extract_session_stats,
+    extract_overall_stats, extract_changed_skills, get_timestamp_from_filename, process_single_raid_file, RaidSummary, extract_aggregate_inputs)
+_raid_index_versions = {} # translations_hash -> wersja (kod się w trakcie działania nie zmienia)
+
+def compute_raid_index_version():
+    """Wersja indeksu: format + kod ekstrakcji + zawartość pl.json i ITEM_NAME_FALLBACKS. Zmiana któregokolwiek unieważnia wpisy."""
+    if translations_hash in _raid_index_versions: return _raid_index_versions[translations_hash]
+    digest = hashlib.sha1(f"v{RAID_INDEX_FORMAT_VERSION}:{translations_hash}".encode('utf-8'))
+    digest.update(repr(sorted(ITEM_NAME_FALLBACKS.items())).encode('utf-8')) # Stała modułu - nie ma jej w źródle żadnej funkcji
+    for function in RAID_INDEX_CODE_FUNCTIONS:
+        try: digest.update(inspect.getsource(function).encode('utf-8'))
+        except (OSError, TypeError): digest.update(function.__qualname__.encode('utf-8'))
+    _raid_index_versions[translations_hash] = digest.hexdigest()
+    return _raid_index_versions[translations_hash]
+
+def hash_raid_file(filepath):
+    digest = hashlib.sha1()
+    with open_raid_file(filepath) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''): digest.update(chunk)
+    return digest.hexdigest()
+
+def open_raid_index(path=None):
+    """Otwiera indeks; przy niezgodnej wersji zakłada tabelę rajdów od nowa."""
+    conn = sqlite3.connect(path or RAID_INDEX_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    version = compute_raid_index_version()
+    row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    if not row or row[0] != version:
+        if row: print("Indeks rajdów nieaktualny (zmiana kodu lub tłumaczeń) - zostanie przebudowany.")
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS raids")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version,))
+    conn.execute("CREATE TABLE IF NOT EXISTS raids (filename TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, content_hash TEXT, error TEXT, summary BLOB, inputs BLOB, data BLOB)")
+    return conn
+
+def _open_raid_index_safe():
+    if not RAID_INDEX_ENABLED: return None
+    try: return open_raid_index()
+    except sqlite3.Error as e:
+        print(f"OSTRZEŻENIE: Nie można otworzyć indeksu rajdów {RAID_INDEX_PATH}: {e}. Pracuję bez indeksu.")
+        return None
+
+def lookup_raid_index(conn, filename, signature):
+    """Szuka pliku w indeksie (najpierw po sygnaturze, potem po skrócie treści).
+    Zwraca ((podsumowanie, błąd, wejścia agregatów) lub None przy braku trafienia, skrót treści lub None)."""
+    if conn is None: return None, None
+    mtime_ns, size = signature
+    try:
+        row = conn.execute("SELECT mtime_ns, size, content_hash, error, summary, inputs FROM raids WHERE filename = ?", (filename,)).fetchone()
+        if row and (row[0], row[1]) == (mtime_ns, size):
+            return (load_raid_summary(row[4]), row[3], load_aggregate_inputs(row[5])), row[2]
+        content_hash = hash_raid_file(os.path.join(DEBUG_LOGS_FOLDER, filename))
+        if row and row[2] == content_hash:
+            conn.execute("UPDATE raids SET mtime_ns = ?, size = ? WHERE filename = ?", (mtime_ns, size, filename))
+            return (load_raid_summary(row[4]), row[3], load_aggregate_inputs(row[5])), content_hash
+        return None, content_hash
+    except FileNotFoundError: return (None, f"Plik nie znaleziony: {filename}", None), None
+    except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+        # AttributeError/ImportError: wpis z obiektem klasy z innego modułu (stary format) - traktujemy jak brak trafienia
+        print(f"OSTRZEŻENIE: Błąd odczytu indeksu dla {filename}: {e}")
+        return None, None
+
+def store_raid_index(conn, filename, signature, content_hash, error, summary_blob, inputs_blob, data_blob):
+    if conn is None: return
+    try:
+        if content_hash is None: content_hash = hash_raid_file(os.path.join(DEBUG_LOGS_FOLDER, filename))
+        conn.execute("INSERT OR REPLACE INTO raids (filename, mtime_ns, size, content_hash, error, summary, inputs, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     (filename, signature[0], signature[1], content_hash, error, summary_blob, inputs_blob, data_blob))
+    except (sqlite3.Error, OSError) as e: print(f"OSTRZEŻENIE: Nie można zapisać {filename} w indeksie: {e}")
+
+RAID_INPUTS_BATCH_SIZE = 500 # Plików na jedno zapytanie (limit parametrów SQLite)
+
+def load_raid_inputs(conn, signatures):
+    """Wejścia agregatów (extract_aggregate_inputs) plików w podanych wersjach (filename -> sygnatura), np. rajdów
+    usuwanych ze stanu: z indeksu, a czego w nim nie ma - z pliku, jeśli nadal ma tę sygnaturę. Bez indeksu wejść
+    zmienionego lub usuniętego pliku nie da się już odczytać - wtedy None (szeregi czasowe nie odejmą jego obrażeń)."""
+    inputs = {}; filenames = list(signatures)
+    if conn is not None:
+        try:
+            for start in range(0, len(filenames), RAID_INPUTS_BATCH_SIZE):
+                batch = filenames[start:start + RAID_INPUTS_BATCH_SIZE]
+                for filename, mtime_ns, size, blob in conn.execute(f"SELECT filename, mtime_ns, size, inputs FROM raids WHERE filename IN ({','.join('?' * len(batch))})", batch):
+                    if blob is not None and signatures[filename] == (mtime_ns, size): inputs[filename] = load_aggregate_inputs(blob)
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError) as e: print(f"OSTRZEŻENIE: Błąd odczytu wejść agregatów z indeksu: {e}")
+    missing = [filename for filename in filenames if filename not in inputs]
+    current_files = stat_raid_files(missing) if missing else {}
+    for filename in missing:
+        processed_data = process_single_raid_file(os.path.join(DEBUG_LOGS_FOLDER, filename))[0] if current_files.get(filename) == signatures[filename] else None
+        inputs[filename] = extract_aggregate_inputs(processed_data) if processed_data else None
+    lost = sum(1 for filename in missing if inputs[filename] is None)
+    if lost: print(f"OSTRZEŻENIE: Brak wejść agregatów dla {lost} plików (zmienione lub usunięte, brak indeksu) - szeregi czasowe zachowają ich obrażenia i punkty umiejętności.")
+    return inputs
+
+# --- Równoległe parsowanie plików rajdów ---
+PARSE_WORKERS = 0 # 0 = liczba rdzeni CPU, 1 = zawsze szeregowo
+PARALLEL_PARSE_MIN_FILES = 32 # Poniżej tej liczby plików pula procesów się nie opłaca
+PARALLEL_PARSE_CHUNK_SIZE = 8 # Ile plików dostaje worker w jednym zadaniu
+
+def _parse_raid_file_blobs(filepath):
+    """Parsuje plik i zwraca (błąd, blob podsumowania, blob wejść agregatów, blob pełnych danych) - w tej postaci trafiają do indeksu."""
+    processed_data, error = process_single_raid_file(filepath)
+    if processed_data is None: return error, None, None, None
+    return (error, dump_raid_summary(RaidSummary.from_raid_data(processed_data)),
+            pickle.dumps(extract_aggregate_inputs(processed_data), protocol=pickle.HIGHEST_PROTOCOL),
+            pickle.dumps(processed_data, protocol=pickle.HIGHEST_PROTOCOL))
+
+def _parse_pool_context():
+    """Workery startują jako nowe procesy (forkserver, a gdzie go nie ma - spawn), a nie przez fork procesu z wątkami
+    requestów, watchera i odświeżania - blokada zajęta w chwili fork zostałaby w dziecku zajęta na zawsze."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+def _init_parse_worker(json_parser, translation_file_path, parent_translations_hash):
+    """Nowy proces ma ustawienia z kodu modułu - przejmujemy te, które wpływają na wynik parsowania."""
+    global RAID_JSON_PARSER, TRANSLATION_FILE_PATH
+    RAID_JSON_PARSER = json_parser
+    if (TRANSLATION_FILE_PATH, translations_hash) != (translation_file_path, parent_translations_hash):
+        TRANSLATION_FILE_PATH = translation_file_path; load_translations()
+    # Np. rodzic trzyma poprzednie tłumaczenia po nieudanym przeładowaniu - pula się wyłącza, parsuje proces główny
+    if translations_hash != parent_translations_hash: raise RuntimeError("Worker nie ma tych samych tłumaczeń co proces główny.")
+
+def _parse_raid_chunk(filepaths):
+    """Uruchamiane w procesie potomnym - zwraca zserializowane wyniki, więc do procesu głównego płyną tylko bajty.
+    Dołącza przyrost metryk workera, który proces główny scala do swojego rejestru."""
+    return [_parse_raid_file_blobs(filepath) for filepath in filepaths], collect_metrics(reset=True)
+
+def parse_raid_files(filenames, workers=None, with_blobs=True):
+    """Parsuje pliki (szeregowo lub w puli procesów) i zwraca listę (podsumowanie, błąd, wejścia agregatów, blob podsumowania,
+    blob wejść, blob danych) w kolejności wejścia. Pełne dane nie zostają w pamięci - są tylko serializowane do indeksu."""
+    workers = workers if workers is not None else PARSE_WORKERS
+    workers = workers or os.cpu_count() or 1
+    filepaths = [os.path.join(DEBUG_LOGS_FOLDER, filename) for filename in filenames]
+    if workers > 1 and len(filepaths) >= PARALLEL_PARSE_MIN_FILES:
+        chunks = [filepaths[i:i + PARALLEL_PARSE_CHUNK_SIZE] for i in range(0, len(filepaths), PARALLEL_PARSE_CHUNK_SIZE)]
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=_parse_pool_context(), initializer=_init_parse_worker,
+                                                        initargs=(RAID_JSON_PARSER, TRANSLATION_FILE_PATH, translations_hash)) as executor:
+                # executor.map zachowuje kolejność, więc wynik jest deterministyczny
+                results = []
+                for chunk_results, chunk_metrics in executor.map(_parse_raid_chunk, chunks):
+                    merge_metrics(chunk_metrics)
+                    results.extend((load_raid_summary(summary_blob), error, load_aggregate_inputs(inputs_blob), summary_blob, inputs_blob, data_blob)
+                                   for error, summary_blob, inputs_blob, data_blob in chunk_results)
+                return results
+        except (OSError, concurrent.futures.BrokenExecutor) as e:
+            print(f"OSTRZEŻENIE: Równoległe parsowanie nie powiodło się ({e}), przechodzę w tryb szeregowy.")
+    results = []
+    for filepath in filepaths:
+        if with_blobs:
+            error, summary_blob, inputs_blob, data_blob = _parse_raid_file_blobs(filepath)
+            results.append((load_raid_summary(summary_blob), error, load_aggregate_inputs(inputs_blob), summary_blob, inputs_blob, data_blob))
+        else:
+            processed_data, error = process_single_raid_file(filepath)
+            if processed_data is None: results.append((None, error, None, None, None, None))
+            else: results.append((RaidSummary.from_raid_data(processed_data), error, extract_aggregate_inputs(processed_data), None, None, None))
+    return results
+
+def load_raid_files(conn, signatures, workers=None):
+    """Zwraca [(filename, podsumowanie, błąd, wejścia agregatów)]: trafienia z indeksu, resztę parsuje i zapisuje w indeksie."""
+    results = {}; to_parse = []; content_hashes = {}
+    for filename in signatures:
+        hit, content_hashes[filename] = lookup_raid_index(conn, filename, signatures[filename])
+        if hit is not None: results[filename] = hit
+        else: to_parse.append(filename)
+    for filename, (summary, error, inputs, summary_blob, inputs_blob, data_blob) in zip(to_parse, parse_raid_files(to_parse, workers, with_blobs=conn is not None)):
+        results[filename] = (summary, error, inputs)
+        store_raid_index(conn, filename, signatures[filename], content_hashes[filename], error, summary_blob, inputs_blob, data_blob)
+    return [(filename,) + results[filename] for filename in signatures]
+
+# --- Pełne dane rajdu na żądanie (LRU) ---
+RAID_DETAILS_CACHE_SIZE = 64
+
+@functools.lru_cache(maxsize=RAID_DETAILS_CACHE_SIZE)
+def _load_raid_details(filename, signature):
+    """Pełne dane rajdu z indeksu (jeśli sygnatura się zgadza) lub z ponownego parsowania pliku.
+    Niepowodzenie to wyjątek, a nie None - lru_cache zapamiętałby None i rajd nie wczytałby się do zmiany pliku."""
+    conn = _open_raid_index_safe()
+    if conn is not None:
+        try:
+            row = conn.execute("SELECT data FROM raids WHERE filename = ? AND mtime_ns = ? AND size = ?",
+                               (filename, signature[0], signature[1])).fetchone()
+            if row and row[0] is not None: return pickle.loads(row[0])
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError) as e: print(f"OSTRZEŻENIE: Błąd odczytu indeksu dla {filename}: {e}")
+        finally: conn.close()
+    processed_data, error = process_single_raid_file(os.path.join(DEBUG_LOGS_FOLDER, filename))
+    if processed_data is None: raise ValueError(error)
+    return processed_data
+
+# --- Kolumnowy magazyn analityczny ---
+# Rajdy, ofiary i przedmioty są przy wczytywaniu spłaszczane do kolumn array.array (napisy jako kody słownikowe),
+# więc statystyki przekrojowe to jedno przejście po tablicach liczb - wektorowo przez numpy, jeśli jest dostępny.
+ANALYTICS_COMPACT_MIN_DEAD = 1000 # Usunięte wiersze sprzątamy, gdy jest ich więcej niż tyle i więcej niż żywych
+ANALYTICS_CHUNK_ROWS = 4096 # Wierszy w kawałku kolumny - migawka kopiuje najwyżej jeden kawałek na kolumnę
+ANALYTICS_EPOCH = datetime.datetime(1970, 1, 1) # Czas lokalny jako sekundy od epoki (dni liczone w czasie lokalnym)
+NUMPY_DTYPES = {'d': 'float64', 'q': 'int64', 'b': 'int8'}
+
+class RaidColumns:
+    """Kolumny rajdów/ofiar/przedmiotów. Rajdy są tylko dopisywane; usunięcie zeruje 'alive' (ofiary i przedmioty
+    usuniętego rajdu odpadają przez złączenie z tą kolumną), a wiersze są fizycznie usuwane przy kompaktowaniu.
+    Każda kolumna to lista kawałków po ANALYTICS_CHUNK_ROWS wierszy: zamknięte kawałki nie są już zmieniane w miejscu,
+    więc migawka (freeze) dzieli je ze stanem roboczym i kopiuje tylko ostatni, wypełniany kawałek."""
+    RAID_FIELDS = (('timestamp', 'd'), ('player', 'q'), ('location', 'q'), ('survived', 'b'), ('exp', 'q'), ('play_time', 'd'),
+                   ('kills', 'q'), ('headshots', 'q'), ('death_part', 'q'), ('alive', 'b'))
+    VICTIM_FIELDS = (('raid', 'q'), ('distance', 'd'), ('weapon', 'q'), ('body_part', 'q'), ('role', 'q'))
+    ITEM_FIELDS = (('raid', 'q'), ('item', 'q'), ('count', 'q'))
+    LABEL_KINDS = ('player', 'location', 'weapon', 'body_part', 'role', 'item')
+
+    def __init__(self):
+        self.raids = {name: [array.array(typecode)] for name, typecode in self.RAID_FIELDS}
+        self.victims = {name: [array.array(typecode)] for name, typecode in self.VICTIM_FIELDS}
+        self.items = {name: [array.array(typecode)] for name, typecode in self.ITEM_FIELDS}
+        self.labels = {kind: [] for kind in self.LABEL_KINDS} # kod -> napis
+        self.codes = {kind: {} for kind in self.LABEL_KINDS} # napis -> kod
+        self.rows = {} # filename -> wiersz rajdu (tylko w stanie roboczym)
+        self.dead = 0
+        self.frozen_labels = None # (labels, codes) oddane migawce - aktualne, dopóki nie dojdzie nowy napis
+        self.joined = {} # (tabela, kolumna) -> sklejona kolumna (tylko w migawce, patrz column)
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self.raids['alive']) - self.dead
+
+    def code(self, kind, label):
+        codes = self.codes[kind]
+        if label not in codes: codes[label] = len(self.labels[kind]); self.labels[kind].append(label); self.frozen_labels = None
+        return codes[label]
+
+    @staticmethod
+    def _tails(table):
+        """Wypełniane kawałki kolumn tabeli (kolumny jednej tabeli mają wspólne granice kawałków)."""
+        if len(next(iter(table.values()))[-1]) >= ANALYTICS_CHUNK_ROWS:
+            for chunks in table.values(): chunks.append(array.array(chunks[-1].typecode))
+        return {name: chunks[-1] for name, chunks in table.items()}
+
+    def add(self, raid_data, inputs):
+        victims, items, death_part = inputs[0] if inputs else ((), (), None)
+        timestamp = raid_data.get('timestamp') or datetime.datetime.min
+        raids = self._tails(self.raids)
+        row = (len(self.raids['alive']) - 1) * ANALYTICS_CHUNK_ROWS + len(raids['alive']); self.rows[raid_data['filename']] = row
+        values = {'timestamp': (timestamp - ANALYTICS_EPOCH).total_seconds() if timestamp != datetime.datetime.min else math.nan,
+                  'player': self.code('player', raid_data.get('nickname')), 'location': self.code('location', raid_data.get('location') or 'unknown'),
+                  'survived': raid_data.get('raid_result') == 'Survived', 'exp': raid_data.get('total_session_exp_calculated') or 0,
+                  'play_time': raid_data.get('play_time_seconds') or 0, 'kills': raid_data.get('kills_count') or 0,
+                  'headshots': raid_data.get('headshots') or 0, 'death_part': self.code('body_part', death_part) if death_part else -1, 'alive': 1}
+        for name, column in raids.items(): column.append(values[name])
+        if victims:
+            tails = self._tails(self.victims)
+            for distance, weapon, body_part, role in victims:
+                tails['raid'].append(row); tails['distance'].append(-1.0 if distance is None else distance) # -1 = brak dystansu
+                tails['weapon'].append(self.code('weapon', weapon or 'unknown')); tails['body_part'].append(self.code('body_part', body_part or 'unknown'))
+                tails['role'].append(self.code('role', role or 'unknown'))
+        if items:
+            tails = self._tails(self.items)
+            for name, count in items:
+                tails['raid'].append(row); tails['item'].append(self.code('item', name)); tails['count'].append(int(count or 1))
+
+    def remove(self, filename):
+        row = self.rows.pop(filename, None)
+        if row is None: return
+        chunks = self.raids['alive']; number, offset = divmod(row, ANALYTICS_CHUNK_ROWS)
+        alive = chunks[number][:]; alive[offset] = 0; chunks[number] = alive # Kopia - kawałek może należeć do migawki
+        self.dead += 1
+        if self.dead > ANALYTICS_COMPACT_MIN_DEAD and self.dead > len(self): self.compact()
+
+    def compact(self):
+        alive = _join_chunks(self.raids['alive'])
+        new_rows = array.array('q', [-1]) * len(alive); next_row = 0
+        for row, flag in enumerate(alive):
+            if flag: new_rows[row] = next_row; next_row += 1
+        self.raids = {name: _split_chunks(array.array(chunks[0].typecode, (value for value, flag in zip(_join_chunks(chunks), alive) if flag)))
+                      for name, chunks in self.raids.items()}
+        for table_name in ('victims', 'items'):
+            table = {name: _join_chunks(chunks) for name, chunks in getattr(self, table_name).items()}
+            keep = [new_rows[row] >= 0 for row in table['raid']]
+            setattr(self, table_name, {name: _split_chunks(array.array(column.typecode, (new_rows[value] if name == 'raid' else value for value, flag in zip(column, keep) if flag)))
+                                       for name, column in table.items()})
+        self.rows = {filename: new_rows[row] for filename, row in self.rows.items()}
+        self.dead = 0
+
+    def freeze(self):
+        """Migawka: zamknięte kawałki są wspólne, kopiowany jest tylko ostatni (memcpy). Zamrożonej kopii nikt nie modyfikuje,
+        więc widoki numpy na niej są bezpieczne."""
+        frozen = RaidColumns.__new__(RaidColumns)
+        for table in ('raids', 'victims', 'items'):
+            setattr(frozen, table, {name: chunks[:-1] + [chunks[-1][:]] for name, chunks in getattr(self, table).items()})
+        if self.frozen_labels is None:
+            self.frozen_labels = ({kind: list(labels) for kind, labels in self.labels.items()}, {kind: dict(codes) for kind, codes in self.codes.items()})
+        frozen.labels, frozen.codes = self.frozen_labels
+        frozen.rows = None; frozen.dead = self.dead; frozen.frozen_labels = None; frozen.joined = {}
+        return frozen
+
+    def column(self, table, name):
+        """Cała kolumna migawki jako tablica numpy albo array.array, gdy numpy nie jest zainstalowany. Kawałki są sklejane
+        raz na migawkę (jeden kawałek: widok numpy bez kopiowania)."""
+        key = (table, name)
+        column = self.joined.get(key)
+        if column is None:
+            chunks = getattr(self, table)[name]
+            if numpy is None: column = _join_chunks(chunks)
+            elif len(chunks) == 1: column = numpy.frombuffer(chunks[0], dtype=NUMPY_DTYPES[chunks[0].typecode])
+            else: column = numpy.concatenate([numpy.frombuffer(chunk, dtype=NUMPY_DTYPES[chunk.typecode]) for chunk in chunks])
+            self.joined[key] = column
+        return column
+
+def _join_chunks(chunks):
+    joined = array.array(chunks[0].typecode)
+    for chunk in chunks: joined.extend(chunk)
+    return joined
+
+def _split_chunks(column):
+    return [column[start:start + ANALYTICS_CHUNK_ROWS] for start in range(0, max(len(column), 1), ANALYTICS_CHUNK_ROWS)]
+
+# Agregacje działają na dwóch ścieżkach: numpy (maski i bincount) albo czysty Python (te same wyniki, pętla po kolumnach).
+def _analytics_raid_mask(columns, nickname=None, location=None, date_from=None, date_to=None):
+    """Maska wierszy rajdów spełniających filtry (numpy.ndarray bool albo lista bool)."""
+    codes = {}
+    for kind, label in (('player', nickname), ('location', location)):
+        if label is None: continue
+        codes[kind] = columns.codes[kind].get(label, -1)
+    bounds = [(date - ANALYTICS_EPOCH).total_seconds() if date else None for date in (date_from, date_to)]
+    if numpy is not None:
+        mask = columns.column('raids', 'alive') == 1
+        for kind, code in codes.items(): mask &= columns.column('raids', kind) == code
+        timestamps = columns.column('raids', 'timestamp')
+        if bounds[0] is not None: mask &= timestamps >= bounds[0]
+        if bounds[1] is not None: mask &= timestamps <= bounds[1]
+        return mask
+    mask = [bool(flag) for flag in columns.column('raids', 'alive')]
+    for kind, code in codes.items(): mask = [keep and value == code for keep, value in zip(mask, columns.column('raids', kind))]
+    timestamps = columns.column('raids', 'timestamp')
+    if bounds[0] is not None: mask = [keep and value >= bounds[0] for keep, value in zip(mask, timestamps)]
+    if bounds[1] is not None: mask = [keep and value <= bounds[1] for keep, value in zip(mask, timestamps)]
+    return mask
+
+def _analytics_join_mask(columns, table, raid_mask):
+    """Maska ofiar/przedmiotów należących do wybranych rajdów."""
+    raid_rows = columns.column(table, 'raid')
+    if numpy is not None: return raid_mask[raid_rows]
+    return [raid_mask[row] for row in raid_rows]
+
+def _select(columns, table, name, mask):
+    column = columns.column(table, name)
+    if numpy is not None: return column[mask]
+    return [value for keep, value in zip(mask, column) if keep]
+
+def _bincount(codes, size, weights=None):
+    """Liczba (lub suma wag) na kod 0..size-1."""
+    if numpy is not None: return numpy.bincount(codes, weights=weights, minlength=size).tolist()
+    totals = [0] * size
+    if weights is None:
+        for code in codes: totals[code] += 1
+    else:
+        for code, weight in zip(codes, weights): totals[code] += weight
+    return totals
+
+def analytics_maps(columns, mask, args):
+    """Przeżywalność, kille, średni exp i czas rajdu per mapa."""
+    locations = _select(columns, 'raids', 'location', mask); size = len(columns.labels['location'])
+    counts = _bincount(locations, size)
+    sums = {name: _bincount(locations, size, _select(columns, 'raids', name, mask)) for name in ('survived', 'kills', 'exp', 'play_time')}
+    rows = []
+    for code, location in enumerate(columns.labels['location']):
+        raids = int(counts[code])
+        if not raids: continue
+        survived = int(sums['survived'][code]); play_time = sums['play_time'][code] / raids
+        rows.append({'location': location, 'raids': raids, 'survived': survived, 'survival_rate': round(survived / raids * 100, 1),
+                     'kills': int(sums['kills'][code]), 'avg_exp': round(sums['exp'][code] / raids),
+                     'avg_play_time_seconds': round(play_time), 'avg_play_time_formatted': format_time(play_time)})
+    rows.sort(key=lambda row: (-row['raids'], row['location']))
+    return rows
+
+def analytics_kill_distances(columns, mask, args):
+    """Histogram dystansów zabójstw. Dalsze niż max_distance trafiają do ostatniego przedziału."""
+    bins = min(max(int(args.get('bins', 20)), 1), 200)
+    victim_mask = _analytics_join_mask(columns, 'victims', mask)
+    distances = _select(columns, 'victims', 'distance', victim_mask)
+    if numpy is not None: distances = distances[distances >= 0]
+    else: distances = [distance for distance in distances if distance >= 0]
+    longest = float(max(distances)) if len(distances) else 0.0
+    top = float(args['max_distance']) if args.get('max_distance') else longest
+    if not top > 0: top = 1.0
+    width = top / bins
+    if numpy is not None: counts = numpy.bincount(numpy.minimum((distances / width).astype('int64'), bins - 1), minlength=bins).tolist()
+    else: counts = _bincount([min(int(distance / width), bins - 1) for distance in distances], bins)
+    return {'kills': len(distances), 'longest': round(longest, 1), 'bin_width': round(width, 2),
+            'bins': [{'from': round(index * width, 1), 'to': round((index + 1) * width, 1), 'kills': int(count)} for index, count in enumerate(counts)]}
+
+def analytics_weapons(columns, mask, args):
+    """Ranking broni: kille, headshoty, średni i najdłuższy dystans."""
+    limit = min(max(int(args.get('limit', 20)), 1), 200)
+    victim_mask = _analytics_join_mask(columns, 'victims', mask)
+    weapons = _select(columns, 'victims', 'weapon', victim_mask); size = len(columns.labels['weapon'])
+    distances = _select(columns, 'victims', 'distance', victim_mask); body_parts = _select(columns, 'victims', 'body_part', victim_mask)
+    head = columns.codes['body_part'].get('Head', -1)
+    kills = _bincount(weapons, size)
+    if numpy is not None:
+        headshots = _bincount(weapons[body_parts == head], size)
+        valid = distances >= 0
+        distance_counts = _bincount(weapons[valid], size); distance_sums = _bincount(weapons[valid], size, distances[valid])
+        longest = numpy.zeros(size); numpy.maximum.at(longest, weapons[valid], distances[valid]); longest = longest.tolist()
+    else:
+        headshots = _bincount([weapon for weapon, part in zip(weapons, body_parts) if part == head], size)
+        valid = [(weapon, distance) for weapon, distance in zip(weapons, distances) if distance >= 0]
+        distance_counts = _bincount([weapon for weapon, _ in valid], size)
+        distance_sums = _bincount([weapon for weapon, _ in valid], size, [distance for _, distance in valid])
+        longest = [0.0] * size
+        for weapon, distance in valid: longest[weapon] = max(longest[weapon], distance)
+    rows = [{'weapon': weapon, 'kills': int(kills[code]), 'headshots': int(headshots[code]),
+             'headshot_rate': round(headshots[code] / kills[code] * 100, 1),
+             'avg_distance': round(distance_sums[code] / distance_counts[code], 1) if distance_counts[code] else None,
+             'longest_distance': round(longest[code], 1)}
+            for code, weapon in enumerate(columns.labels['weapon']) if kills[code]]
+    rows.sort(key=lambda row: (-row['kills'], -row['headshots'], row['weapon']))
+    return rows[:limit]
+
+def analytics_body_parts(columns, mask, args):
+    """Kille według trafionej części ciała i śmierci według części ciała, w którą padł śmiertelny strzał."""
+    size = len(columns.labels['body_part'])
+    kills = _bincount(_select(columns, 'victims', 'body_part', _analytics_join_mask(columns, 'victims', mask)), size)
+    death_parts = _select(columns, 'raids', 'death_part', mask)
+    deaths = _bincount(death_parts[death_parts >= 0] if numpy is not None else [part for part in death_parts if part >= 0], size)
+    rows = [{'body_part': part, 'name': get_item_name(part), 'kills': int(kills[code]), 'deaths': int(deaths[code])}
+            for code, part in enumerate(columns.labels['body_part']) if kills[code] or deaths[code]]
+    rows.sort(key=lambda row: (-row['kills'], -row['deaths'], row['body_part']))
+    return rows
+
+def analytics_items(columns, mask, args):
+    """Najczęściej znajdowane przedmioty (Found in Raid)."""
+    limit = min(max(int(args.get('limit', 20)), 1), 200)
+    item_mask = _analytics_join_mask(columns, 'items', mask)
+    items = _select(columns, 'items', 'item', item_mask); size = len(columns.labels['item'])
+    raids = _bincount(items, size); counts = _bincount(items, size, _select(columns, 'items', 'count', item_mask))
+    rows = [{'item': item, 'count': int(counts[code]), 'raids': int(raids[code])} for code, item in enumerate(columns.labels['item']) if raids[code]]
+    rows.sort(key=lambda row: (-row['count'], row['item']))
+    return rows[:limit]
+
+ANALYTICS_BUCKETS = {'day': (86400, 0), 'week': (7 * 86400, 3 * 86400)} # (długość, przesunięcie: 1970-01-01 to czwartek, tygodnie od poniedziałku)
+
+def analytics_exp_per_minute(columns, mask, args):
+    """Exp na minutę rajdu w kolejnych dniach/tygodniach (tylko okresy z rajdami)."""
+    bucket = args.get('bucket', 'week')
+    if bucket not in ANALYTICS_BUCKETS: raise ValueError(f"bucket musi być jednym z: {', '.join(ANALYTICS_BUCKETS)}")
+    length, offset = ANALYTICS_BUCKETS[bucket]
+    timestamps = _select(columns, 'raids', 'timestamp', mask); play_times = _select(columns, 'raids', 'play_time', mask)
+    exp = _select(columns, 'raids', 'exp', mask)
+    if numpy is not None:
+        valid = ~numpy.isnan(timestamps) & (play_times > 0)
+        keys, inverse = numpy.unique(numpy.floor((timestamps[valid] + offset) / length).astype('int64'), return_inverse=True)
+        buckets = zip(keys.tolist(), _bincount(inverse, len(keys)), _bincount(inverse, len(keys), exp[valid]),
+                      _bincount(inverse, len(keys), play_times[valid]))
+    else:
+        totals = {}
+        for timestamp, play_time, raid_exp in zip(timestamps, play_times, exp):
+            if timestamp != timestamp or play_time <= 0: continue # NaN = brak daty w nazwie pliku
+            entry = totals.setdefault(math.floor((timestamp + offset) / length), [0, 0, 0.0])
+            entry[0] += 1; entry[1] += raid_exp; entry[2] += play_time
+        buckets = ((key,) + tuple(totals[key]) for key in sorted(totals))
+    rows = []
+    for key, raids, exp_sum, seconds in buckets:
+        start = ANALYTICS_EPOCH + datetime.timedelta(seconds=key * length - offset)
+        rows.append({'bucket_start': start.date().isoformat(), 'raids': int(raids), 'exp': int(exp_sum),
+                     'minutes': round(seconds / 60, 1), 'exp_per_minute': round(exp_sum / (seconds / 60), 1)})
+    return rows
+
+ANALYTICS_VIEWS = {
+    'maps': analytics_maps, 'kill-distances': analytics_kill_distances, 'weapons': analytics_weapons,
+    'body-parts': analytics_body_parts, 'items': analytics_items, 'exp-per-minute': analytics_exp_per_minute,
+}
+
+# --- Rankingi serwera (top-K utrzymywane przyrostowo) ---
+# Każde okno czasowe ma własne sumy graczy i posortowane zbiory wyników aktualizowane przy dodaniu/usunięciu rajdu.
+# Rajdy starsze niż okno są z niego odejmowane przy odświeżaniu cache (advance_leaderboards) - tylko te, które wypadły.
+LEADERBOARD_SIZE = 20 # Ile pozycji każdego rankingu trafia do migawki
+LEADERBOARD_KD_MIN_RAIDS = 5 # Do rankingu K/D trafiają gracze z co najmniej tyloma rajdami w oknie
+LEADERBOARD_WINDOWS = {'all': None, '7d': datetime.timedelta(days=7), '24h': datetime.timedelta(hours=24)}
+LEADERBOARD_BOARDS = ('kills', 'kd', 'longest_shot', 'session_exp') # + 'map_raids' (osobny ranking dla każdej mapy)
+
+class RankedSet:
+    """Elementy posortowane malejąco po wyniku (remisy alfabetycznie). SortedList, jeśli jest zainstalowany,
+    w przeciwnym razie lista z bisect - przy liczbie graczy/rajdów z debug_logs przesunięcia pamięci są pomijalne."""
+    __slots__ = ('scores', 'order')
+
+    def __init__(self):
+        self.scores = {} # element -> wynik
+        self.order = SortedList() if SortedList is not None else [] # (-wynik, element) rosnąco
+
+    def __len__(self):
+        return len(self.scores)
+
+    def set(self, member, score):
+        if self.scores.get(member) == score: return
+        self.discard(member)
+        self.scores[member] = score
+        if SortedList is not None: self.order.add((-score, member))
+        else: bisect.insort(self.order, (-score, member))
+
+    def discard(self, member):
+        score = self.scores.pop(member, None)
+        if score is None: return
+        if SortedList is not None: self.order.remove((-score, member))
+        else: del self.order[bisect.bisect_left(self.order, (-score, member))]
+
+    def top(self, limit):
+        return [(member, -negative_score) for negative_score, member in self.order[:limit]]
+
+class RaidLeaderboards:
+    """Rankingi jednego okna czasowego (window=None: cała historia). Rajd należy do okna, gdy jego klucz
+    (timestamp, filename) jest >= cutoff; rajdy bez daty w nazwie pliku trafiają tylko do rankingu całej historii."""
+
+    def __init__(self, window=None, now=None):
+        self.window = window
+        self.cutoff = ((now or datetime.datetime.now()) - window,) if window else None
+        self.players = {} # nickname -> [rajdy, kille, śmierci]
+        self.map_players = {} # lokacja -> {nickname: rajdy}
+        self.boards = {name: RankedSet() for name in LEADERBOARD_BOARDS}
+        self.map_boards = {} # lokacja -> RankedSet graczy po liczbie rajdów
+
+    def contains(self, key):
+        return self.cutoff is None or key >= self.cutoff
+
+    def apply(self, raid_data, sign):
+        """Dodaje (sign=1) lub odejmuje (sign=-1) rajd. Wyniki pojedynczych rajdów po prostu wstawiamy/usuwamy."""
+        filename = raid_data['filename']
+        if sign > 0:
+            if raid_data.get('longest_kill_distance'): self.boards['longest_shot'].set(filename, raid_data['longest_kill_distance'])
+            if raid_data.get('total_session_exp_calculated'): self.boards['session_exp'].set(filename, raid_data['total_session_exp_calculated'])
+        else: self.boards['longest_shot'].discard(filename); self.boards['session_exp'].discard(filename)
+        nickname = raid_data.get('nickname')
+        if nickname is None: return
+        stats = self.players.setdefault(nickname, [0, 0, 0])
+        stats[0] += sign; stats[1] += sign * raid_data.get('kills_count', 0)
+        if raid_data.get('raid_result') != 'Survived': stats[2] += sign
+        if stats[0] <= 0: del self.players[nickname]; self.boards['kills'].discard(nickname); self.boards['kd'].discard(nickname)
+        else:
+            if stats[1] > 0: self.boards['kills'].set(nickname, stats[1])
+            else: self.boards['kills'].discard(nickname)
+            # K/D jak na profilu gracza: bez śmierci liczy się sama liczba killi
+            if stats[0] >= LEADERBOARD_KD_MIN_RAIDS: self.boards['kd'].set(nickname, round(stats[1] / stats[2], 2) if stats[2] else stats[1])
+            else: self.boards['kd'].discard(nickname)
+        location = raid_data.get('location') or 'unknown'
+        counts = self.map_players.setdefault(location, {}); board = self.map_boards.setdefault(location, RankedSet())
+        counts[nickname] = counts.get(nickname, 0) + sign
+        if counts[nickname] > 0: board.set(nickname, counts[nickname])
+        else:
+            del counts[nickname]; board.discard(nickname)
+            if not counts: del self.map_players[location]; del self.map_boards[location]
+
+    def advance(self, all_raids, raid_keys, now=None):
+        """Przesuwa okno do now - window i odejmuje rajdy, które z niego wypadły. Zwraca ich liczbę."""
+        if self.window is None: return 0
+        cutoff = ((now or datetime.datetime.now()) - self.window,)
+        if cutoff <= self.cutoff: return 0
+        start = bisect.bisect_left(raid_keys.items, self.cutoff); end = bisect.bisect_left(raid_keys.items, cutoff)
+        self.cutoff = cutoff
+        for position in range(start, end): self.apply(all_raids[position], -1)
+        return max(end - start, 0)
+
+    def _player_row(self, nickname, value):
+        raids, kills, deaths = self.players[nickname]
+        return {'nickname': nickname, 'value': value, 'raids': raids, 'kills': kills, 'deaths': deaths}
+
+    @staticmethod
+    def _raid_row(file_cache, filename, value):
+        raid_data = file_cache[filename]
+        return {'nickname': raid_data.get('nickname'), 'value': value, 'filename': filename, 'location': raid_data.get('location'),
+                'timestamp_formatted': raid_data.get('timestamp_formatted')}
+
+    def top(self, file_cache, limit=None):
+        """Gotowe wiersze rankingów (do migawki)."""
+        limit = limit or LEADERBOARD_SIZE
+        boards = {name: [self._player_row(nickname, value) for nickname, value in self.boards[name].top(limit)] for name in ('kills', 'kd')}
+        for name in ('longest_shot', 'session_exp'):
+            boards[name] = [self._raid_row(file_cache, filename, value) for filename, value in self.boards[name].top(limit)]
+        boards['map_raids'] = {location: [{'nickname': nickname, 'value': value} for nickname, value in board.top(limit)]
+                               for location, board in sorted(self.map_boards.items(), key=lambda item: (-len(item[1]), item[0]))}
+        return {'since': self.cutoff[0] if self.cutoff else None, 'boards': boards}
+
+def _new_leaderboards(now=None):
+    now = now or datetime.datetime.now()
+    return {name: RaidLeaderboards(window, now) for name, window in LEADERBOARD_WINDOWS.items()}
+
+def advance_leaderboards(state, now=None):
+    """Przesuwa okna czasowe rankingów. Zwraca liczbę rajdów, które wypadły z okien."""
+    now = now or datetime.datetime.now()
+    return sum(boards.advance(state['all_raids'], state['raid_keys'], now) for boards in state['leaderboards'].values())
+
+# --- Szeregi czasowe graczy (agregaty dzienne/tygodniowe utrzymywane przyrostowo) ---
+# Każdy rajd dodaje (lub przy usunięciu odejmuje) swoje wartości do kubełka (gracz, mapa, dzień) i (gracz, mapa, tydzień);
+# mapa None to suma wszystkich map. Wykres z lat historii czyta gotowe kubełki zamiast przechodzić po rajdach.
+TIMESERIES_METRICS = ('raids', 'survived', 'kills', 'exp', 'damage_dealt', 'skill_points', 'play_time_seconds')
+TIMESERIES_MAX_POINTS = 180 # Domyślna liczba punktów wykresu - dłuższe zakresy są łączone w szersze kubełki
+TIMESERIES_MAX_POINTS_LIMIT = 1000
+
+def _timeseries_bucket(timestamp, period):
+    length, offset = ANALYTICS_BUCKETS[period]
+    return math.floor(((timestamp - ANALYTICS_EPOCH).total_seconds() + offset) / length)
+
+class RaidTimeseries:
+    """Agregaty (gracz, mapa, okres) -> {'keys': numery kubełków rosnąco, 'values': kubełek -> sumy TIMESERIES_METRICS}."""
+
+    def __init__(self):
+        self.series = {}
+        self.dirty = set() # Serie zmienione od ostatniej publikacji (patrz freeze)
+
+    def apply(self, raid_data, inputs, sign):
+        timestamp = raid_data.get('timestamp'); nickname = raid_data.get('nickname')
+        if nickname is None or not timestamp or timestamp == datetime.datetime.min: return # Bez daty w nazwie pliku nie ma kubełka
+        damage_dealt, skill_points = inputs[1] if inputs else (0, 0)
+        values = (1, int(raid_data.get('raid_result') == 'Survived'), raid_data.get('kills_count') or 0,
+                  raid_data.get('total_session_exp_calculated') or 0, damage_dealt or 0, skill_points or 0, raid_data.get('play_time_seconds') or 0)
+        if sign != 1: values = tuple(sign * value for value in values)
+        seconds = (timestamp - ANALYTICS_EPOCH).total_seconds(); locations = (None, raid_data.get('location') or 'unknown')
+        for period, (length, offset) in ANALYTICS_BUCKETS.items():
+            bucket = math.floor((seconds + offset) / length) # Jak _timeseries_bucket, bez ponownego liczenia sekund
+            for location in locations:
+                key = (nickname, location, period)
+                series = self.series.get(key)
+                if series is None: series = self.series[key] = {'keys': [], 'values': {}}
+                bucket_values = series['values']; totals = bucket_values.get(bucket)
+                if totals is None: bisect.insort(series['keys'], bucket); totals = bucket_values[bucket] = list(values)
+                else: totals[:] = [total + value for total, value in zip(totals, values)]
+                if totals[0] <= 0:
+                    del bucket_values[bucket]; del series['keys'][bisect.bisect_left(series['keys'], bucket)]
+                    if not series['keys']: del self.series[key]
+                self.dirty.add(key)
+
+    def freeze(self, previous=None):
+        """Kopia do migawki. Serie niezmienione od poprzedniej publikacji są przejmowane z niej bez kopiowania."""
+        copy = lambda series: {'keys': list(series['keys']), 'values': {bucket: tuple(totals) for bucket, totals in series['values'].items()}}
+        if previous is None: frozen = {key: copy(series) for key, series in self.series.items()}
+        else:
+            frozen = dict(previous)
+            for key in self.dirty:
+                if key in self.series: frozen[key] = copy(self.series[key])
+                else: frozen.pop(key, None)
+        self.dirty = set()
+        return frozen
+
+def query_timeseries(timeseries, nickname, location, period, date_from=None, date_to=None, max_points=None):
+    """Punkty wykresu z zakresu dat. Gdy kubełków jest więcej niż max_points, łączy po `factor` sąsiednich (wyrównanych
+    do epoki, więc punkty nie przesuwają się wraz z zakresem); dzienny zakres łączony po 7+ dni czyta od razu serię tygodniową.
+    Sumy są addytywne - wynik jest dokładny, a koszt zależy od liczby punktów, nie od długości historii."""
+    max_points = max_points or TIMESERIES_MAX_POINTS
+    def window(period):
+        series = timeseries.get((nickname, location, period)) or {'keys': [], 'values': {}}
+        keys = series['keys']
+        lower = bisect.bisect_left(keys, _timeseries_bucket(date_from, period)) if date_from else 0
+        upper = bisect.bisect_right(keys, _timeseries_bucket(date_to, period)) if date_to else len(keys)
+        factor = max(1, math.ceil((keys[upper - 1] - keys[lower] + 1) / max_points)) if upper > lower else 1
+        while upper > lower and keys[upper - 1] // factor - keys[lower] // factor >= max_points: factor += 1 # Wyrównanie może dodać punkt
+        return series, keys[lower:upper], factor
+    series, keys, factor = window(period)
+    if period == 'day' and factor >= 7: period = 'week'; series, keys, factor = window(period)
+    merged = {}
+    for bucket in keys:
+        totals = series['values'][bucket]; group = bucket // factor
+        merged[group] = [value + total for value, total in zip(merged[group], totals)] if group in merged else totals
+    length, offset = ANALYTICS_BUCKETS[period]
+    points = []
+    for group, totals in merged.items():
+        point = dict(zip(TIMESERIES_METRICS, totals))
+        point['start'] = (ANALYTICS_EPOCH + datetime.timedelta(seconds=group * factor * length - offset)).date().isoformat()
+        point['survival_rate'] = round(point['survived'] / point['raids'] * 100, 1)
+        point['skill_points'] = round(point['skill_points'], 2)
+        points.append(point)
+    return {'bucket': period, 'bucket_days': factor * length // 86400, 'points': points}
+
+# --- Kontenery stanu współdzielone z migawkami (copy-on-write) ---
+# Publikacja nie kopiuje historii: migawka dostaje niezmienny widok, a stan roboczy kopiuje tylko to, co zmienia
+# po publikacji (SnapshotList - całą listę przy wstawieniu w środek/usunięciu, SnapshotDict - jedną z SNAPSHOT_DICT_SHARDS części).
+SNAPSHOT_DICT_SHARDS = 256
+
+class SnapshotList:
+    """Lista stanu roboczego (rajdy, ich klucze, nazwy plików) rosnąco, od najstarszego. view() oddaje migawce samą listę
+    i jej bieżącą długość: dopisanie na końcu (typowy nowy rajd) niczego w widoku nie zmienia, a przed wstawieniem
+    w środek lub usunięciem lista używana przez migawkę jest najpierw kopiowana."""
+    __slots__ = ('items', 'shared')
+
+    def __init__(self, items=()):
+        self.items = list(items); self.shared = False
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __eq__(self, other):
+        return isinstance(other, SnapshotList) and self.items == other.items
+
+    def _unshare(self):
+        if self.shared: self.items = list(self.items); self.shared = False
+
+    def insert(self, position, value):
+        if position < len(self.items): self._unshare()
+        self.items.insert(position, value)
+
+    def __delitem__(self, position):
+        self._unshare(); del self.items[position]
+
+    def view(self, newest_first=False):
+        self.shared = True
+        return SnapshotListView(self.items, len(self.items), newest_first)
+
+class SnapshotListView(Sequence):
+    """Niezmienny widok migawki na pierwsze `length` elementów listy, opcjonalnie od najnowszego (jak dawne listy migawki)."""
+    __slots__ = ('items', 'length', 'newest_first')
+
+    def __init__(self, items, length, newest_first=False):
+        self.items = items; self.length = length; self.newest_first = newest_first
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice): return [self[position] for position in range(*index.indices(self.length))]
+        if index < 0: index += self.length
+        if not 0 <= index < self.length: raise IndexError("indeks poza zakresem widoku")
+        return self.items[self.length - 1 - index] if self.newest_first else self.items[index]
+
+    def __iter__(self):
+        if self.newest_first: return map(self.items.__getitem__, range(self.length - 1, -1, -1))
+        return itertools.islice(self.items, self.length)
+
+    def __reversed__(self):
+        if self.newest_first: return itertools.islice(self.items, self.length)
+        return map(self.items.__getitem__, range(self.length - 1, -1, -1))
+
+    def __eq__(self, other):
+        return isinstance(other, (Sequence, SnapshotList)) and len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return f"SnapshotListView({list(self)!r})"
+
+def _snapshot_shard(key):
+    return zlib.crc32(key.encode('utf-8')) % SNAPSHOT_DICT_SHARDS # Stały między procesami (w przeciwieństwie do hash())
+
+class SnapshotDict(MutableMapping):
+    """Słownik stanu roboczego o kluczach tekstowych (nazwy plików), podzielony na SNAPSHOT_DICT_SHARDS części.
+    view() kopiuje tylko części zmienione od poprzedniego widoku - pozostałe dzieli z nim."""
+    __slots__ = ('shards', 'frozen', 'length')
+
+    def __init__(self):
+        self.shards = [{} for _ in range(SNAPSHOT_DICT_SHARDS)]
+        self.frozen = [None] * SNAPSHOT_DICT_SHARDS # Kopie części oddane migawkom (None = część zmieniona od tamtej pory)
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.shards)
+
+    def __getitem__(self, key):
+        return self.shards[_snapshot_shard(key)][key]
+
+    def __contains__(self, key):
+        return key in self.shards[_snapshot_shard(key)]
+
+    def get(self, key, default=None):
+        return self.shards[_snapshot_shard(key)].get(key, default)
+
+    def __setitem__(self, key, value):
+        number = _snapshot_shard(key); shard = self.shards[number]
+        if key not in shard: self.length += 1
+        shard[key] = value; self.frozen[number] = None
+
+    def __delitem__(self, key):
+        number = _snapshot_shard(key)
+        del self.shards[number][key]
+        self.length -= 1; self.frozen[number] = None
+
+    def pop(self, key, *default):
+        number = _snapshot_shard(key); shard = self.shards[number]
+        if key not in shard:
+            if default: return default[0]
+            raise KeyError(key)
+        self.length -= 1; self.frozen[number] = None
+        return shard.pop(key)
+
+    def items(self):
+        return itertools.chain.from_iterable(shard.items() for shard in self.shards)
+
+    def view(self):
+        for number, shard in enumerate(self.shards):
+            if self.frozen[number] is None: self.frozen[number] = dict(shard)
+        return SnapshotDictView(tuple(self.frozen), self.length)
+
+class SnapshotDictView(Mapping):
+    """Niezmienny widok migawki na SnapshotDict."""
+    __slots__ = ('shards', 'length')
+
+    def __init__(self, shards, length):
+        self.shards = shards; self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.shards)
+
+    def __getitem__(self, key):
+        return self.shards[_snapshot_shard(key)][key]
+
+    def __contains__(self, key):
+        return key in self.shards[_snapshot_shard(key)]
+
+    def get(self, key, default=None):
+        return self.shards[_snapshot_shard(key)].get(key, default)
+
+    def items(self):
+        return itertools.chain.from_iterable(shard.items() for shard in self.shards)
+
+# --- Przyrostowe wczytywanie rajdów ---
+# Stan silnika przyrostowego: pamiętamy sygnaturę (mtime, rozmiar) każdego pliku,
+# więc odświeżenie parsuje tylko nowe/zmienione pliki, a sumy graczy aktualizuje różnicowo.
+# Indeksy (gracz/mapa/wynik) są utrzymywane przy wczytywaniu, więc strony nie skanują wszystkich rajdów.
+RAID_INDEX_FIELDS = ('nickname', 'location', 'raid_result')
+
+def _new_player_summary(nickname):
+    return {
+        'nickname': nickname, 'raid_ids': SnapshotList(), 'latest_timestamp': datetime.datetime.min, 'latest_level': None, 'latest_side': None,
+        'side_translated': get_item_name('Unknown'),
         'latest_total_experience': 0, 'raid_count': 0, 'total_kills': 0, 'total_deaths': 0,
         'total_survived': 0, 'total_headshots': 0, 'calculated_kd': 'N/A', 'overall_stats_latest': {},
-        'latest_total_experience_formatted': '0' # Dodajemy sformatowane pole
-    })
-    errors = []
-    raid_files = glob.glob(os.path.join(DEBUG_LOGS_FOLDER, RAID_FILE_PATTERN))
-    raid_files.sort(key=lambda f: get_timestamp_from_filename(os.path.basename(f)))
+        'latest_total_experience_formatted': '0', # Dodajemy sformatowane pole
+        'calculated_survival_rate': 'N/A', 'longest_kill_distance': 0, 'longest_kill_distance_formatted': 'N/A',
+        'maps': {}, # lokacja -> statystyki gracza na tej mapie
+    }
 
-    processed_files_cache = {} # Cache dla przetworzonych plików
+def _new_map_summary():
+    return {'raid_count': 0, 'survived': 0, 'deaths': 0, 'kills': 0, 'headshots': 0, 'session_exp': 0, 'survival_rate': 'N/A', 'kd_ratio': 'N/A'}
 
-    for filepath in raid_files:
-        if not os.path.exists(filepath): print(f"OSTRZEŻENIE: Pomijanie nieistniejącego pliku: {filepath}"); continue
-        filename = os.path.basename(filepath)
-        processed_data, error = process_single_raid_file(filepath)
-        if error: errors.append(f"{filename}: {error}")
+def _new_raid_bucket():
+    return {'keys': SnapshotList(), 'raids': SnapshotList()} # Obie rosnąco po (timestamp, filename); migawka widzi raids od najnowszego
+
+def _new_ingest_state():
+    return {
+        'file_signatures': SnapshotDict(), # filename -> (mtime_ns, size)
+        'file_cache': SnapshotDict(), # filename -> RaidSummary (pełne dane: get_raid_details)
+        'file_errors': {}, # filename -> komunikat błędu
+        'raid_keys': SnapshotList(), # (timestamp, filename) rosnąco, równolegle do all_raids
+        'all_raids': SnapshotList(), # Rosnąco (najstarszy pierwszy); migawka widzi je od najnowszego
+        'indexes': {field: {} for field in RAID_INDEX_FIELDS}, # pole -> wartość -> bucket rajdów
+        'players_summary': {},
+        'player_order': [], # (nickname.lower(), nickname) rosnąco, równolegle do players_list
+        'players_list': [],
+        'errors': [],
+        'unsettled_files': [], # Pliki pominięte przy ostatnim odświeżeniu, bo mogą być jeszcze zapisywane
+        'new_raids': [], # Rajdy z plików, których wcześniej nie znaliśmy (z ostatniego odświeżenia)
+        'changes': ([], []), # (usunięte, wczytane) z ostatniego odświeżenia - rekord dziennika współdzielonego cache
+        'dirty_buckets': set(), # (pole, wartość) zmienione od ostatniej publikacji (patrz snapshot_ingest_state)
+        'columns': RaidColumns(), # Kolumny analityczne (patrz RaidColumns)
+        'leaderboards': _new_leaderboards(), # okno -> RaidLeaderboards
+        'timeseries': RaidTimeseries(), # Agregaty dzienne/tygodniowe (gracz, mapa)
+    }
+
+def _raid_sort_key(raid_data):
+    return (raid_data.get('timestamp', datetime.datetime.min), raid_data['filename'])
+
+def scan_raid_files(folder=None):
+    """Zwraca {nazwa_pliku: (mtime_ns, rozmiar)} dla plików rajdów w folderze i w jego archiwum."""
+    folder = folder or DEBUG_LOGS_FOLDER
+    signatures = {}
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not fnmatch.fnmatch(entry.name, RAID_FILE_PATTERN): continue
+                try: stat = entry.stat()
+                except FileNotFoundError: continue # Plik usunięty w trakcie skanowania
+                signatures[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError: print(f"OSTRZEŻENIE: Folder z logami nie istnieje: {folder}")
+    # Spakowane rajdy mają w archiwum tę samą sygnaturę co wcześniej w folderze
+    for filename, entry in load_raid_archive_catalog(folder).items():
+        if filename not in signatures and fnmatch.fnmatch(filename, RAID_FILE_PATTERN): signatures[filename] = entry[3:]
+    return signatures
+
+def _bucket_insert(keys, raids, key, raid_data):
+    """Wstawia rajd do pary list (obie rosnąco po kluczu) i zwraca jego pozycję."""
+    position = bisect.bisect_left(keys.items, key)
+    keys.insert(position, key); raids.insert(position, raid_data)
+    return position
+
+def _bucket_remove(keys, raids, key):
+    position = bisect.bisect_left(keys.items, key)
+    del keys[position]; del raids[position]
+    return position
+
+def _apply_raid_to_player(player, raid_data, sign):
+    """Dodaje (sign=1) lub odejmuje (sign=-1) wkład jednego rajdu do sum gracza."""
+    headshots = raid_data.get('headshots', 0); survived = raid_data.get('raid_result') == 'Survived'
+    player['raid_count'] += sign
+    player['total_kills'] += sign * raid_data.get('kills_count', 0)
+    player['total_headshots'] += sign * headshots
+    if survived: player['total_survived'] += sign
+    else: player['total_deaths'] += sign
+    map_stats = player['maps'].setdefault(raid_data.get('location') or 'unknown', _new_map_summary())
+    map_stats['raid_count'] += sign
+    map_stats['kills'] += sign * raid_data.get('kills_count', 0)
+    map_stats['headshots'] += sign * headshots
+    map_stats['session_exp'] += sign * raid_data.get('total_session_exp_calculated', 0)
+    if survived: map_stats['survived'] += sign
+    else: map_stats['deaths'] += sign
+    if sign > 0: player['longest_kill_distance'] = max(player['longest_kill_distance'], raid_data.get('longest_kill_distance', 0))
+
+def _add_raid(state, raid_data, inputs, touched_players):
+    key = _raid_sort_key(raid_data)
+    _bucket_insert(state['raid_keys'], state['all_raids'], key, raid_data)
+    state['file_cache'][raid_data['filename']] = raid_data
+    state['columns'].add(raid_data, inputs)
+    for boards in state['leaderboards'].values():
+        if boards.contains(key): boards.apply(raid_data, 1)
+    state['timeseries'].apply(raid_data, inputs, 1)
+    for field, index in state['indexes'].items():
+        value = raid_data.get(field)
+        if value is None: continue
+        bucket = index.setdefault(value, _new_raid_bucket())
+        position = _bucket_insert(bucket['keys'], bucket['raids'], key, raid_data)
+        state['dirty_buckets'].add((field, value))
+        if field == 'nickname':
+            player = state['players_summary'].setdefault(value, _new_player_summary(value))
+            player['raid_ids'].insert(position, raid_data['filename'])
+            _apply_raid_to_player(player, raid_data, 1)
+            touched_players.add(value)
+
+def _remove_raid(state, filename, inputs, touched_players):
+    state['file_signatures'].pop(filename, None)
+    state['file_errors'].pop(filename, None)
+    raid_data = state['file_cache'].pop(filename, None)
+    if not raid_data: return
+    key = _raid_sort_key(raid_data)
+    _bucket_remove(state['raid_keys'], state['all_raids'], key)
+    state['columns'].remove(filename)
+    for boards in state['leaderboards'].values():
+        if boards.contains(key): boards.apply(raid_data, -1)
+    state['timeseries'].apply(raid_data, inputs, -1)
+    for field, index in state['indexes'].items():
+        value = raid_data.get(field)
+        if value is None or value not in index: continue
+        bucket = index[value]
+        position = _bucket_remove(bucket['keys'], bucket['raids'], key)
+        state['dirty_buckets'].add((field, value))
+        if not bucket['keys']: del index[value]
+        if field == 'nickname':
+            player = state['players_summary'][value]
+            del player['raid_ids'][position]
+            _apply_raid_to_player(player, raid_data, -1)
+            # Maksimum nie da się odjąć - przeliczamy je z pozostałych rajdów gracza (tylko przy usuwaniu)
+            if raid_data.get('longest_kill_distance', 0) >= player['longest_kill_distance']:
+                player['longest_kill_distance'] = max((r.get('longest_kill_distance', 0) for r in bucket['raids']), default=0)
+            touched_players.add(value)
+
+def _finalize_player(state, nickname):
+    """Przelicza pola pochodne gracza ('latest_*', K/D, przeżywalność, mapy) po zmianie jego rajdów."""
+    player = state['players_summary'].get(nickname)
+    if not player: return
+    order_key = (nickname.lower(), nickname)
+    position = bisect.bisect_left(state['player_order'], order_key)
+    listed = position < len(state['player_order']) and state['player_order'][position] == order_key
+    if player['raid_count'] <= 0:
+        del state['players_summary'][nickname]
+        if listed: del state['player_order'][position]; del state['players_list'][position]
+        return
+    if not listed: state['player_order'].insert(position, order_key); state['players_list'].insert(position, player)
+    raid_data = state['indexes']['nickname'][nickname]['raids'][-1] # Najnowszy
+    player['latest_level'] = raid_data.get('level'); player['latest_side'] = raid_data.get('side')
+    player['side_translated'] = get_item_name(player['latest_side'])
+    player['latest_total_experience'] = raid_data.get('total_experience', 0)
+    player['latest_total_experience_formatted'] = format_exp(player['latest_total_experience']) # Formatuj EXP
+    player['latest_timestamp'] = raid_data.get('timestamp', datetime.datetime.min)
+    player['overall_stats_latest'] = raid_data.get('overall_stats', {})
+    if player['total_deaths'] > 0: player['calculated_kd'] = f"{player['total_kills'] / player['total_deaths']:.2f}"
+    else: player['calculated_kd'] = f"{player['total_kills']}"
+    player['calculated_survival_rate'] = f"{player['total_survived'] / player['raid_count'] * 100:.1f}%"
+    player['longest_kill_distance_formatted'] = format_distance(player['longest_kill_distance']) if player['longest_kill_distance'] else 'N/A'
+    for location, map_stats in list(player['maps'].items()):
+        if map_stats['raid_count'] <= 0: del player['maps'][location]; continue
+        map_stats['survival_rate'] = f"{map_stats['survived'] / map_stats['raid_count'] * 100:.1f}%"
+        map_stats['kd_ratio'] = f"{map_stats['kills'] / map_stats['deaths']:.2f}" if map_stats['deaths'] > 0 else f"{map_stats['kills']}"
+
+def _copy_player(player):
+    return dict(player, raid_ids=player['raid_ids'].view(), maps={location: dict(map_stats) for location, map_stats in player['maps'].items()})
+
+def _bucket_view(bucket):
+    return {'keys': bucket['keys'].view(), 'raids': bucket['raids'].view(newest_first=True)}
+
+def snapshot_ingest_state(state, previous=None):
+    """Migawka stanu do publikacji (copy-on-write). Historia rajdów trafia do niej jako niezmienne widoki (SnapshotList,
+    SnapshotDict, zamrożone kawałki kolumn), więc koszt publikacji zależy od zmian, a nie od długości historii;
+    RaidSummary są współdzielone, bo nikt ich nie modyfikuje. Z poprzedniej migawki przejmujemy kubełki indeksów
+    i graczy, których nie dotknęło żadne odświeżenie od tamtej publikacji."""
+    live_indexes = state['indexes']; live_players = state['players_summary']
+    if previous is None:
+        indexes = {field: {value: _bucket_view(bucket) for value, bucket in index.items()} for field, index in live_indexes.items()}
+        players_summary = {nickname: _copy_player(player) for nickname, player in live_players.items()}
+    else:
+        indexes = {field: dict(index) for field, index in previous['indexes'].items()}
+        players_summary = dict(previous['players_summary'])
+        for field, value in state['dirty_buckets']:
+            bucket = live_indexes[field].get(value)
+            if bucket is None: indexes[field].pop(value, None)
+            else: indexes[field][value] = _bucket_view(bucket)
+            if field != 'nickname': continue
+            if value in live_players: players_summary[value] = _copy_player(live_players[value])
+            else: players_summary.pop(value, None)
+    state['dirty_buckets'] = set()
+    return {
+        'generation': previous['generation'] + 1 if previous else 1, # Rośnie przy każdej publikacji (nadpisywane w _publish_raid_data)
+        'all_raids': state['all_raids'].view(newest_first=True),
+        'players_summary': players_summary,
+        'errors': list(state['errors']),
+        'file_cache': state['file_cache'].view(), # Podsumowania rajdów po nazwie pliku
+        'file_signatures': state['file_signatures'].view(),
+        'indexes': indexes, # nickname/location/raid_result -> rajdy (najnowsze pierwsze)
+        'players_list': [players_summary[nickname] for _, nickname in state['player_order']], # Gracze posortowani po nicku
+        'columns': state['columns'].freeze(), # Dzieli zamknięte kawałki kolumn z poprzednimi migawkami
+        'leaderboards': {window: boards.top(state['file_cache']) for window, boards in state['leaderboards'].items()},
+        'timeseries': state['timeseries'].freeze(previous['timeseries'] if previous else None), # (gracz, mapa, okres) -> seria
+    }
+
+RAID_FILE_SETTLE_SECONDS = 2.0 # Plik młodszy niż tyle sekund może być jeszcze zapisywany przez mod - czekamy
+
+def stat_raid_files(filenames):
+    """Jak scan_raid_files, ale tylko dla podanych nazw (brakujące pliki są pomijane)."""
+    signatures = {}; catalog = None
+    for filename in filenames:
+        if not fnmatch.fnmatch(filename, RAID_FILE_PATTERN): continue
+        try: stat = os.stat(os.path.join(DEBUG_LOGS_FOLDER, filename))
+        except FileNotFoundError:
+            # Usunięcie pliku przez archiwizację to nie usunięcie rajdu
+            if catalog is None: catalog = load_raid_archive_catalog()
+            if filename in catalog: signatures[filename] = catalog[filename][3:]
+            continue
+        signatures[filename] = (stat.st_mtime_ns, stat.st_size)
+    return signatures
+
+def refresh_raid_data(state, filenames=None, settle_seconds=None):
+    """Synchronizuje stan z folderem logów. Parsuje tylko nowe/zmienione pliki i zwraca ich liczbę (łącznie z usuniętymi).
+    filenames ogranicza sprawdzanie do wskazanych plików (zdarzenia watchera) zamiast skanować cały folder.
+    Pliki zmodyfikowane w ciągu ostatnich settle_seconds są pomijane i trafiają do state['unsettled_files']."""
+    with timed_stage('refresh'): return _refresh_raid_data(state, filenames, settle_seconds)
+
+def _refresh_raid_data(state, filenames, settle_seconds):
+    settle_seconds = RAID_FILE_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+    known_files = state['file_signatures']
+    with timed_stage('scan'):
+        if filenames is None:
+            current_files = scan_raid_files()
+            removed = [filename for filename in known_files if filename not in current_files]
+        else:
+            current_files = stat_raid_files(filenames)
+            removed = [filename for filename in filenames if filename in known_files and filename not in current_files]
+    changed = [filename for filename, signature in current_files.items() if known_files.get(filename) != signature]
+    settle_limit_ns = time.time_ns() - int(settle_seconds * 1e9)
+    state['unsettled_files'] = [filename for filename in changed if current_files[filename][0] > settle_limit_ns]
+    if state['unsettled_files']: changed = [filename for filename in changed if current_files[filename][0] <= settle_limit_ns]
+    state['new_raids'] = []; state['changes'] = ([], [])
+    if not removed and not changed: return 0
+    new_files = {filename for filename in changed if filename not in known_files}
+
+    touched_players = set()
+    changed.sort(key=get_timestamp_from_filename)
+    conn = _open_raid_index_safe()
+    try:
+        # Poprzednie wersje plików odejmujemy z wejściami agregatów z indeksu, zanim load_raid_files nadpisze ich wpisy
+        dropped_files = [filename for filename in removed + changed if filename in known_files]
+        inputs = load_raid_inputs(conn, {filename: known_files[filename] for filename in dropped_files if filename in state['file_cache']})
+        dropped = [(filename, inputs.get(filename)) for filename in dropped_files]
+        aggregate_started = time.perf_counter()
+        for filename, raid_inputs in dropped: _remove_raid(state, filename, raid_inputs, touched_players)
+        aggregate_seconds = time.perf_counter() - aggregate_started
+        loaded = [(filename, current_files[filename], processed_data, error, raid_inputs)
+                  for filename, processed_data, error, raid_inputs in load_raid_files(conn, {filename: current_files[filename] for filename in changed})]
+        state['changes'] = (dropped, loaded)
+        aggregate_started = time.perf_counter()
+        _apply_loaded_raids(state, loaded, new_files, touched_players)
+        aggregate_seconds += time.perf_counter() - aggregate_started
+        if conn is not None:
+            try:
+                conn.executemany("DELETE FROM raids WHERE filename = ?", [(filename,) for filename in removed])
+                conn.commit()
+            except sqlite3.Error as e: print(f"OSTRZEŻENIE: Nie można zaktualizować indeksu rajdów: {e}")
+    finally:
+        if conn is not None: conn.close()
+    aggregate_started = time.perf_counter()
+    _finalize_raid_changes(state, touched_players)
+    observe_metric('statsmods_stage_seconds', aggregate_seconds + time.perf_counter() - aggregate_started, stage='aggregate')
+    return len(removed) + len(changed)
+
+def _apply_loaded_raids(state, loaded, new_files, touched_players):
+    """Wprowadza do stanu wczytane pliki (nazwa, sygnatura, podsumowanie, błąd, wejścia agregatów); ich poprzednie wersje
+    są już usunięte."""
+    for filename, signature, processed_data, error, inputs in loaded:
+        # Sygnaturę zapisujemy także dla błędnych plików - wrócimy do nich dopiero po ich zmianie
+        state['file_signatures'][filename] = signature
+        if error: state['file_errors'][filename] = f"{filename}: {error}"
         if processed_data:
-            all_processed_raids.append(processed_data)
-            processed_files_cache[filename] = processed_data # Zapisz w cache
+            _add_raid(state, processed_data, inputs, touched_players)
+            if filename in new_files: state['new_raids'].append(processed_data)
 
-    all_processed_raids.sort(key=lambda r: r.get('timestamp', datetime.datetime.min))
+def _finalize_raid_changes(state, touched_players):
+    for nickname in touched_players: _finalize_player(state, nickname)
+    state['errors'] = [state['file_errors'][filename] for filename in sorted(state['file_errors'], key=get_timestamp_from_filename)]
 
-    for raid_data in all_processed_raids:
-        nickname = raid_data.get('nickname')
-        if nickname:
-            player = players_summary[nickname]
-            player['raid_ids'].append(raid_data['filename']); player['raid_count'] += 1
-            player['latest_level'] = raid_data.get('level'); player['latest_side'] = raid_data.get('side')
-            player['latest_total_experience'] = raid_data.get('total_experience', 0)
-            player['latest_total_experience_formatted'] = format_exp(player['latest_total_experience']) # Formatuj EXP
-            player['latest_timestamp'] = raid_data.get('timestamp', datetime.datetime.min)
-            player['overall_stats_latest'] = raid_data.get('overall_stats', {})
-            player['total_kills'] += raid_data.get('kills_count', 0)
-            victims = raid_data.get('victims', [])
-            for victim in victims:
-                if victim.get('BodyPart') == 'Head': player['total_headshots'] += 1
-            raid_result = raid_data.get('raid_result')
-            if raid_result == 'Survived': player['total_survived'] += 1
-            else: player['total_deaths'] += 1
-
-    for nick, data in players_summary.items():
-        if data['total_deaths'] > 0: data['calculated_kd'] = f"{data['total_kills'] / data['total_deaths']:.2f}"
-        else: data['calculated_kd'] = f"{data['total_kills']}"
-
-    all_processed_raids.sort(key=lambda r: r.get('timestamp', datetime.datetime.min), reverse=True)
+def apply_raid_changes(state, removed, loaded):
+    """Nakłada na stan gotowe zmiany (np. z dziennika współdzielonego cache) tak, jak zrobiłoby to odświeżenie folderu:
+    removed - (nazwa, wejścia agregatów) poprzednich wersji usuniętych i zmienionych plików,
+    loaded - (nazwa, sygnatura, RaidSummary lub None, błąd, wejścia agregatów) dla nowych i zmienionych plików."""
+    new_files = {filename for filename, _, _, _, _ in loaded if filename not in state['file_signatures']}
+    state['new_raids'] = []; state['changes'] = (removed, loaded)
+    touched_players = set()
+    for filename, inputs in removed: _remove_raid(state, filename, inputs, touched_players)
+    _apply_loaded_raids(state, loaded, new_files, touched_players)
+    _finalize_raid_changes(state, touched_players)
+
+def load_all_raid_data():
+    """Pełne wczytanie od zera (bez wykorzystania stanu przyrostowego)."""
+    state = _new_ingest_state()
+    with timed_stage('load_all_raid_data'): refresh_raid_data(state, settle_seconds=0)
     # Zwracamy też cache, aby endpoint API nie musiał ponownie przetwarzać plików
-    return all_processed_raids, players_summary, errors, processed_files_cache
+    return state['all_raids'].view(newest_first=True), state['players_summary'], state['errors'], state['file_cache']
 
-# Globalny cache, aby uniknąć wielokrotnego ładowania przy każdym requescie
+# Globalny cache, aby uniknąć wielokrotnego ładowania przy każdym requescie.
+# RAID_INGEST_STATE jest roboczym stanem budującego wątku (tylko pod RAID_INGEST_LOCK); requesty czytają wyłącznie
+# RAID_DATA_CACHE - niezmienną migawkę podmienianą jednym przypisaniem, więc nigdy nie widzą stanu w połowie odświeżenia.
+RAID_INGEST_STATE = _new_ingest_state()
+RAID_INGEST_LOCK = threading.RLock() # Stan modyfikuje jednocześnie tylko jeden wątek (request lub watcher)
 RAID_DATA_CACHE = {}
 LAST_CACHE_UPDATE = datetime.datetime.min
-CACHE_TTL = datetime.timedelta(minutes=1) # Jak często odświeżać cache
+CACHE_TTL = datetime.timedelta(minutes=1) # Jak często sprawdzać folder pod kątem nowych plików
+CACHE_TTL_WITH_WATCHER = datetime.timedelta(minutes=15) # Przy działającym watcherze TTL jest tylko siatką bezpieczeństwa
+CACHE_REFRESH_IN_BACKGROUND = True # Przeterminowany cache: odświeżanie w tle, requesty dostają poprzednią migawkę
+_cache_refresh = {'thread': None, 'lock': threading.Lock(), 'published': None}
 
-def get_cached_raid_data():
-    """Pobiera dane z cache lub odświeża, jeśli cache jest przestarzały."""
+def _publish_raid_data(full=False, generation=None, etag=None):
+    """Publikuje migawkę RAID_INGEST_STATE. generation/etag podaje proces czytający dziennik współdzielonego cache -
+    wszystkie procesy publikują tę samą generację pod tym samym ETagiem."""
     global RAID_DATA_CACHE, LAST_CACHE_UPDATE
+    # Przyrostowo tylko względem migawki zbudowanej z tego samego stanu
+    previous = RAID_DATA_CACHE if not full and RAID_DATA_CACHE and RAID_DATA_CACHE is _cache_refresh['published'] else None
+    snapshot = snapshot_ingest_state(RAID_INGEST_STATE, previous)
+    snapshot['generation'] = generation or max(RAID_DATA_CACHE.get('generation', 0), _shared_cache['generation']) + 1
+    snapshot['etag'] = etag or f"g{snapshot['generation']}-{SNAPSHOT_ETAG_SALT}"
+    RAID_DATA_CACHE = _cache_refresh['published'] = snapshot
+    LAST_CACHE_UPDATE = datetime.datetime.now()
+
+def _refresh_cache(filenames=None):
+    """Odświeża stan, publikuje go i rozsyła nowe rajdy do subskrybentów strumienia. Wywoływać pod RAID_INGEST_LOCK.
+    Przy backendzie 'shared' proces, który nie wczytuje danych, tylko nakłada na swój stan nowe rekordy dziennika."""
+    translations_reloaded = reload_translations_if_changed()
+    if translations_reloaded: _load_raid_details.cache_clear(); _shared_cache.update(identity=None, read_log=None) # Ponowne sprawdzenie wersji dziennika
+    if RAID_CACHE_BACKEND == 'shared' and not is_shared_cache_ingester():
+        loaded = load_shared_snapshot() if RAID_DATA_CACHE else _wait_for_shared_snapshot()
+        if RAID_DATA_CACHE: return int(loaded)
+        if not is_shared_cache_ingester(): print("OSTRZEŻENIE: Brak migawki współdzielonego cache - proces wczytuje dane samodzielnie.")
+    if translations_reloaded:
+        # Nazwy są zapisane w przetworzonych rajdach - po zmianie tłumaczeń przetwarzamy wszystko od nowa
+        RAID_INGEST_STATE.clear(); RAID_INGEST_STATE.update(_new_ingest_state())
+        filenames = None
+    try: changed_count = refresh_raid_data(RAID_INGEST_STATE, filenames)
+    except Exception: _shared_cache['write_log'] = None; raise # Część zmian mogła ominąć dziennik - następny zapis będzie pełny
     now = datetime.datetime.now()
-    if not RAID_DATA_CACHE or now - LAST_CACHE_UPDATE > CACHE_TTL:
+    expired_count = advance_leaderboards(RAID_INGEST_STATE, now) # Rajdy wypadające z okien 24h/7d zmieniają rankingi bez nowych plików
+    if changed_count or expired_count or translations_reloaded or RAID_DATA_CACHE is not _cache_refresh['published']:
+        incremental = RAID_DATA_CACHE is _cache_refresh['published'] and not translations_reloaded
+        inc_metric('statsmods_cache_rebuilds_total', kind='incremental' if incremental else 'full')
+        _publish_raid_data(full=translations_reloaded)
+        if RAID_CACHE_BACKEND == 'shared' and is_shared_cache_ingester():
+            write_shared_snapshot(RAID_INGEST_STATE, RAID_DATA_CACHE, now, base=translations_reloaded)
+    if RAID_INGEST_STATE['new_raids'] and not translations_reloaded: broadcast_new_raids(RAID_INGEST_STATE['new_raids'])
+    return changed_count
+
+def _cache_ttl():
+    return CACHE_TTL_WITH_WATCHER if raid_watcher_running() else CACHE_TTL
+
+def _refresh_cache_if_stale():
+    """Odświeża cache, jeśli nadal jest przeterminowany. Pod blokadą - inny wątek mógł już odświeżyć."""
+    global LAST_CACHE_UPDATE
+    with RAID_INGEST_LOCK:
+        if RAID_DATA_CACHE and datetime.datetime.now() - LAST_CACHE_UPDATE <= _cache_ttl(): return
         print("Odświeżanie cache danych rajdów...")
-        all_raids, players, errors, file_cache = load_all_raid_data()
-        RAID_DATA_CACHE = {
-            'all_raids': all_raids,
-            'players_summary': players,
-            'errors': errors,
-            'file_cache': file_cache # Zapisujemy przetworzone pliki w cache
-        }
-        LAST_CACHE_UPDATE = now
-        print("Cache zaktualizowany.")
+        changed_count = _refresh_cache()
+        LAST_CACHE_UPDATE = datetime.datetime.now()
+        print(f"Cache zaktualizowany (zmienione pliki: {changed_count}).")
+
+def _background_cache_refresh():
+    try: _refresh_cache_if_stale()
+    except Exception as e: print(f"BŁĄD: Odświeżanie cache w tle nie powiodło się: {e}")
+
+def _start_background_cache_refresh():
+    """Single-flight: najwyżej jeden wątek odświeżający naraz, kolejne wywołania nic nie robią."""
+    with _cache_refresh['lock']:
+        thread = _cache_refresh['thread']
+        if thread is not None and thread.is_alive(): return
+        thread = threading.Thread(target=_background_cache_refresh, name='raid-cache-refresh', daemon=True)
+        _cache_refresh['thread'] = thread
+        thread.start()
+
+def get_cached_raid_data():
+    """Zwraca aktualną migawkę danych. Przeterminowana migawka jest zwracana od razu, a odświeżenie rusza w tle
+    (stale-while-revalidate); tylko przy pustym cache (start) request czeka na zbudowanie danych."""
+    if has_request_context() and 'raid_snapshot' in g: return g.raid_snapshot # Przypięta przez cached_by_snapshot
+    if RAID_CACHE_BACKEND == 'shared': _sync_shared_cache()
+    snapshot = RAID_DATA_CACHE
+    if snapshot and datetime.datetime.now() - LAST_CACHE_UPDATE <= _cache_ttl():
+        inc_metric('statsmods_cache_requests_total', result='hit')
+        return snapshot
+    if snapshot and CACHE_REFRESH_IN_BACKGROUND:
+        inc_metric('statsmods_cache_requests_total', result='stale')
+        _start_background_cache_refresh()
+        return snapshot
+    inc_metric('statsmods_cache_requests_total', result='miss')
+    _refresh_cache_if_stale()
     return RAID_DATA_CACHE
 
+# --- Współdzielony cache dla wielu procesów (backend 'shared') ---
+# Dane wczytuje tylko jeden proces - ten, który trzyma blokadę pliku <RAID_SHARED_CACHE_PATH>.lock. Plik jest dziennikiem:
+# migawka bazowa (podsumowania wszystkich plików, zapisywana atomowo przez os.replace), a po niej po jednym dopisanym
+# rekordzie na generację - tylko usunięte i wczytane pliki z danego odświeżenia. Pozostałe procesy co
+# RAID_SHARED_CACHE_CHECK_INTERVAL sprawdzają os.stat pliku, czytają rekordy od zapamiętanej pozycji i nakładają je na
+# własny stan (apply_raid_changes) bez parsowania logów, więc koszt generacji zależy od liczby zmian, a nie od historii.
+# Rekordy to zwykłe dane (krotki, słowniki, datetime) - pickle nie odwołuje się do klas z app.py (jak w indeksie SQLite).
+# Pełne dane rajdów procesy czytają ze wspólnego indeksu SQLite.
+# Gdy proces wczytujący zakończy działanie, blokadę przejmuje pierwszy proces, który ją sprawdzi.
+# Backendu 'shared' nie używać w procesie nadrzędnym, który potem forkuje workery (blokada przeszłaby na dzieci).
+RAID_CACHE_BACKEND = 'memory' # 'memory' (każdy proces wczytuje sam) | 'shared'
+RAID_SHARED_CACHE_CHECK_INTERVAL = 1.0 # sekundy
+RAID_SHARED_CACHE_WAIT_SECONDS = 30 # Ile proces czeka przy starcie na pierwszą migawkę, zanim wczyta dane sam
+RAID_SHARED_LOG_MAX_GROWTH = 1.0 # Dziennik jest zapisywany od nowa, gdy dopisane rekordy przekroczą tyle rozmiarów migawki bazowej
+SHARED_LOG_HEADER = struct.Struct('>16sQ') # Nagłówek rekordu: identyfikator dziennika, długość pickle
+_shared_cache = {'lock_file': None, 'pid': None, 'identity': None, 'generation': 0, 'next_check': 0.0, 'sync_lock': threading.Lock(),
+                 'write_log': None, 'write_size': 0, 'base_size': 0, # Proces wczytujący: bieżący dziennik (None - następny zapis pełny)
+                 'read_log': None, 'read_offset': 0, 'read_ok': False} # Pozostałe procesy: pozycja w dzienniku
+
+def _try_lock_file(f):
+    try:
+        if fcntl: fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt: f.seek(0); msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True # Bez obu modułów nie da się zablokować pliku - zakładamy jeden proces
+    except OSError: return False
+
+def is_shared_cache_ingester():
+    """Czy ten proces wczytuje dane do współdzielonego cache. Próbuje przejąć rolę, jeśli nikt jej nie pełni."""
+    global LAST_CACHE_UPDATE
+    if _shared_cache['pid'] != os.getpid(): _shared_cache.update(lock_file=None, pid=os.getpid(), write_log=None) # Po fork blokada należy do rodzica
+    if _shared_cache['lock_file'] is not None: return True
+    try: lock_file = open(RAID_SHARED_CACHE_PATH + '.lock', 'a+b')
+    except OSError as e: print(f"OSTRZEŻENIE: Nie można otworzyć blokady współdzielonego cache: {e}"); return False
+    if not _try_lock_file(lock_file): lock_file.close(); return False
+    _shared_cache['lock_file'] = lock_file
+    LAST_CACHE_UPDATE = datetime.datetime.min # Nowy proces wczytujący od razu sprawdza folder logów
+    print(f"Proces {os.getpid()} wczytuje dane rajdów dla współdzielonego cache.")
+    return True
+
+def _shared_log_entry(filename, signature, summary, error, inputs):
+    return (filename, signature, summary.__getstate__() if summary else None, error, inputs)
+
+def _shared_log_record(log_id, record):
+    payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+    return SHARED_LOG_HEADER.pack(log_id, len(payload)) + payload
+
+def write_shared_snapshot(state, snapshot, now, base=False):
+    """Dopisuje do dziennika współdzielonego cache zmiany z ostatniego odświeżenia (state['changes']) jako nową generację.
+    Migawka bazowa powstaje od nowa przy pierwszym zapisie procesu, na żądanie (base=True, np. po zmianie tłumaczeń),
+    po nieudanym dopisaniu i gdy dziennik urośnie o więcej niż RAID_SHARED_LOG_MAX_GROWTH jej rozmiarów."""
+    record = {'generation': snapshot['generation'], 'etag': snapshot['etag'], 'now': now}
+    base = (base or _shared_cache['write_log'] is None
+            or _shared_cache['write_size'] > (1 + RAID_SHARED_LOG_MAX_GROWTH) * _shared_cache['base_size'])
+    if not base:
+        removed, loaded = state['changes']
+        data = _shared_log_record(_shared_cache['write_log'], dict(record, base=False, removed=list(removed),
+                                                                   loaded=[_shared_log_entry(*entry) for entry in loaded]))
+        try:
+            with open(RAID_SHARED_CACHE_PATH, 'ab') as f:
+                # Plik podmieniony lub obcięty poza tym procesem - czytelnicy nie znajdą w nim poprzednich rekordów
+                if f.tell() != _shared_cache['write_size']: raise OSError(f"nieoczekiwany rozmiar dziennika {f.tell()}")
+                f.write(data)
+            _shared_cache['write_size'] += len(data)
+        except OSError as e:
+            print(f"OSTRZEŻENIE: Nie można dopisać do dziennika współdzielonego cache ({e}) - zapisuję pełną migawkę.")
+            base = True
+    if base:
+        log_id = os.urandom(16); errors = state['file_errors']
+        conn = _open_raid_index_safe()
+        try: inputs = load_raid_inputs(conn, {filename: state['file_signatures'][filename] for filename in state['file_cache']})
+        finally:
+            if conn is not None: conn.close()
+        # Błędy trzymamy w stanie z prefiksem nazwy pliku (patrz _apply_loaded_raids), w dzienniku - bez niego
+        loaded = [_shared_log_entry(filename, signature, state['file_cache'].get(filename),
+                                    errors[filename][len(filename) + 2:] if filename in errors else None, inputs.get(filename))
+                  for filename, signature in sorted(state['file_signatures'].items(), key=lambda item: get_timestamp_from_filename(item[0]))]
+        data = _shared_log_record(log_id, dict(record, base=True, version=compute_raid_index_version(), removed=[], loaded=loaded))
+        tmp_path = f"{RAID_SHARED_CACHE_PATH}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f: f.write(data)
+            os.replace(tmp_path, RAID_SHARED_CACHE_PATH) # Czytelnicy widzą stary albo nowy dziennik, nigdy połowę migawki bazowej
+        except OSError as e:
+            print(f"OSTRZEŻENIE: Nie można zapisać migawki współdzielonego cache: {e}")
+            with contextlib.suppress(OSError): os.remove(tmp_path)
+            _shared_cache['write_log'] = None
+            return
+        _shared_cache.update(write_log=log_id, write_size=len(data), base_size=len(data))
+    _shared_cache['generation'] = snapshot['generation']
+    inc_metric('statsmods_shared_snapshot_writes_total')
+
+def _read_shared_log(f):
+    """Rekordy dziennika od zapamiętanej pozycji. Gdy pierwszy nagłówek ma inny identyfikator (dziennik zapisany od nowa),
+    czytamy od początku, czyli od migawki bazowej. Niepełny rekord na końcu (trwa dopisywanie) czekamy do następnego razu."""
+    log_id, offset = _shared_cache['read_log'], _shared_cache['read_offset']
+    header = f.read(SHARED_LOG_HEADER.size)
+    if len(header) < SHARED_LOG_HEADER.size: return None, 0, []
+    if SHARED_LOG_HEADER.unpack(header)[0] != log_id: log_id, offset = SHARED_LOG_HEADER.unpack(header)[0], 0
+    records = []
+    f.seek(offset)
+    while True:
+        header = f.read(SHARED_LOG_HEADER.size)
+        if len(header) < SHARED_LOG_HEADER.size: break
+        record_log, length = SHARED_LOG_HEADER.unpack(header)
+        if record_log != log_id: raise ValueError("rekord z innego dziennika")
+        payload = f.read(length)
+        if len(payload) < length: break
+        records.append(pickle.loads(payload)); offset += SHARED_LOG_HEADER.size + length
+    return log_id, offset, records
+
+def _apply_shared_log_record(record):
+    """Nakłada rekord dziennika na RAID_INGEST_STATE (pod RAID_INGEST_LOCK). Zwraca True dla migawki bazowej."""
+    loaded = [(filename, tuple(signature), RaidSummary(values) if values is not None else None, error, inputs)
+              for filename, signature, values, error, inputs in record['loaded']]
+    if record['base']:
+        state = _new_ingest_state(); state['leaderboards'] = _new_leaderboards(record['now'])
+        apply_raid_changes(state, [], loaded)
+        RAID_INGEST_STATE.clear(); RAID_INGEST_STATE.update(state)
+    else: apply_raid_changes(RAID_INGEST_STATE, record['removed'], loaded)
+    advance_leaderboards(RAID_INGEST_STATE, record['now'])
+    return record['base']
+
+def load_shared_snapshot():
+    """Nakłada na stan tego procesu nowe rekordy dziennika współdzielonego cache i publikuje ostatnią generację
+    (z numerem i ETagiem procesu wczytującego). Zwraca True po publikacji."""
+    global LAST_CACHE_UPDATE
+    try: f = open(RAID_SHARED_CACHE_PATH, 'rb')
+    except FileNotFoundError: return False
+    except OSError as e: print(f"OSTRZEŻENIE: Nie można otworzyć dziennika współdzielonego cache: {e}"); return False
+    with f, RAID_INGEST_LOCK:
+        stat = os.fstat(f.fileno()); identity = (stat.st_ino, stat.st_size)
+        if identity == _shared_cache['identity']:
+            LAST_CACHE_UPDATE = datetime.datetime.now(); return False
+        _shared_cache['identity'] = identity
+        try: log_id, offset, records = _read_shared_log(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError) as e:
+            print(f"OSTRZEŻENIE: Nie można wczytać dziennika współdzielonego cache: {e}")
+            _shared_cache['read_log'] = None; return False
+        _shared_cache.update(read_log=log_id, read_offset=offset)
+        previous = RAID_DATA_CACHE; new_raids = []; last = None
+        for record in records:
+            if record['base']:
+                _shared_cache['read_ok'] = record['version'] == compute_raid_index_version()
+                if not _shared_cache['read_ok']:
+                    print("OSTRZEŻENIE: Dziennik współdzielonego cache pochodzi z innej wersji kodu lub tłumaczeń - pomijam.")
+            if not _shared_cache['read_ok']: continue
+            if _apply_shared_log_record(record): new_raids = None # Po migawce bazowej nowe rajdy wyznaczamy z różnicy plików
+            elif new_raids is not None: new_raids.extend(RAID_INGEST_STATE['new_raids'])
+            last = record
+        if last is None: return False
+        inc_metric('statsmods_shared_snapshot_loads_total')
+        _publish_raid_data(full=new_raids is None, generation=last['generation'], etag=last['etag'])
+        _shared_cache['generation'] = last['generation']
+        file_cache = RAID_INGEST_STATE['file_cache']
+        if new_raids is None: new_raids = [raid for filename, raid in file_cache.items() if filename not in previous['file_cache']] if previous else []
+        else: new_raids = [raid for raid in new_raids if file_cache.get(raid['filename']) is raid] # Bez rajdów usuniętych w późniejszym rekordzie
+    if new_raids: broadcast_new_raids(new_raids) # Subskrybenci SSE podłączeni do tego procesu też dostają nowe rajdy
+    return True
+
+def _wait_for_shared_snapshot():
+    """Start procesu czytającego: czeka na pierwszą migawkę. False, jeśli jej nie ma (lub ten proces przejął wczytywanie)."""
+    deadline = time.monotonic() + RAID_SHARED_CACHE_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        if load_shared_snapshot(): return True
+        if is_shared_cache_ingester(): return False
+        time.sleep(0.2)
+    return False
+
+def _sync_shared_cache():
+    """Tani test w każdym requeście: najwyżej co RAID_SHARED_CACHE_CHECK_INTERVAL jeden os.stat (i wczytanie nowej generacji)."""
+    now = time.monotonic()
+    if now < _shared_cache['next_check']: return
+    _shared_cache['next_check'] = now + RAID_SHARED_CACHE_CHECK_INTERVAL
+    if is_shared_cache_ingester() or not _shared_cache['sync_lock'].acquire(blocking=False): return # Inny wątek już wczytuje
+    try: load_shared_snapshot()
+    finally: _shared_cache['sync_lock'].release()
+
+# --- Watcher folderu debug_logs ---
+# Zamiast czekać na TTL, watcher wprowadza do cache tylko utworzone/zmienione/usunięte pliki rajdów.
+# 'auto' = watchdog (inotify/FSEvents/ReadDirectoryChanges), jeśli jest zainstalowany, w przeciwnym razie polling.
+RAID_WATCHER_MODE = 'auto' # 'auto' | 'watchdog' | 'poll'
+RAID_WATCHER_POLL_INTERVAL = 2.0 # sekundy
+_raid_watcher = {'thread': None, 'observer': None, 'stop': threading.Event(), 'wakeup': threading.Event(), 'pending': set(), 'lock': threading.Lock()}
+
+def raid_watcher_running():
+    thread = _raid_watcher['thread']
+    return thread is not None and thread.is_alive()
+
+def _apply_watched_changes(filenames=None):
+    """Wprowadza zmiany do cache. Zwraca pliki, które jeszcze się zapisują (do ponownej próby)."""
+    with RAID_INGEST_LOCK:
+        changed_count = _refresh_cache(filenames)
+        if changed_count: print(f"Watcher: zaktualizowano cache (zmienione pliki: {changed_count}).")
+        return set(RAID_INGEST_STATE['unsettled_files'])
+
+def _raid_watcher_loop(use_events):
+    stop = _raid_watcher['stop']; wakeup = _raid_watcher['wakeup']
+    while not stop.is_set():
+        if use_events:
+            wakeup.wait(RAID_WATCHER_POLL_INTERVAL if _raid_watcher['pending'] else None)
+            if stop.is_set(): break
+            wakeup.clear()
+            time.sleep(0.2) # Zbieramy serię zdarzeń z jednego zapisu w jedną aktualizację
+            with _raid_watcher['lock']: pending, _raid_watcher['pending'] = _raid_watcher['pending'], set()
+            try: retry = _apply_watched_changes(pending)
+            except Exception as e: print(f"BŁĄD: Watcher nie mógł zaktualizować cache: {e}"); retry = pending
+            with _raid_watcher['lock']: _raid_watcher['pending'] |= retry
+        else:
+            try: _apply_watched_changes()
+            except Exception as e: print(f"BŁĄD: Watcher nie mógł zaktualizować cache: {e}")
+            stop.wait(RAID_WATCHER_POLL_INTERVAL)
+
+def start_raid_watcher(mode=None):
+    """Uruchamia watcher w wątku w tle (raz na proces). Pod gunicornem wywołać np. w post_fork."""
+    if raid_watcher_running(): return
+    mode = mode or RAID_WATCHER_MODE
+    if mode == 'auto': mode = 'watchdog' if watchdog_observers else 'poll'
+    if mode == 'watchdog' and not watchdog_observers:
+        print("OSTRZEŻENIE: Pakiet watchdog nie jest zainstalowany - watcher przechodzi w tryb polling.")
+        mode = 'poll'
+    _raid_watcher['stop'].clear()
+    if mode == 'watchdog':
+        class RaidFileEventHandler(watchdog_events.FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory: return
+                for path in (getattr(event, 'src_path', None), getattr(event, 'dest_path', None)):
+                    if path and fnmatch.fnmatch(os.path.basename(path), RAID_FILE_PATTERN):
+                        with _raid_watcher['lock']: _raid_watcher['pending'].add(os.path.basename(path))
+                _raid_watcher['wakeup'].set()
+        observer = watchdog_observers.Observer()
+        observer.schedule(RaidFileEventHandler(), DEBUG_LOGS_FOLDER, recursive=False)
+        observer.daemon = True
+        observer.start()
+        _raid_watcher['observer'] = observer
+    thread = threading.Thread(target=_raid_watcher_loop, args=(mode == 'watchdog',), name='raid-watcher', daemon=True)
+    _raid_watcher['thread'] = thread
+    thread.start()
+    print(f"Watcher folderu {DEBUG_LOGS_FOLDER} uruchomiony (tryb: {mode}).")
+
+def stop_raid_watcher():
+    _raid_watcher['stop'].set(); _raid_watcher['wakeup'].set()
+    if _raid_watcher['observer'] is not None: _raid_watcher['observer'].stop(); _raid_watcher['observer'] = None
+    if _raid_watcher['thread'] is not None: _raid_watcher['thread'].join(timeout=5); _raid_watcher['thread'] = None
+
+def get_raid_details(filename):
+    """Pełne dane znanego rajdu (LRU). None, jeśli plik nie jest w cache lub nie da się go wczytać."""
+    snapshot = RAID_DATA_CACHE
+    signature = snapshot.get('file_signatures', {}).get(filename)
+    if signature is None or filename not in snapshot['file_cache']: return None
+    try: return _load_raid_details(filename, signature)
+    except ValueError as e:
+        print(f"OSTRZEŻENIE: Nie można wczytać szczegółów rajdu {filename}: {e}")
+        return None
+
+# --- Strumień SSE nowych rajdów ---
+# Każdy subskrybent ma własną kolejkę; wczytanie rajdu serializuje komunikat raz i wrzuca go do wszystkich kolejek.
+# Wątki obsługujące strumienie czekają tylko na swoją kolejkę - nigdy na RAID_INGEST_LOCK.
+RAID_STREAM_HEARTBEAT_SECONDS = 15
+RAID_STREAM_QUEUE_SIZE = 100 # Wolny klient traci nadmiarowe komunikaty zamiast blokować rozsyłanie
+RAID_STREAM_MAX_SUBSCRIBERS = 200
+RAID_STREAM_MAX_BATCH = 20 # Przy masowym wczytaniu (np. start) rozsyłamy tylko najnowsze rajdy
+_raid_stream_subscribers = set()
+_raid_stream_lock = threading.Lock()
+
+def build_recent_raid_summary(raid, players_summary):
+    """Zwarte podsumowanie rajdu dla listy ostatnich rajdów (strona główna i strumień SSE)."""
+    nickname = raid.get('nickname')
+    player_info = players_summary.get(nickname, {})
+    return {
+        'filename': raid['filename'], 'timestamp_formatted': raid.get('timestamp_formatted', 'N/A'),
+        'location': raid['location'], 'nickname': nickname, 'level': player_info.get('latest_level', 'N/A'),
+        'side': player_info.get('latest_side', 'N/A'), 'raid_count': player_info.get('raid_count', 0),
+        'exp': raid.get('total_session_exp_calculated', 0),
+        'map_image_filename': get_map_image_url(raid['location'])
+    }
+
+def subscribe_raid_stream(subscriber):
+    """Rejestruje subskrybenta - dowolny obiekt z put_nowait zgłaszającym queue.Full. False, gdy osiągnięto limit."""
+    with _raid_stream_lock:
+        if len(_raid_stream_subscribers) >= RAID_STREAM_MAX_SUBSCRIBERS: return False
+        _raid_stream_subscribers.add(subscriber)
+    return True
+
+def unsubscribe_raid_stream(subscriber):
+    with _raid_stream_lock: _raid_stream_subscribers.discard(subscriber)
+
+def broadcast_new_raids(raids):
+    with _raid_stream_lock: subscribers = list(_raid_stream_subscribers)
+    if not subscribers: return
+    newest = sorted(raids, key=_raid_sort_key)[-RAID_STREAM_MAX_BATCH:]
+    players_summary = RAID_DATA_CACHE['players_summary']
+    messages = []
+    for raid in newest:
+        summary = build_recent_raid_summary(raid, players_summary)
+        summary['side_translated'] = get_item_name(summary['side'])
+        messages.append(f"id: {raid['filename']}\nevent: raid\ndata: {json.dumps(summary, ensure_ascii=False)}\n\n")
+    for subscriber in subscribers:
+        for message in messages:
+            try: subscriber.put_nowait(message)
+            except queue.Full: break
+
+# --- Stronicowanie historii rajdów (keyset po (timestamp, filename)) ---
+RAID_PAGE_SIZE = 20
+RAID_PAGE_MAX_SIZE = 200
+# Kolumny widoku listy - pełne dane rajdu są dostępne przez /api/raid/<filename>
+RAID_SUMMARY_FIELDS = ('filename', 'timestamp_formatted', 'location', 'raid_result', 'play_time_formatted', 'kills_count',
+                       'total_session_exp_calculated', 'total_session_exp_formatted')
+
+def encode_raid_cursor(raid_data):
+    timestamp, filename = _raid_sort_key(raid_data)
+    return base64.urlsafe_b64encode(json.dumps([timestamp.isoformat(), filename]).encode('utf-8')).decode('ascii')
+
+def decode_raid_cursor(cursor):
+    """Odwrotność encode_raid_cursor. Rzuca ValueError dla nieprawidłowego kursora."""
+    try:
+        timestamp, filename = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return (datetime.datetime.fromisoformat(timestamp), str(filename))
+    except (TypeError, ValueError, UnicodeError) as e: raise ValueError(f"Nieprawidłowy kursor: {e}")
+
+def parse_date_param(value, end_of_day=False):
+    """Akceptuje 'RRRR-MM-DD', pełną datę ISO lub timestamp w ms. Data bez godziny z end_of_day obejmuje cały dzień."""
+    if not value: return None
+    if value.isdigit(): return datetime.datetime.fromtimestamp(int(value) / 1000)
+    parsed = datetime.datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10: parsed += datetime.timedelta(days=1, microseconds=-1)
+    return parsed
+
+def query_raid_page(bucket, cursor=None, location=None, result=None, date_from=None, date_to=None, limit=None):
+    """Zwraca (rajdy od najnowszego, następny kursor lub None). Zakres dat i kursor wyznacza bisect, filtry sprawdzane są tylko w oknie."""
+    keys, raids = bucket['keys'], bucket['raids']
+    limit = limit or RAID_PAGE_SIZE
+    upper = bisect.bisect_left(keys, cursor) if cursor else len(keys) # Tylko rajdy starsze niż kursor
+    if date_to: upper = min(upper, bisect.bisect_right(keys, (date_to, chr(sys.maxunicode))))
+    lower = bisect.bisect_left(keys, (date_from, '')) if date_from else 0
+    page = []; has_more = False
+    for position in range(upper - 1, lower - 1, -1):
+        raid_data = raids[len(raids) - 1 - position]
+        if location and location not in (raid_data.get('location'), raid_data.get('location_id')): continue
+        if result and raid_data.get('raid_result') != result: continue
+        if len(page) == limit: has_more = True; break
+        page.append(raid_data)
+    return page, (encode_raid_cursor(page[-1]) if has_more else None)
+
+def project_raid(raid_data, fields):
+    """Zwraca tylko wybrane pola rajdu (None = pełne dane, wczytywane na żądanie)."""
+    if fields is None: return get_raid_details(raid_data['filename']) or raid_data.to_dict()
+    projected = {}
+    for field in fields:
+        if field == 'total_session_exp_formatted': projected[field] = format_exp(raid_data.get('total_session_exp_calculated', 0))
+        elif field in raid_data: projected[field] = raid_data[field]
+    return projected
+
+# --- Eksport pełnych danych rajdów (NDJSON / Parquet) ---
+# Rajdy są czytane partiami z indeksu SQLite (jedno zapytanie na partię, z pominięciem LRU szczegółów), a brakujące
+# wpisy przetwarzane z pliku - w pamięci jest naraz co najwyżej jedna partia, niezależnie od długości historii.
+EXPORT_BATCH_SIZE = 200
+EXPORT_PARQUET_TYPES = { # Typy kolumn skalarnych; pozostałe pola (listy, słowniki) trafiają do Parquet jako tekst JSON
+    'timestamp': 'timestamp', 'level': 'int64', 'total_experience': 'int64', 'registration_date_ts': 'int64', 'last_session_date_ts': 'int64',
+    'total_session_exp_from_json': 'int64', 'total_session_exp_calculated': 'int64', 'kills_count': 'int64', 'player_count_in_raid': 'int64',
+    'play_time_seconds': 'float64', 'karma_value': 'float64', 'session_exp_mult': 'float64', 'experience_bonus_mult': 'float64',
+}
+
+def parse_export_filters(args):
+    """Filtry eksportu z ?nickname=&map=&from=&to=&since= (lub opcji CLI). since = tylko rajdy nowsze niż podany czas.
+    Rzuca ValueError dla nieprawidłowych dat."""
+    return {'nickname': args.get('nickname') or None, 'location': args.get('map') or None,
+            'date_from': parse_date_param(args.get('from')), 'date_to': parse_date_param(args.get('to'), end_of_day=True),
+            'since': parse_date_param(args.get('since'))}
+
+def select_export_raids(cached_data, nickname=None, location=None, date_from=None, date_to=None, since=None):
+    """Podsumowania rajdów do eksportu, od najstarszego. Dla gracza zakres dat wyznacza bisect po kluczach jego kubełka."""
+    if nickname is not None:
+        bucket = cached_data['indexes']['nickname'].get(nickname)
+        if not bucket: return []
+        keys, raids = bucket['keys'], bucket['raids']
+        lower = bisect.bisect_right(keys, (since, chr(sys.maxunicode))) if since else 0
+        if date_from: lower = max(lower, bisect.bisect_left(keys, (date_from, '')))
+        upper = bisect.bisect_right(keys, (date_to, chr(sys.maxunicode))) if date_to else len(keys)
+        candidates = (raids[len(raids) - 1 - position] for position in range(lower, upper))
+    else:
+        candidates = (raid_data for raid_data in reversed(cached_data['all_raids'])
+                      if (not since or raid_data['timestamp'] > since) and (not date_from or raid_data['timestamp'] >= date_from)
+                      and (not date_to or raid_data['timestamp'] <= date_to))
+    return [raid_data for raid_data in candidates if not location or location in (raid_data.get('location'), raid_data.get('location_id'))]
+
+def iter_raid_details(cached_data, raids):
+    """Pełne dane (wynik process_single_raid_file) kolejnych rajdów. Połączenie z indeksem jest otwierane na partię,
+    bo generator odpowiedzi może być wznawiany w różnych wątkach serwera."""
+    signatures = cached_data['file_signatures']
+    for start in range(0, len(raids), EXPORT_BATCH_SIZE):
+        filenames = [raid_data['filename'] for raid_data in raids[start:start + EXPORT_BATCH_SIZE]]
+        rows = {}
+        conn = _open_raid_index_safe()
+        if conn is not None:
+            try:
+                rows = {row[0]: row[1:] for row in conn.execute(f"SELECT filename, mtime_ns, size, data FROM raids WHERE filename IN ({','.join('?' * len(filenames))})", filenames)}
+            except sqlite3.Error as e: print(f"OSTRZEŻENIE: Błąd odczytu indeksu przy eksporcie: {e}")
+            finally: conn.close()
+        for filename in filenames:
+            row = rows.pop(filename, None)
+            if row and row[2] is not None and signatures.get(filename) == (row[0], row[1]):
+                try: yield pickle.loads(row[2]); continue
+                except (pickle.UnpicklingError, EOFError) as e: print(f"OSTRZEŻENIE: Błąd odczytu indeksu dla {filename}: {e}")
+            processed_data, _ = process_single_raid_file(os.path.join(DEBUG_LOGS_FOLDER, filename))
+            if processed_data: yield processed_data
+
+def _export_json_default(value):
+    if isinstance(value, datetime.datetime): return value.isoformat()
+    raise TypeError(f"Typ {type(value).__name__} nie jest serializowalny do JSON")
+
+def export_raid_json(raid_data):
+    return json.dumps(raid_data, ensure_ascii=False, separators=(',', ':'), default=_export_json_default)
+
+def iter_export_ndjson(cached_data, raids):
+    """NDJSON: jeden rajd na linię, wysyłany partiami po EXPORT_BATCH_SIZE linii."""
+    lines = []
+    for raid_data in iter_raid_details(cached_data, raids):
+        lines.append(export_raid_json(raid_data))
+        if len(lines) >= EXPORT_BATCH_SIZE: yield '\n'.join(lines) + '\n'; lines = []
+    if lines: yield '\n'.join(lines) + '\n'
+
+def _parquet_value(value, column_type):
+    if column_type == 'timestamp': return value if isinstance(value, datetime.datetime) and value != datetime.datetime.min else None
+    if value is None or column_type == 'float64': return value
+    if column_type == 'int64': return int(value)
+    return value if isinstance(value, str) else export_raid_json(value)
+
+def write_raids_parquet(path, cached_data, raids):
+    """Zapisuje rajdy do pliku Parquet partiami (row group na partię). Zwraca liczbę zapisanych rajdów."""
+    if pyarrow is None: raise RuntimeError("Eksport do Parquet wymaga pakietu pyarrow (pip install pyarrow).")
+    types = {'timestamp': pyarrow.timestamp('ms'), 'int64': pyarrow.int64(), 'float64': pyarrow.float64(), 'string': pyarrow.string()}
+    writer = columns = None; batch = []; count = 0
+    try:
+        for raid_data in itertools.chain(iter_raid_details(cached_data, raids), [None]):
+            if raid_data is not None:
+                if columns is None: # Kolejność i zestaw pól z pierwszego rajdu - process_single_raid_file zawsze zwraca te same klucze
+                    columns = [(name, EXPORT_PARQUET_TYPES.get(name, 'string')) for name in raid_data]
+                    writer = pyarrow.parquet.ParquetWriter(path, pyarrow.schema([(name, types[column_type]) for name, column_type in columns]))
+                batch.append({name: _parquet_value(raid_data.get(name), column_type) for name, column_type in columns})
+            if batch and (raid_data is None or len(batch) >= EXPORT_BATCH_SIZE):
+                writer.write_table(pyarrow.Table.from_pylist(batch, schema=writer.schema)); count += len(batch); batch = []
+    finally:
+        if writer is not None: writer.close()
+    return count
+
 def get_map_image_url(location_name):
     filename = MAP_IMAGES.get(location_name, MAP_IMAGES["unknown"])
     return f"images/maps/{filename}"
@@ -425,8 +2469,142 @@ def get_map_image_url(location_name):
 def inject_utilities():
     return {'now': datetime.datetime.utcnow, 'get_map_image_url': get_map_image_url, 'get_item_name': get_item_name, 'format_exp': format_exp}
 
+# --- Pomiar renderowania i profilowanie pojedynczego żądania ---
+REQUEST_PROFILING = False # True: ?profile=1 (lub ?profile=tottime) zwraca raport cProfile zamiast odpowiedzi; w trybie debug zawsze
+REQUEST_PROFILE_LINES = 60
+REQUEST_PROFILE_SORT_KEYS = ('cumulative', 'tottime', 'calls', 'ncalls')
+
+@before_render_template.connect_via(app)
+def _render_started(sender, template, context, **extra):
+    g.setdefault('render_started', []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def _render_finished(sender, template, context, **extra):
+    started = g.get('render_started')
+    if started:
+        observe_metric('statsmods_render_seconds', time.perf_counter() - started.pop(), endpoint=request.endpoint or '', template=template.name or '')
+
+@app.before_request
+def _start_request_profile():
+    if 'profile' not in request.args or not (REQUEST_PROFILING or app.debug): return
+    profiler = cProfile.Profile()
+    try: profiler.enable()
+    except ValueError: return # Inny profiler jest już aktywny (np. równoległe żądanie z ?profile)
+    g.request_profiler = profiler
+
+@app.after_request
+def _finish_request_profile(response):
+    profiler = g.pop('request_profiler', None)
+    if profiler is None: return response
+    profiler.disable()
+    sort_key = request.args.get('profile') if request.args.get('profile') in REQUEST_PROFILE_SORT_KEYS else 'cumulative'
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats(sort_key).print_stats(REQUEST_PROFILE_LINES)
+    return Response(f"{request.method} {request.full_path} -> {response.status}\n\n{output.getvalue()}", mimetype='text/plain')
+
+# --- Cache HTTP: ETagi, 304 i kompresja ---
+# Strony i API liczone z migawki mają ETag jej generacji, a wyrenderowana odpowiedź jest pamiętana do następnej publikacji,
+# więc powtórne żądanie tej samej strony nie uruchamia Jinja ani serializacji JSON. Szczegóły rajdu mają ETag z sygnatury pliku.
+HTTP_CACHE_ENABLED = True
+HTTP_COMPRESSION_MIN_SIZE = 1024 # bajty; mniejszych odpowiedzi nie opłaca się kompresować
+HTTP_GZIP_LEVEL = 6
+HTTP_BROTLI_QUALITY = 5
+HTTP_COMPRESSIBLE_MIMETYPES = frozenset(('text/html', 'text/plain', 'text/css', 'text/javascript', 'application/javascript', 'application/json'))
+RAID_DETAILS_MAX_AGE = 7 * 24 * 3600 # Plik rajdu się nie zmienia; nowe tłumaczenia lub kod dają nowy ETag
+RENDERED_PAGE_CACHE_SIZE = 128 # Ile wyrenderowanych odpowiedzi (URL-i) z bieżącej migawki pamiętamy
+SNAPSHOT_ETAG_SALT = os.urandom(4).hex() # Procesy z backendem 'memory' numerują generacje niezależnie - ETagi nie mogą się pokryć
+_rendered_pages = {'etag': None, 'entries': OrderedDict(), 'lock': threading.Lock()}
+
+def snapshot_etag(snapshot):
+    return snapshot.get('etag') or f"g{snapshot.get('generation', 0)}"
+
+def raid_details_etag(filename, signature):
+    """ETag szczegółów rajdu: wersja kodu/tłumaczeń (jak dla indeksu) + nazwa i sygnatura pliku. Stały między procesami i restartami."""
+    return hashlib.sha1(f"{compute_raid_index_version()}:{filename}:{signature[0]}:{signature[1]}".encode('utf-8')).hexdigest()[:24]
+
+def negotiate_encoding(accept_encodings=None):
+    """'br', 'gzip' albo None wg Accept-Encoding (domyślnie bieżącego żądania Flaska)."""
+    accepted = request.accept_encodings if accept_encodings is None else accept_encodings
+    if brotli is not None and accepted['br']: return 'br'
+    return 'gzip' if accepted['gzip'] else None
+
+def compress_body(body, encoding):
+    if encoding == 'br': return brotli.compress(body, quality=HTTP_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=HTTP_GZIP_LEVEL, mtime=0)
+
+def matching_client_etag(etag, if_none_match=None):
+    """Wariant ETagu (zwykły lub skompresowany), który klient ma już w cache wg If-None-Match, albo None.
+    Porównanie słabe, bo proxy kompresujące odpowiedzi mogą osłabić ETag."""
+    if_none_match = request.if_none_match if if_none_match is None else if_none_match
+    return next((candidate for candidate in (etag, f"{etag}-gzip", f"{etag}-br") if if_none_match.contains_weak(candidate)), None)
+
+def not_modified_response(etag, cache_control):
+    response = Response(status=304)
+    response.set_etag(etag); response.headers['Cache-Control'] = cache_control; response.vary.add('Accept-Encoding')
+    return response
+
+def lookup_rendered_page(etag, key):
+    """Zapamiętana odpowiedź dla URL-a z migawki o danym ETagu albo None. Nowa migawka czyści pamięć."""
+    with _rendered_pages['lock']:
+        if _rendered_pages['etag'] != etag: _rendered_pages['etag'] = etag; _rendered_pages['entries'].clear()
+        entry = _rendered_pages['entries'].get(key)
+        if entry is not None: _rendered_pages['entries'].move_to_end(key)
+    return entry
+
+def store_rendered_page(etag, key, body, content_type):
+    entry = {'body': body, 'content_type': content_type, 'encoded': {}}
+    with _rendered_pages['lock']:
+        if _rendered_pages['etag'] == etag:
+            _rendered_pages['entries'][key] = entry
+            while len(_rendered_pages['entries']) > RENDERED_PAGE_CACHE_SIZE: _rendered_pages['entries'].popitem(last=False)
+    return entry
+
+def rendered_page_body(entry, encoding):
+    """Ciało zapamiętanej odpowiedzi w danym kodowaniu (skompresowane warianty liczone raz)."""
+    if not encoding: return entry['body']
+    if encoding not in entry['encoded']: entry['encoded'][encoding] = compress_body(entry['body'], encoding)
+    return entry['encoded'][encoding]
+
+def cached_by_snapshot(view):
+    """Dla tras, których odpowiedź zależy tylko od migawki i URL-a: 304 dla klientów z aktualną wersją,
+    a w pozostałych przypadkach odpowiedź z pamięci (ciało i jego skompresowane warianty)."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not HTTP_CACHE_ENABLED or g.get('request_profiler'): return view(*args, **kwargs)
+        snapshot = g.raid_snapshot = get_cached_raid_data() # Cała obsługa żądania widzi tę samą migawkę co ETag
+        etag = snapshot_etag(snapshot)
+        client_etag = matching_client_etag(etag)
+        if client_etag: return not_modified_response(client_etag, 'no-cache')
+        entry = lookup_rendered_page(etag, request.full_path)
+        if entry is None:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed: return response
+            entry = store_rendered_page(etag, request.full_path, response.get_data(), response.content_type)
+        encoding = negotiate_encoding() if len(entry['body']) >= HTTP_COMPRESSION_MIN_SIZE else None
+        response = Response(rendered_page_body(entry, encoding), content_type=entry['content_type'])
+        if encoding: response.headers['Content-Encoding'] = encoding
+        response.set_etag(f"{etag}-{encoding}" if encoding else etag) # Warianty z różnym kodowaniem muszą mieć różne silne ETagi
+        response.headers['Cache-Control'] = 'no-cache' # Przeglądarka może trzymać kopię, ale zawsze pyta o aktualność (304)
+        response.vary.add('Accept-Encoding')
+        return response
+    return wrapper
+
+@app.after_request
+def _compress_response(response):
+    """Kompresuje pozostałe odpowiedzi tekstowe (np. szczegóły rajdu, /metrics). Strumienie i pliki statyczne pomijamy."""
+    if not HTTP_CACHE_ENABLED or response.status_code != 200 or response.direct_passthrough or response.is_streamed: return response
+    if response.mimetype not in HTTP_COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers: return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None or response.content_length is None or response.content_length < HTTP_COMPRESSION_MIN_SIZE: return response
+    response.set_data(compress_body(response.get_data(), encoding)); response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag: response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
 # --- Trasy Aplikacji ---
 @app.route('/')
+@cached_by_snapshot
 def index():
     cached_data = get_cached_raid_data()
     all_raids = cached_data['all_raids']
@@ -434,46 +2612,31 @@ def index():
     errors = cached_data['errors']
 
     latest_raid = all_raids[0] if all_raids else None
-    recent_raids_data = []
     limit = 10
-    for raid in all_raids[:limit]:
-        nickname = raid.get('nickname')
-        player_info = players_summary.get(nickname, {})
-        raid_summary = {
-            'filename': raid['filename'], 'timestamp_formatted': raid.get('timestamp_formatted', 'N/A'),
-            'location': raid['location'], 'nickname': nickname, 'level': player_info.get('latest_level', 'N/A'),
-            'side': player_info.get('latest_side', 'N/A'), 'raid_count': player_info.get('raid_count', 0),
-            'exp': raid.get('total_session_exp_calculated', 0),
-            'map_image_filename': get_map_image_url(raid['location'])
-        }
-        recent_raids_data.append(raid_summary)
+    recent_raids_data = [build_recent_raid_summary(raid, players_summary) for raid in all_raids[:limit]]
     return render_template('index.html', latest_raid=latest_raid, recent_raids=recent_raids_data, errors=errors)
 
 @app.route('/players')
+@cached_by_snapshot
 def players_list():
     cached_data = get_cached_raid_data()
-    players_summary = cached_data['players_summary']
     errors = cached_data['errors']
-
-    players_list_data = []
-    for nickname, data in players_summary.items():
-        player_data = data.copy(); player_data['nickname'] = nickname
-        player_data['side_translated'] = get_item_name(player_data.get('latest_side', 'Unknown'))
-        players_list_data.append(player_data)
-    players_list_data.sort(key=lambda p: p['nickname'].lower())
-    return render_template('gracze.html', players_list=players_list_data, errors=errors)
+    # Lista jest utrzymywana posortowana przy wczytywaniu rajdów (nickname i side_translated już w środku)
+    return render_template('gracze.html', players_list=cached_data['players_list'], errors=errors)
 
 @app.route('/player/<nickname>')
+@cached_by_snapshot
 def player_details(nickname):
     cached_data = get_cached_raid_data()
-    all_raids = cached_data['all_raids']
     players_summary = cached_data['players_summary']
     errors = cached_data['errors']
     player_info = players_summary.get(nickname)
 
     if not player_info: abort(404, description="Gracz nie znaleziony")
 
-    player_raids = [raid for raid in all_raids if raid.get('nickname') == nickname]
+    # Na stronie renderujemy tylko pierwszą stronę historii - kolejne dociąga JS z /api/player/<nickname>/raids
+    player_bucket = cached_data['indexes']['nickname'][nickname]
+    player_raids, next_cursor = query_raid_page(player_bucket)
     latest_raid = player_raids[0] if player_raids else None
 
     # Statystyki pozostają takie same
@@ -483,10 +2646,15 @@ def player_details(nickname):
         'survival_rate': player_info.get('overall_stats_latest', {}).get('survival_rate', 'N/A'),
         'kd_ratio': player_info.get('calculated_kd', 'N/A'), 'headshots': player_info.get('total_headshots', 0),
         'longest_shot': player_info.get('overall_stats_latest', {}).get('longest_shot_formatted', 'N/A'),
+        'calculated_survival_rate': player_info.get('calculated_survival_rate', 'N/A'),
+        'longest_kill': player_info.get('longest_kill_distance_formatted', 'N/A'),
     }
+    # Rozbicie na mapy jest liczone przy wczytywaniu rajdów
+    player_maps = sorted(player_info.get('maps', {}).items(), key=lambda item: (-item[1]['raid_count'], item[0]))
 
     # Umiejętności są pobierane zawsze, szablon zdecyduje czy je pokazać
-    skills_changed = latest_raid.get('skills_changed', []) if latest_raid else []
+    latest_raid_details = get_raid_details(latest_raid['filename']) if latest_raid else None
+    skills_changed = latest_raid_details.get('skills_changed', []) if latest_raid_details else []
     achievements = [] # Placeholder
 
     # Zawsze renderuj 'profil.html'
@@ -496,28 +2664,42 @@ def player_details(nickname):
                            player_stats=player_stats,
                            latest_raid=latest_raid,
                            player_raids=player_raids,
+                           player_raids_next_cursor=next_cursor,
+                           player_maps=player_maps,
                            skills=skills_changed, # Przekazywane zawsze
                            achievements=achievements, # Przekazywane zawsze
                            errors=errors)
 
 # --- Nowy Endpoint API dla Modala ---
-@app.route('/api/raid/<path:filename>')
-def api_raid_details(filename):
+def resolve_raid_request(cached_data, filename):
+    """(bezpieczna nazwa pliku, sygnatura) dla żądania szczegółów rajdu. Nazwa None = ścieżka poza folderem logów,
+    sygnatura None = plik nieznany w migawce. Wspólne dla Flaska i ścieżki ASGI (asgi.py)."""
     # Sprawdzenie bezpieczeństwa ścieżki
     expected_prefix = os.path.abspath(DEBUG_LOGS_FOLDER)
     # Normalizuj filename, aby usunąć np. '../'
     safe_filename = os.path.normpath(filename).lstrip('/')
     abs_filepath = os.path.abspath(os.path.join(DEBUG_LOGS_FOLDER, safe_filename))
+    if not abs_filepath.startswith(expected_prefix): return None, None
+    return safe_filename, (cached_data['file_signatures'].get(safe_filename) if safe_filename in cached_data['file_cache'] else None)
 
-    if not abs_filepath.startswith(expected_prefix):
-         return jsonify(error="Nieprawidłowa ścieżka pliku.", data=None), 404
-
+@app.route('/api/raid/<path:filename>')
+def api_raid_details(filename):
     # Spróbuj pobrać dane z cache
     cached_data = get_cached_raid_data()
-    processed_data = cached_data['file_cache'].get(safe_filename)
+    safe_filename, signature = resolve_raid_request(cached_data, filename)
+    if safe_filename is None:
+         return jsonify(error="Nieprawidłowa ścieżka pliku.", data=None), 404
+    # Raz zapisany plik rajdu się nie zmienia - klient z aktualnym ETagiem nie potrzebuje nawet odczytu indeksu
+    cache_control = f"public, max-age={RAID_DETAILS_MAX_AGE}"
+    etag = raid_details_etag(safe_filename, signature) if signature else None
+    client_etag = matching_client_etag(etag) if etag and HTTP_CACHE_ENABLED else None
+    if client_etag: return not_modified_response(client_etag, cache_control)
+    processed_data = get_raid_details(safe_filename) if signature else None
 
     if processed_data:
-         return jsonify(error=None, data=processed_data)
+         response = jsonify(error=None, data=processed_data)
+         if HTTP_CACHE_ENABLED: response.set_etag(etag); response.headers['Cache-Control'] = cache_control
+         return response
     else:
         # Jeśli nie ma w cache (co nie powinno się zdarzyć przy poprawnym działaniu),
         # można spróbować przetworzyć na żądanie lub zwrócić błąd
@@ -527,9 +2709,270 @@ def api_raid_details(filename):
         # if processed_data: return jsonify(error=None, data=processed_data)
         return jsonify(error=f"Nie znaleziono przetworzonych danych dla pliku {safe_filename}.", data=None), 404
 
+def query_player_raids(cached_data, nickname, args):
+    """(treść odpowiedzi, status HTTP) dla historii rajdów gracza. Wspólne dla Flaska i ścieżki ASGI (asgi.py)."""
+    bucket = cached_data['indexes']['nickname'].get(nickname)
+    if not bucket: return {'error': "Gracz nie znaleziony.", 'data': None}, 404
+    try:
+        limit = min(max(int(args.get('limit', RAID_PAGE_SIZE)), 1), RAID_PAGE_MAX_SIZE)
+        cursor = decode_raid_cursor(args['cursor']) if args.get('cursor') else None
+        date_from = parse_date_param(args.get('from')); date_to = parse_date_param(args.get('to'), end_of_day=True)
+    except (ValueError, OverflowError, OSError) as e: return {'error': f"Nieprawidłowe parametry zapytania: {e}", 'data': None}, 400
+    fields_param = args.get('fields')
+    if fields_param == 'all': fields = None
+    elif fields_param: fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    else: fields = RAID_SUMMARY_FIELDS
+
+    page, next_cursor = query_raid_page(bucket, cursor=cursor, location=args.get('map'), result=args.get('result'),
+                                        date_from=date_from, date_to=date_to, limit=limit)
+    return {'error': None, 'data': [project_raid(raid_data, fields) for raid_data in page], 'next_cursor': next_cursor}, 200
+
+@app.route('/api/player/<nickname>/raids')
+@cached_by_snapshot
+def api_player_raids(nickname):
+    """Historia rajdów gracza: ?cursor=&limit=&map=&result=&from=&to=&fields=a,b|all"""
+    payload, status = query_player_raids(get_cached_raid_data(), nickname, request.args)
+    return jsonify(payload), status
+
+
+@app.route('/api/player/<nickname>/timeseries')
+@cached_by_snapshot
+def api_player_timeseries(nickname):
+    """Postęp gracza w czasie: ?bucket=day|week&map=&from=&to=&max_points= (długie zakresy są łączone w szersze kubełki)."""
+    cached_data = get_cached_raid_data()
+    if nickname not in cached_data['players_summary']: return jsonify(error="Gracz nie znaleziony.", data=None), 404
+    period = request.args.get('bucket') or 'day'
+    if period not in ANALYTICS_BUCKETS: return jsonify(error=f"bucket musi być jednym z: {', '.join(ANALYTICS_BUCKETS)}", data=None), 400
+    try:
+        date_from = parse_date_param(request.args.get('from')); date_to = parse_date_param(request.args.get('to'), end_of_day=True)
+        max_points = min(max(int(request.args.get('max_points', TIMESERIES_MAX_POINTS)), 1), TIMESERIES_MAX_POINTS_LIMIT)
+    except (ValueError, OverflowError, OSError) as e: return jsonify(error=f"Nieprawidłowe parametry zapytania: {e}", data=None), 400
+    location = request.args.get('map') or None
+    data = query_timeseries(cached_data['timeseries'], nickname, location, period, date_from, date_to, max_points)
+    return jsonify(error=None, data=dict(data, nickname=nickname, map=location))
+
+@app.route('/api/stream/raids')
+def api_stream_raids():
+    """Server-Sent Events: zdarzenie 'raid' z podsumowaniem każdego nowo wczytanego rajdu."""
+    subscriber = queue.Queue(maxsize=RAID_STREAM_QUEUE_SIZE)
+    if not subscribe_raid_stream(subscriber): return jsonify(error="Zbyt wielu subskrybentów strumienia.", data=None), 503
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try: yield subscriber.get(timeout=RAID_STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty: yield ": ping\n\n" # Podtrzymanie połączenia i wykrycie rozłączonych klientów
+        finally: unsubscribe_raid_stream(subscriber)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/export/raids')
+def api_export_raids():
+    """Pełne dane rajdów jako NDJSON, od najstarszego: ?nickname=&map=&from=&to=&since=. Nagłówek X-Export-Next-Since
+    podaje czas ostatniego wyeksportowanego rajdu - przekazany jako since zwróci przy następnej synchronizacji tylko nowe rajdy."""
+    cached_data = get_cached_raid_data()
+    try: raids = select_export_raids(cached_data, **parse_export_filters(request.args))
+    except (ValueError, OverflowError, OSError) as e: return jsonify(error=f"Nieprawidłowe parametry zapytania: {e}", data=None), 400
+    headers = {'Content-Disposition': 'attachment; filename=raids.ndjson', 'X-Export-Raids': str(len(raids))}
+    if raids: headers['X-Export-Next-Since'] = raids[-1]['timestamp'].isoformat()
+    return Response(iter_export_ndjson(cached_data, raids), mimetype='application/x-ndjson', headers=headers)
+
+@app.route('/metrics')
+def metrics():
+    """Metryki w formacie Prometheus. Nie wymusza odświeżenia cache - pokazuje stan ostatniej publikacji."""
+    cached_data = RAID_DATA_CACHE
+    gauges = {'statsmods_raids': len(cached_data.get('all_raids', ())), 'statsmods_players': len(cached_data.get('players_summary', ())),
+              'statsmods_raid_files_with_errors': len(cached_data.get('errors', ()))}
+    if cached_data: gauges['statsmods_cache_age_seconds'] = (datetime.datetime.now() - LAST_CACHE_UPDATE).total_seconds()
+    return Response(render_metrics(gauges), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+def _run_analytics(view, cached_data, args):
+    """Filtry wspólne dla wszystkich widoków: ?nickname=&map=&from=&to= (daty RRRR-MM-DD)."""
+    columns = cached_data['columns']
+    mask = _analytics_raid_mask(columns, nickname=args.get('nickname') or None, location=args.get('map') or None,
+                                date_from=parse_date_param(args.get('from')), date_to=parse_date_param(args.get('to'), end_of_day=True))
+    return ANALYTICS_VIEWS[view](columns, mask, args)
+
+@app.route('/api/analytics/<view>')
+@cached_by_snapshot
+def api_analytics(view):
+    """Statystyki przekrojowe: maps, kill-distances (?bins=&max_distance=), weapons (?limit=), body-parts, items (?limit=),
+    exp-per-minute (?bucket=day|week)."""
+    if view not in ANALYTICS_VIEWS: return jsonify(error=f"Nieznany widok analityki: {view}.", data=None), 404
+    cached_data = get_cached_raid_data()
+    try: data = _run_analytics(view, cached_data, request.args)
+    except (ValueError, OverflowError, OSError) as e: return jsonify(error=f"Nieprawidłowe parametry zapytania: {e}", data=None), 400
+    return jsonify(error=None, data=data)
+
+@app.route('/analytics')
+@cached_by_snapshot
+def analytics_page():
+    cached_data = get_cached_raid_data()
+    args = {key: value for key, value in request.args.items() if key in ('nickname', 'map', 'from', 'to') and value}
+    try:
+        views = {view: _run_analytics(view, cached_data, dict(args, limit=15)) for view in ('maps', 'weapons', 'body-parts', 'kill-distances', 'items')}
+        views['exp-per-minute'] = _run_analytics('exp-per-minute', cached_data, dict(args, bucket='week'))[-26:] # Ostatnie pół roku
+    except (ValueError, OverflowError, OSError) as e: abort(400, description=f"Nieprawidłowe parametry zapytania: {e}")
+    max_bin = max((row['kills'] for row in views['kill-distances']['bins']), default=0)
+    return render_template('analiza.html', views=views, filters=args, max_bin=max_bin,
+                           players=[player['nickname'] for player in cached_data['players_list']],
+                           locations=sorted(cached_data['indexes']['location']), errors=cached_data['errors'])
+
+@app.route('/api/leaderboards')
+@cached_by_snapshot
+def api_leaderboards():
+    """Rankingi serwera: ?window=all|7d|24h, opcjonalnie ?board=kills|kd|longest_shot|session_exp|map_raids i ?limit=."""
+    cached_data = get_cached_raid_data()
+    window = request.args.get('window') or 'all'
+    if window not in cached_data['leaderboards']: return jsonify(error=f"Nieznane okno rankingu: {window}.", data=None), 400
+    leaderboards = cached_data['leaderboards'][window]; boards = leaderboards['boards']
+    board = request.args.get('board')
+    if board is not None and board not in boards: return jsonify(error=f"Nieznany ranking: {board}.", data=None), 400
+    try: limit = min(max(int(request.args.get('limit', LEADERBOARD_SIZE)), 1), LEADERBOARD_SIZE)
+    except ValueError: return jsonify(error="Nieprawidłowy parametr limit.", data=None), 400
+    trim = lambda rows: {location: map_rows[:limit] for location, map_rows in rows.items()} if isinstance(rows, dict) else rows[:limit]
+    boards = {name: trim(rows) for name, rows in boards.items() if board is None or name == board}
+    return jsonify(error=None, data={'window': window, 'since': leaderboards['since'].isoformat() if leaderboards['since'] else None, 'boards': boards})
+
+@app.route('/leaderboards')
+@cached_by_snapshot
+def leaderboards_page():
+    cached_data = get_cached_raid_data()
+    window = request.args.get('window') or 'all'
+    if window not in cached_data['leaderboards']: abort(404, description="Nieznane okno rankingu")
+    return render_template('rankingi.html', window=window, windows=list(LEADERBOARD_WINDOWS), leaderboards=cached_data['leaderboards'][window],
+                           kd_min_raids=LEADERBOARD_KD_MIN_RAIDS, errors=cached_data['errors'])
+
+# --- Komendy CLI: flask --app app index rebuild|verify ---
+index_cli = AppGroup('index', help="Trwały indeks przetworzonych rajdów.")
+
+@index_cli.command('rebuild')
+@click.option('--full', is_flag=True, help="Wyczyść indeks i przetwórz wszystkie pliki od nowa.")
+@click.option('--workers', type=int, default=None, help="Liczba procesów parsujących (domyślnie PARSE_WORKERS).")
+def index_rebuild_command(full, workers):
+    """Aktualizuje indeks: przetwarza nowe/zmienione pliki i usuwa wpisy po usuniętych."""
+    current_files = scan_raid_files()
+    conn = open_raid_index()
+    try:
+        if full: conn.execute("DELETE FROM raids")
+        orphaned = [row[0] for row in conn.execute("SELECT filename FROM raids") if row[0] not in current_files]
+        conn.executemany("DELETE FROM raids WHERE filename = ?", [(filename,) for filename in orphaned])
+        ordered = {filename: current_files[filename] for filename in sorted(current_files, key=get_timestamp_from_filename)}
+        errors = sum(1 for _, _, error, _ in load_raid_files(conn, ordered, workers) if error)
+        conn.commit()
+    finally: conn.close()
+    click.echo(f"Indeks: {len(current_files)} plików, {errors} z błędami, usunięto {len(orphaned)} nieaktualnych wpisów.")
+
+@index_cli.command('verify')
+@click.option('--deep', is_flag=True, help="Dodatkowo przetwórz każdy plik i porównaj wynik z indeksem.")
+def index_verify_command(deep):
+    """Sprawdza indeks bez jego modyfikowania. Kod wyjścia 1, jeśli coś jest nieaktualne."""
+    if not os.path.exists(RAID_INDEX_PATH): raise click.ClickException(f"Brak indeksu: {RAID_INDEX_PATH}")
+    current_files = scan_raid_files()
+    conn = sqlite3.connect(RAID_INDEX_PATH)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        version_ok = bool(row) and row[0] == compute_raid_index_version()
+        entries = {r[0]: r[1:] for r in conn.execute("SELECT filename, content_hash, data FROM raids")}
+    finally: conn.close()
+    missing = [filename for filename in current_files if filename not in entries]
+    orphaned = [filename for filename in entries if filename not in current_files]
+    stale = []
+    for filename in current_files:
+        if filename not in entries: continue
+        content_hash, data = entries[filename]
+        filepath = os.path.join(DEBUG_LOGS_FOLDER, filename)
+        if hash_raid_file(filepath) != content_hash: stale.append(filename)
+        elif deep and process_single_raid_file(filepath)[0] != (pickle.loads(data) if data is not None else None): stale.append(filename)
+    click.echo(f"Wersja indeksu: {'OK' if version_ok else 'NIEAKTUALNA'}")
+    click.echo(f"Pliki: {len(current_files)}, brakujące: {len(missing)}, nieaktualne: {len(stale)}, osierocone wpisy: {len(orphaned)}")
+    for filename in missing + stale: click.echo(f"  {filename}")
+    if not version_ok or missing or stale or orphaned: raise SystemExit(1)
+
+app.cli.add_command(index_cli)
+
+# --- Komendy CLI: flask --app app archive pack|verify ---
+archive_cli = AppGroup('archive', help="Archiwum starszych plików z debug_logs (skompresowane segmenty).")
+
+@archive_cli.command('pack')
+@click.option('--older-than', 'older_than_days', type=float, default=RAID_ARCHIVE_OLDER_THAN_DAYS, show_default=True,
+              help="Pakuj pliki starsze niż tyle dni (wg czasu w nazwie pliku).")
+@click.option('--codec', type=click.Choice(['auto', 'zstd', 'gzip']), default=None, help="Kompresja (domyślnie RAID_ARCHIVE_CODEC).")
+@click.option('--raids-only', is_flag=True, help="Pakuj tylko raporty rajdów, bez pozostałych zrzutów moda (startLocalRaid_*).")
+@click.option('--dry-run', is_flag=True, help="Tylko wypisz, co zostałoby spakowane.")
+def archive_pack_command(older_than_days, codec, raids_only, dry_run):
+    """Przenosi starsze pliki do archiwum. Aplikacja nadal widzi spakowane rajdy - działa też w trakcie pracy serwera."""
+    patterns = (RAID_FILE_PATTERN,) + (() if raids_only else RAID_ARCHIVE_EXTRA_PATTERNS)
+    limit = datetime.datetime.now() - datetime.timedelta(days=older_than_days)
+    try:
+        with os.scandir(DEBUG_LOGS_FOLDER) as entries:
+            filenames = [entry.name for entry in entries if entry.is_file() and any(fnmatch.fnmatch(entry.name, pattern) for pattern in patterns)]
+    except FileNotFoundError: raise click.ClickException(f"Folder z logami nie istnieje: {DEBUG_LOGS_FOLDER}")
+    filenames = sorted((filename for filename in filenames if get_timestamp_from_filename(filename) < limit), key=get_timestamp_from_filename)
+    if dry_run:
+        for filename in filenames: click.echo(filename)
+        click.echo(f"Do spakowania: {len(filenames)} plików.")
+        return
+    try: packed, raw_bytes, packed_bytes = pack_raid_archive(filenames, codec)
+    except (RuntimeError, ValueError, OSError) as e: raise click.ClickException(str(e))
+    ratio = f" ({packed_bytes / raw_bytes * 100:.1f}% rozmiaru)" if raw_bytes else ""
+    click.echo(f"Spakowano {packed} plików: {raw_bytes / 1048576:.1f} MB -> {packed_bytes / 1048576:.1f} MB{ratio}.")
+
+@archive_cli.command('verify')
+def archive_verify_command():
+    """Odczytuje każdy rekord archiwum (nagłówek, dekompresja, rozmiar). Kod wyjścia 1 przy błędach."""
+    catalog = load_raid_archive_catalog()
+    errors = []
+    for filename, entry in catalog.items():
+        try: read_archived_raid(entry, filename)
+        except Exception as e: errors.append(f"{filename}: {e}")
+    raw_bytes = sum(entry[4] for entry in catalog.values()); packed_bytes = sum(entry[2] for entry in catalog.values())
+    click.echo(f"Archiwum {raid_archive_folder()}: {len(catalog)} plików, {raw_bytes / 1048576:.1f} MB -> {packed_bytes / 1048576:.1f} MB, błędy: {len(errors)}")
+    for error in errors: click.echo(f"  {error}")
+    if errors: raise SystemExit(1)
+
+app.cli.add_command(archive_cli)
+
+# --- Komendy CLI: flask --app app export raids ---
+export_cli = AppGroup('export', help="Eksport przetworzonych rajdów do własnych narzędzi analitycznych.")
+
+@export_cli.command('raids')
+@click.option('--out', 'out_path', required=True, help="Plik wynikowy.")
+@click.option('--format', 'export_format', type=click.Choice(['ndjson', 'parquet']), default=None,
+              help="Domyślnie parquet dla plików .parquet, w pozostałych przypadkach ndjson.")
+@click.option('--nickname', default=None, help="Tylko rajdy gracza.")
+@click.option('--map', 'location', default=None, help="Tylko rajdy na mapie (nazwa lub identyfikator).")
+@click.option('--from', 'date_from', default=None, help="Od daty (RRRR-MM-DD, data ISO lub timestamp w ms).")
+@click.option('--to', 'date_to', default=None, help="Do daty włącznie.")
+@click.option('--since', default=None, help="Tylko rajdy nowsze niż podany czas (np. wartość z poprzedniego eksportu).")
+def export_raids_command(out_path, export_format, nickname, location, date_from, date_to, since):
+    """Eksportuje pełne dane rajdów (NDJSON lub Parquet). Plik jest podmieniany atomowo po zakończeniu zapisu."""
+    export_format = export_format or ('parquet' if out_path.endswith('.parquet') else 'ndjson')
+    try: filters = parse_export_filters({'nickname': nickname, 'map': location, 'from': date_from, 'to': date_to, 'since': since})
+    except (ValueError, OverflowError, OSError) as e: raise click.ClickException(f"Nieprawidłowa data: {e}")
+    cached_data = get_cached_raid_data()
+    raids = select_export_raids(cached_data, **filters)
+    temp_path = f"{out_path}.tmp"
+    try:
+        if export_format == 'parquet': count = write_raids_parquet(temp_path, cached_data, raids)
+        else:
+            count = 0
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for raid_data in iter_raid_details(cached_data, raids): f.write(export_raid_json(raid_data) + '\n'); count += 1
+        os.replace(temp_path, out_path)
+    except (RuntimeError, OSError) as e:
+        with contextlib.suppress(OSError): os.remove(temp_path)
+        raise click.ClickException(str(e))
+    click.echo(f"Wyeksportowano {count} rajdów do {out_path}.")
+    if raids: click.echo(f"Następny eksport przyrostowy: --since {raids[-1]['timestamp'].isoformat()}")
+
+app.cli.add_command(export_cli)
 
 # Uruchomienie aplikacji
 if __name__ == '__main__':
     # load_translations() # Już wywołane globalnie
     get_cached_raid_data() # Wypełnij cache przy starcie
+    # W trybie debug proces nadrzędny reloadera tylko restartuje serwer - watcher startujemy w procesie roboczym
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true': start_raid_watcher()
     app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""Opcjonalny tryb ASGI (asynchroniczny) StatsMods Tarkov.
+
+Użycie (pip install uvicorn):
+    uvicorn asgi:app --host 127.0.0.1 --port 5000
+
+Szczegóły rajdu, historia rajdów gracza i strumień SSE są obsługiwane w pętli zdarzeń: odczyt pliku/indeksu rajdu
+i serializacja JSON idą do puli wątków, a klient SSE to kolejka asyncio zamiast wątku na połączenie.
+Pozostałe trasy (strony Jinja, analityka, rankingi, /metrics, pliki statyczne) przechodzą przez aplikację Flask
+uruchamianą w tej samej puli, więc szablony, ETagi i kompresja działają tak jak w trybie wątkowym.
+"""
+import io
+import sys
+import queue
+import asyncio
+import contextlib
+import concurrent.futures
+from werkzeug.exceptions import HTTPException
+from werkzeug.wrappers import Request, Response
+
+with contextlib.redirect_stdout(sys.stderr): # Komunikaty startowe app.py nie mieszają się z logiem serwera
+    import app as statsapp
+
+ASGI_EXECUTOR_WORKERS = 32 # Wątki na odczyt plików rajdów, serializację JSON i trasy Flaska
+ASGI_START_WATCHER = True # Watcher debug_logs startuje razem z serwerem (lifespan)
+
+flask_app = statsapp.app
+executor = concurrent.futures.ThreadPoolExecutor(max_workers=ASGI_EXECUTOR_WORKERS, thread_name_prefix='asgi')
+
+async def _run(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+
+async def _snapshot():
+    """Migawka danych rajdów. Przy odświeżaniu w tle (stale-while-revalidate) get_cached_raid_data nie blokuje,
+    gdy migawka już jest - pierwsze wczytanie i synchronizacja backendu 'shared' idą do puli wątków."""
+    if statsapp.RAID_DATA_CACHE and statsapp.CACHE_REFRESH_IN_BACKGROUND and statsapp.RAID_CACHE_BACKEND == 'memory':
+        return statsapp.get_cached_raid_data()
+    return await _run(statsapp.get_cached_raid_data)
+
+# --- Tłumaczenie żądań ASGI <-> WSGI ---
+def _wsgi_environ(scope, body=b''):
+    path = scope['path']; root_path = scope.get('root_path', '')
+    if root_path and path.startswith(root_path): path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'], 'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'), 'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0], 'SERVER_PORT': str(server[1] or 80), 'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': scope.get('scheme', 'http'), 'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_'); value = value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect': break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'): break
+    return b''.join(chunks)
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect': pass
+
+async def _send_response(send, response):
+    await send({'type': 'http.response.start', 'status': response.status_code,
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.to_wsgi_list()]})
+    await send({'type': 'http.response.body', 'body': response.get_data()})
+
+async def call_flask(scope, receive, send):
+    """Trasa Flaska w puli wątków. Odpowiedź jest wysyłana fragmentami, tak jak zwraca ją iterator WSGI."""
+    environ = _wsgi_environ(scope, await _read_body(receive))
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0]); started['headers'] = headers
+        return lambda data: None # Flask nie używa write()
+
+    def begin():
+        result = flask_app(environ, start_response)
+        chunks = iter(result)
+        return result, chunks, next(chunks, None)
+
+    result, chunks, chunk = await _run(begin)
+    try:
+        await send({'type': 'http.response.start', 'status': started['status'],
+                    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in started['headers']]})
+        while chunk is not None: # Fragment wysyłamy od razu - odpowiedzi strumieniowe nie czekają na następny
+            if chunk: await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await _run(next, chunks, None)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(result, 'close'): await _run(result.close)
+
+# --- Natywne trasy asynchroniczne ---
+def _json_response(payload, status=200, request=None, etag=None, cache_control=None):
+    """Te same bajty co jsonify, a dla 200 ETag i kompresja jak w cached_by_snapshot/_compress_response."""
+    response = flask_app.json.response(payload); response.status_code = status
+    if status != 200 or not statsapp.HTTP_CACHE_ENABLED: return response
+    response.vary.add('Accept-Encoding')
+    encoding = statsapp.negotiate_encoding(request.accept_encodings)
+    if encoding and response.content_length >= statsapp.HTTP_COMPRESSION_MIN_SIZE:
+        response.set_data(statsapp.compress_body(response.get_data(), encoding)); response.headers['Content-Encoding'] = encoding
+    if etag: response.set_etag(f"{etag}-{encoding}" if 'Content-Encoding' in response.headers else etag)
+    if cache_control: response.headers['Cache-Control'] = cache_control
+    return response
+
+async def api_raid_details(request, filename):
+    cached_data = await _snapshot()
+    safe_filename, signature = statsapp.resolve_raid_request(cached_data, filename)
+    if safe_filename is None: return _json_response({'error': "Nieprawidłowa ścieżka pliku.", 'data': None}, 404)
+    cache_control = f"public, max-age={statsapp.RAID_DETAILS_MAX_AGE}"
+    etag = statsapp.raid_details_etag(safe_filename, signature) if signature else None
+    client_etag = statsapp.matching_client_etag(etag, request.if_none_match) if etag and statsapp.HTTP_CACHE_ENABLED else None
+    if client_etag: return statsapp.not_modified_response(client_etag, cache_control)
+    processed_data = await _run(statsapp.get_raid_details, safe_filename) if signature else None # Indeks SQLite lub plik rajdu
+    if not processed_data:
+        print(f"OSTRZEŻENIE: Dane dla pliku {safe_filename} nie znalezione w cache API.")
+        return _json_response({'error': f"Nie znaleziono przetworzonych danych dla pliku {safe_filename}.", 'data': None}, 404)
+    return await _run(_json_response, {'error': None, 'data': processed_data}, 200, request, etag, cache_control)
+
+async def api_player_raids(request, nickname):
+    cached_data = await _snapshot()
+    if not statsapp.HTTP_CACHE_ENABLED:
+        return await _run(lambda: _json_response(*statsapp.query_player_raids(cached_data, nickname, request.args), request))
+    etag = statsapp.snapshot_etag(cached_data)
+    client_etag = statsapp.matching_client_etag(etag, request.if_none_match)
+    if client_etag: return statsapp.not_modified_response(client_etag, 'no-cache')
+    entry = statsapp.lookup_rendered_page(etag, request.full_path) # Wspólna pamięć z trasą Flaska
+
+    def render():
+        page = entry
+        if page is None:
+            payload, status = statsapp.query_player_raids(cached_data, nickname, request.args)
+            response = flask_app.json.response(payload)
+            if status != 200: response.status_code = status; return response
+            page = statsapp.store_rendered_page(etag, request.full_path, response.get_data(), response.content_type)
+        encoding = statsapp.negotiate_encoding(request.accept_encodings) if len(page['body']) >= statsapp.HTTP_COMPRESSION_MIN_SIZE else None
+        response = Response(statsapp.rendered_page_body(page, encoding), content_type=page['content_type'])
+        if encoding: response.headers['Content-Encoding'] = encoding
+        response.set_etag(f"{etag}-{encoding}" if encoding else etag); response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+    return await _run(render)
+
+class _AsyncSubscriber:
+    """Subskrybent strumienia w pętli zdarzeń. broadcast_new_raids woła put_nowait z wątku wczytywania,
+    więc komunikat trafia do kolejki asyncio przez call_soon_threadsafe."""
+    __slots__ = ('loop', 'queue')
+
+    def __init__(self, loop):
+        self.loop = loop; self.queue = asyncio.Queue(maxsize=statsapp.RAID_STREAM_QUEUE_SIZE)
+
+    def put_nowait(self, message):
+        if self.queue.full(): raise queue.Full # Odczyt rozmiaru z innego wątku jest przybliżony - nadmiar odrzuci _put
+        try: self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError: raise queue.Full # Pętla zamknięta - klienta już nie ma
+
+    def _put(self, message):
+        try: self.queue.put_nowait(message)
+        except asyncio.QueueFull: pass
+
+async def api_stream_raids(request, scope, receive, send):
+    """Server-Sent Events bez wątku na klienta: czekamy na kolejkę, rozłączenie albo termin heartbeatu."""
+    subscriber = _AsyncSubscriber(asyncio.get_running_loop())
+    if not statsapp.subscribe_raid_stream(subscriber):
+        return await _send_response(send, _json_response({'error': "Zbyt wielu subskrybentów strumienia.", 'data': None}, 503))
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]})
+        await send({'type': 'http.response.body', 'body': b"retry: 5000\n\n", 'more_body': True})
+        while not disconnected.done():
+            message = asyncio.ensure_future(subscriber.queue.get())
+            await asyncio.wait((message, disconnected), timeout=statsapp.RAID_STREAM_HEARTBEAT_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+            if not message.done(): message.cancel()
+            if disconnected.done(): break
+            text = message.result() if message.done() and not message.cancelled() else ": ping\n\n"
+            await send({'type': 'http.response.body', 'body': text.encode('utf-8'), 'more_body': True})
+    except OSError: pass # Klient rozłączył się w trakcie wysyłania
+    finally:
+        statsapp.unsubscribe_raid_stream(subscriber); disconnected.cancel()
+
+NATIVE_ROUTES = {'api_raid_details': api_raid_details, 'api_player_raids': api_player_raids} # endpoint Flaska -> handler
+STREAMING_ROUTES = {'api_stream_raids': api_stream_raids}
+
+def match_native_route(request):
+    """(handler, argumenty trasy) dla żądań GET obsługiwanych natywnie albo (None, None). Dopasowanie przez url_map
+    Flaska, więc ścieżki i konwertery są te same; ?profile zawsze idzie przez Flaska (profilowanie żądania)."""
+    if request.method != 'GET' or 'profile' in request.args: return None, None
+    try: endpoint, values = flask_app.url_map.bind_to_environ(request.environ).match()
+    except HTTPException: return None, None # 404, 405 i przekierowania obsłuży Flask
+    return NATIVE_ROUTES.get(endpoint) or STREAMING_ROUTES.get(endpoint), values
+
+# --- Aplikacja ASGI ---
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await _run(statsapp.get_cached_raid_data) # Wypełnij cache przy starcie
+                if ASGI_START_WATCHER: statsapp.start_raid_watcher()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)}); return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if ASGI_START_WATCHER: await _run(statsapp.stop_raid_watcher)
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'}); return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan': return await lifespan(receive, send)
+    if scope['type'] != 'http': return # WebSocket nie jest obsługiwany
+    request = Request(_wsgi_environ(scope))
+    handler, values = match_native_route(request)
+    if handler is None: return await call_flask(scope, receive, send)
+    if handler in STREAMING_ROUTES.values(): return await handler(request, scope, receive, send, **values)
+    await _send_response(send, await handler(request, **values))
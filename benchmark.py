@@ -0,0 +1,612 @@
+"""Benchmarki StatsMods Tarkov. Wyniki są wypisywane jako JSON.
+
+Użycie:
+    python benchmark.py parsers [--repeat N] [--folder debug_logs]
+    python benchmark.py memory [--raids 1000] [--folder debug_logs]
+    python benchmark.py translations [--repeat N] [--folder debug_logs]
+    python benchmark.py generate --raids 1000 --out katalog [--seed 1] [--full-profile]
+    python benchmark.py suite [--scales 100,1000,10000,100000] [--requests 50]
+    python benchmark.py load [--raids 1000] [--clients 1,8,32,128] [--duration 5] [--sse-clients 0]
+
+Suite generuje syntetyczne rajdy (mutacje próbek z debug_logs) i dla każdej skali
+w osobnym procesie mierzy wczytywanie, odświeżanie cache oraz wszystkie trasy Flaska.
+Load uruchamia kolejno serwer wątkowy (app.run) i ASGI (asgi.py, wymaga uvicorn) i mierzy
+przepustowość oraz opóźnienia przy rosnącej liczbie współbieżnych klientów.
+"""
+import os
+import sys
+import json
+import time
+import copy
+import random
+import pickle
+import shutil
+import asyncio
+import logging
+import argparse
+import datetime
+import tempfile
+import contextlib
+import subprocess
+import urllib.parse
+import urllib.request
+import importlib.util
+import tracemalloc
+try:
+    import resource # Brak na Windows - wtedy peak RSS nie jest raportowany
+except ImportError:
+    resource = None
+
+# app.py loguje przez print() - kierujemy to na stderr, żeby stdout zawierał wyłącznie JSON
+with contextlib.redirect_stdout(sys.stderr):
+    import app as statsapp
+
+
+def _raid_files(folder):
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if name.startswith('onEndLocalRaidRequest_request_') and name.endswith('.json'))
+
+
+def _measure(function, repeat):
+    """Zwraca (najlepszy czas w ms, szczyt pamięci w KiB) dla wywołania function()."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter(); function(); timings.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak / 1024
+
+
+# --- Porównanie parserów JSON (load_raid_json) ---
+def bench_parsers(args):
+    files = _raid_files(args.folder)
+    if not files: sys.exit(f"Brak plików rajdów w {args.folder}")
+    parsers = ['json'] + (['orjson'] if statsapp.orjson else []) + (['selective'] if statsapp.ijson else [])
+    original_parser = statsapp.RAID_JSON_PARSER
+    report = {'benchmark': 'parsers', 'files': len(files), 'repeat': args.repeat, 'results': {}}
+    reference = {}
+    try:
+        for parser in parsers:
+            statsapp.RAID_JSON_PARSER = parser
+            per_file = []
+            identical = True
+            for filepath in files:
+                load_ms, load_peak_kib = _measure(lambda: statsapp.load_raid_json(filepath), args.repeat)
+                total_ms, total_peak_kib = _measure(lambda: statsapp.process_single_raid_file(filepath), args.repeat)
+                output = repr(statsapp.process_single_raid_file(filepath))
+                if parser == 'json': reference[filepath] = output
+                elif reference[filepath] != output: identical = False
+                per_file.append({'file': os.path.basename(filepath), 'size_bytes': os.path.getsize(filepath),
+                                 'load_ms': round(load_ms, 3), 'load_peak_kib': round(load_peak_kib, 1),
+                                 'process_ms': round(total_ms, 3), 'process_peak_kib': round(total_peak_kib, 1)})
+            report['results'][parser] = {
+                'identical_output': identical,
+                'mean_load_ms': round(sum(f['load_ms'] for f in per_file) / len(per_file), 3),
+                'mean_process_ms': round(sum(f['process_ms'] for f in per_file) / len(per_file), 3),
+                'max_process_peak_kib': max(f['process_peak_kib'] for f in per_file),
+                'files': per_file,
+            }
+    finally:
+        statsapp.RAID_JSON_PARSER = original_parser
+    return report
+
+
+# --- Pamięć: pełne dane rajdu vs RaidSummary ---
+def _resident_kib(build):
+    """Ile pamięci (KiB) zajmuje obiekt zwrócony przez build(), mierzone tracemalloc."""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    kept = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return (after - before) / 1024
+
+
+def bench_memory(args):
+    files = _raid_files(args.folder)
+    if not files: sys.exit(f"Brak plików rajdów w {args.folder}")
+    blobs = []
+    for filepath in files:
+        processed_data, error = statsapp.process_single_raid_file(filepath)
+        if processed_data: blobs.append(pickle.dumps(processed_data))
+    # Każdy rajd jako osobny graf obiektów - tak jak po wczytaniu osobnych plików
+    full_kib = _resident_kib(lambda: [pickle.loads(blobs[i % len(blobs)]) for i in range(args.raids)])
+    summary_blobs = [pickle.dumps(statsapp.RaidSummary.from_raid_data(pickle.loads(blob))) for blob in blobs]
+    summary_kib = _resident_kib(lambda: [pickle.loads(summary_blobs[i % len(summary_blobs)]) for i in range(args.raids)])
+    scale = 1000 / args.raids
+    return {'benchmark': 'memory', 'raids': args.raids, 'sample_files': len(blobs),
+            'full_kib_per_1000_raids': round(full_kib * scale, 1),
+            'summary_kib_per_1000_raids': round(summary_kib * scale, 1),
+            'reduction_factor': round(full_kib / summary_kib, 1) if summary_kib else None}
+
+
+# --- get_item_name: dawne wyszukiwanie vs płaska tabela ---
+def _legacy_get_item_name(item_id):
+    """Poprzednia implementacja: trzy klucze f-string i kaskada translations.get przy każdym wywołaniu."""
+    translations = statsapp.translations
+    if not translations or not item_id: return str(item_id)
+    short_name_key = f"{item_id} ShortName"; name_key = f"{item_id} Name"; plain_id_key = str(item_id)
+    fallback_keys = dict(statsapp.ITEM_NAME_FALLBACKS) # Dawniej literał słownika budowany przy każdym wywołaniu
+    return translations.get(short_name_key, translations.get(name_key, translations.get(plain_id_key, fallback_keys.get(str(item_id), str(item_id)))))
+
+
+def bench_translations(args):
+    files = _raid_files(args.folder)
+    if not files: sys.exit(f"Brak plików rajdów w {args.folder}")
+    # Mierzymy samą ekstrakcję - JSON jest wczytany wcześniej
+    parsed = {filepath: statsapp.load_raid_json(filepath) for filepath in files}
+    original_loader, original_resolver = statsapp.load_raid_json, statsapp.get_item_name
+    calls = {'count': 0}
+    def counting(resolver):
+        def wrapper(item_id):
+            calls['count'] += 1
+            return resolver(item_id)
+        return wrapper
+    report = {'benchmark': 'translations', 'files': len(files), 'repeat': args.repeat, 'results': {}}
+    outputs = {}
+    try:
+        statsapp.load_raid_json = lambda filepath, parser=None: parsed[filepath]
+        for name, resolver in (('legacy', _legacy_get_item_name), ('table', original_resolver)):
+            statsapp.get_item_name = resolver
+            extract_ms = [_measure(lambda: statsapp.process_single_raid_file(filepath), args.repeat)[0] for filepath in files]
+            statsapp.get_item_name = counting(resolver); calls['count'] = 0
+            outputs[name] = [repr(statsapp.process_single_raid_file(filepath)) for filepath in files]
+            report['results'][name] = {'mean_extract_ms_per_raid': round(sum(extract_ms) / len(extract_ms), 3),
+                                       'get_item_name_calls_per_raid': round(calls['count'] / len(files), 1)}
+    finally:
+        statsapp.load_raid_json, statsapp.get_item_name = original_loader, original_resolver
+    report['identical_output'] = outputs['legacy'] == outputs['table']
+    # Sam koszt jednego wywołania (ns) na identyfikatorach z pl.json
+    sample_ids = [key.rsplit(' ', 1)[0] for key in list(statsapp.translations)[:2000]]
+    for name, resolver in (('legacy', _legacy_get_item_name), ('table', original_resolver)):
+        start = time.perf_counter()
+        for item_id in sample_ids: resolver(item_id)
+        report['results'][name]['ns_per_call'] = round((time.perf_counter() - start) / max(len(sample_ids), 1) * 1e9, 1)
+    return report
+
+
+# --- Generator syntetycznych rajdów ---
+SYNTHETIC_ENTRY_POINTS = ('factory4_day', 'Factory', 'bigmap', 'Woods', 'Shoreline', 'Interchange',
+                          'RezervBase', 'laboratory', 'TarkovStreets', 'Lighthouse', 'Sandbox')
+SYNTHETIC_RESULTS = (('Survived', 45), ('Killed', 40), ('MissingInAction', 10), ('Left', 5))
+SYNTHETIC_BODY_PARTS = ('Head', 'Chest', 'Stomach', 'LeftArm', 'RightArm', 'LeftLeg', 'RightLeg')
+SYNTHETIC_ROLES = (('pmcBEAR', 'Bear'), ('pmcUSEC', 'Usec'), ('assault', 'Savage'), ('marksman', 'Savage'),
+                   ('pmcBot', 'Savage'), ('bossKilla', 'Savage'))
+SYNTHETIC_EXITS = ('Gate 3', 'Cellars', 'Med Tent Gate', 'ZB-1011', 'Smuggler\'s Boat', 'Car Extract')
+SYNTHETIC_SPAN_DAYS = 365 # Rajdy rozkładają się równomiernie na ostatni rok
+# Duże gałęzie profilu, których aplikacja nie czyta - domyślnie usuwane, żeby 100k plików zmieściło się na dysku
+SYNTHETIC_HEAVY_PROFILE_KEYS = ('Encyclopedia', 'TaskConditionCounters', 'Quests', 'Bonuses', 'Hideout', 'Inventory',
+                                'Achievements', 'RagfairInfo', 'WishList', 'CheckedMagazines', 'CheckedChambers')
+
+
+def _load_templates(folder, full_profile):
+    """Wczytuje próbki i zbiera pule wartości (ofiary, broń, przedmioty) do mutowania."""
+    templates, victims, weapons, item_ids = [], [], set(), set()
+    for filepath in _raid_files(folder):
+        with open(filepath, 'r', encoding='utf-8') as f: data = json.load(f)
+        profile = data.get('results', {}).get('profile')
+        if not profile: continue
+        eft = profile.get('Stats', {}).get('Eft', {})
+        victims.extend(victim for victim in eft.get('Victims', []) if isinstance(victim, dict))
+        weapons.update(victim['Weapon'] for victim in eft.get('Victims', []) if isinstance(victim, dict) and victim.get('Weapon'))
+        if eft.get('DeathCause', {}).get('WeaponId'): weapons.add(eft['DeathCause']['WeaponId'] + ' ShortName')
+        item_ids.update(item['_tpl'] for item in profile.get('Inventory', {}).get('items', []) if item.get('_tpl'))
+        if not full_profile:
+            for key in SYNTHETIC_HEAVY_PROFILE_KEYS: profile.pop(key, None)
+        templates.append(data)
+    if not templates: sys.exit(f"Brak plików rajdów w {folder}")
+    if not victims: victims = [{'Name': 'Bot', 'Side': 'Savage', 'Role': 'assault', 'Level': 1, 'Time': '00:01:00', 'Weapon': '', 'Distance': 10.0}]
+    return templates, victims, sorted(weapons) or [''], sorted(item_ids)
+
+
+def _synthetic_raid(rng, template, pools, nickname, profile_id, timestamp_ms, raid_number):
+    victims_pool, weapons, item_ids = pools
+    data = copy.deepcopy(template)
+    results = data['results']; profile = results['profile']; info = profile.setdefault('Info', {})
+    eft = profile.setdefault('Stats', {}).setdefault('Eft', {})
+    info['Nickname'] = nickname; profile['_id'] = profile_id
+    info['EntryPoint'] = rng.choice(SYNTHETIC_ENTRY_POINTS)
+    info['Level'] = min(79, 1 + raid_number // 8); info['Experience'] = raid_number * 12000 + rng.randint(0, 11999)
+    result = rng.choices([name for name, _ in SYNTHETIC_RESULTS], [weight for _, weight in SYNTHETIC_RESULTS])[0]
+    results['result'] = result; results['exitName'] = rng.choice(SYNTHETIC_EXITS) if result == 'Survived' else None
+    play_time = rng.randint(60, 2700); results['playTime'] = play_time; eft['TotalInGameTime'] = play_time
+    eft['TotalSessionExperience'] = rng.randint(0, 30000); eft['LastSessionDate'] = timestamp_ms // 1000
+
+    victims = []
+    for _ in range(min(rng.choices(range(9), [30, 25, 15, 10, 7, 5, 4, 2, 2])[0], 8)):
+        victim = dict(rng.choice(victims_pool))
+        role, side = rng.choice(SYNTHETIC_ROLES)
+        victim.update({'Name': f"Bot{rng.randint(1, 99999)}", 'Role': role, 'Side': side, 'Level': rng.randint(1, 70),
+                       'BodyPart': rng.choice(SYNTHETIC_BODY_PARTS), 'Weapon': rng.choice(weapons),
+                       'Distance': round(rng.expovariate(1 / 40), 6), 'Location': info['EntryPoint']})
+        victims.append(victim)
+    eft['Victims'] = victims
+    eft['FoundInRaidItems'] = [{'ItemId': item_id, 'count': rng.randint(1, 5)}
+                               for item_id in rng.sample(item_ids, min(len(item_ids), rng.randint(0, 12)))]
+    for skill in profile.get('Skills', {}).get('Common', []):
+        if isinstance(skill, dict): skill['PointsEarnedDuringSession'] = round(rng.uniform(0.1, 6), 4) if rng.random() < 0.15 else 0
+    for counter in eft.get('SessionCounters', {}).get('Items', []):
+        if isinstance(counter, dict) and isinstance(counter.get('Value'), (int, float)):
+            counter['Value'] = type(counter['Value'])(counter['Value'] * rng.uniform(0.2, 2.0))
+    if result != 'Killed': eft['Aggressor'] = None
+    return data
+
+
+def generate_raids(out_folder, raids, seed=1, full_profile=False, folder=None, start_index=0, end_time=None):
+    """Zapisuje `raids` syntetycznych plików onEndLocalRaidRequest_request_<sesja>_<ts>.json do out_folder.
+    Gracze mają rozkład zbliżony do Zipfa (kilku bardzo aktywnych, długi ogon). Zwraca listę nazw plików."""
+    rng = random.Random(seed * 1_000_003 + start_index)
+    templates, *pools = _load_templates(folder or statsapp.DEBUG_LOGS_FOLDER, full_profile)
+    os.makedirs(out_folder, exist_ok=True)
+    player_count = max(1, (start_index + raids) // 25)
+    nicknames = [f"Gracz{index:05d}" for index in range(player_count)]
+    weights = [1 / (rank + 1) for rank in range(player_count)]
+    end_ms = int((end_time or time.time()) * 1000); span_ms = SYNTHETIC_SPAN_DAYS * 86400 * 1000
+    raid_numbers = {}
+    filenames = []
+    for offset in range(raids):
+        index = start_index + offset
+        nickname = rng.choices(nicknames, weights)[0]
+        raid_numbers[nickname] = raid_numbers.get(nickname, 0) + 1
+        profile_id = f"{seed:08x}{nicknames.index(nickname):016x}"[-24:]
+        timestamp_ms = end_ms - span_ms + span_ms * (index + 1) // (start_index + raids + 1) + rng.randint(0, 999)
+        data = _synthetic_raid(rng, templates[index % len(templates)], pools, nickname, profile_id, timestamp_ms, raid_numbers[nickname])
+        filename = f"onEndLocalRaidRequest_request_{profile_id}_{timestamp_ms}.json"
+        with open(os.path.join(out_folder, filename), 'w', encoding='utf-8') as f: json.dump(data, f, ensure_ascii=False)
+        filenames.append(filename)
+    return filenames
+
+
+def bench_generate(args):
+    start = time.perf_counter()
+    filenames = generate_raids(args.out, args.raids, seed=args.seed, full_profile=args.full_profile, folder=args.folder)
+    elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(args.out, filename)) for filename in filenames)
+    return {'benchmark': 'generate', 'raids': len(filenames), 'out': os.path.abspath(args.out), 'seed': args.seed,
+            'bytes': size, 'seconds': round(elapsed, 2)}
+
+
+# --- Suite: wczytywanie, cache i trasy na syntetycznych danych ---
+def _percentile(values, percent):
+    if not values: return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def _latency_report(timings_ms, units):
+    """p50/p99/średnia w ms oraz przepustowość (units na sekundę)."""
+    total = sum(timings_ms)
+    return {'count': len(timings_ms), 'p50_ms': round(_percentile(timings_ms, 50), 3), 'p99_ms': round(_percentile(timings_ms, 99), 3),
+            'mean_ms': round(total / len(timings_ms), 3), f'{units}_per_second': round(len(timings_ms) / (total / 1000), 1) if total else None}
+
+
+def _peak_rss_kib():
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak # macOS podaje bajty, Linux KiB
+
+
+def _dataset_folder(args, raids):
+    """Katalog z `raids` syntetycznymi rajdami - generowany raz i używany ponownie przy kolejnych uruchomieniach."""
+    folder = os.path.join(args.data_dir, f"raids_{raids}_seed{args.seed}" + ('_full' if args.full_profile else ''))
+    manifest_path = os.path.join(folder, 'manifest.json')
+    manifest = {'raids': raids, 'seed': args.seed, 'full_profile': args.full_profile}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == manifest: return folder
+    except (OSError, ValueError): pass
+    shutil.rmtree(folder, ignore_errors=True)
+    print(f"Generowanie {raids} syntetycznych rajdów w {folder}...", file=sys.stderr)
+    generate_raids(folder, raids, seed=args.seed, full_profile=args.full_profile, end_time=time.time() - 86400)
+    with open(manifest_path, 'w', encoding='utf-8') as f: json.dump(manifest, f)
+    return folder
+
+
+def _incoming_files(args, folder, raids):
+    """Pliki "nowych" rajdów do pomiaru odświeżenia cache - w podkatalogu, którego skan aplikacji nie widzi."""
+    incoming = os.path.join(folder, 'incoming')
+    needed = args.refreshes * args.new_files
+    files = _raid_files(incoming) if os.path.isdir(incoming) else []
+    if len(files) < needed:
+        shutil.rmtree(incoming, ignore_errors=True)
+        generate_raids(incoming, needed, seed=args.seed, full_profile=args.full_profile, start_index=raids)
+        files = _raid_files(incoming)
+    return files[:needed]
+
+
+def _reset_app_state():
+    statsapp.RAID_INGEST_STATE.clear(); statsapp.RAID_INGEST_STATE.update(statsapp._new_ingest_state())
+    statsapp.RAID_DATA_CACHE = {}; statsapp.LAST_CACHE_UPDATE = datetime.datetime.min
+    statsapp._load_raid_details.cache_clear()
+
+
+def _route_urls(app, sample_values):
+    """Adresy GET wszystkich tras (bez static i strumieni SSE) z parametrami wypełnionymi przykładowymi wartościami."""
+    urls, skipped = {}, []
+    with app.test_request_context():
+        for rule in app.url_map.iter_rules():
+            if 'GET' not in rule.methods or rule.endpoint == 'static' or 'stream' in rule.endpoint: continue
+            if not all(argument in sample_values for argument in rule.arguments):
+                skipped.append(rule.rule); continue
+            urls[rule.rule] = statsapp.url_for(rule.endpoint, **{argument: sample_values[argument] for argument in rule.arguments})
+    return urls, skipped
+
+
+def bench_scale(args):
+    """Jedna skala w bieżącym procesie (suite uruchamia to w osobnych procesach, żeby peak RSS był miarodajny)."""
+    folder = _dataset_folder(args, args.raids)
+    files = _raid_files(folder)
+    incoming = _incoming_files(args, folder, args.raids)
+    report = {'raids': len(files), 'dataset': folder, 'parse_workers': statsapp.PARSE_WORKERS, 'phases': {}}
+    phases = report['phases']
+    work_dir = tempfile.mkdtemp(prefix='statsmods_bench_')
+    original = (statsapp.DEBUG_LOGS_FOLDER, statsapp.RAID_INDEX_PATH, statsapp.RAID_INDEX_ENABLED, statsapp.RAID_FILE_SETTLE_SECONDS,
+                statsapp.CACHE_REFRESH_IN_BACKGROUND)
+    try:
+        statsapp.DEBUG_LOGS_FOLDER = folder; statsapp.RAID_FILE_SETTLE_SECONDS = 0
+        statsapp.CACHE_REFRESH_IN_BACKGROUND = False # Mierzymy samo odświeżenie, a nie zwrócenie starej migawki
+        statsapp.RAID_INDEX_PATH = os.path.join(work_dir, 'raid_index.sqlite3')
+
+        # process_single_raid_file na próbce plików
+        sample = random.Random(args.seed).sample(files, min(len(files), args.sample))
+        timings = []
+        for filepath in sample:
+            start = time.perf_counter(); statsapp.process_single_raid_file(filepath); timings.append((time.perf_counter() - start) * 1000)
+        phases['process_single_raid_file'] = dict(_latency_report(timings, 'files'), peak_rss_kib=_peak_rss_kib())
+
+        # load_all_raid_data: bez indeksu, budowa indeksu, z ciepłym indeksem
+        for name, index_enabled in (('load_all_raid_data_no_index', False), ('load_all_raid_data_index_build', True), ('load_all_raid_data_index_warm', True)):
+            statsapp.RAID_INDEX_ENABLED = index_enabled
+            start = time.perf_counter(); all_raids, players_summary, errors, _ = statsapp.load_all_raid_data(); elapsed = time.perf_counter() - start
+            phases[name] = {'seconds': round(elapsed, 3), 'files_per_second': round(len(files) / elapsed, 1) if elapsed else None,
+                            'raids': len(all_raids), 'players': len(players_summary), 'errors': len(errors), 'peak_rss_kib': _peak_rss_kib()}
+            del all_raids, players_summary, errors
+
+        # get_cached_raid_data: start od zera, odświeżenie bez zmian, odświeżenie po dopisaniu nowych plików
+        _reset_app_state()
+        start = time.perf_counter(); statsapp.get_cached_raid_data()
+        phases['get_cached_raid_data_initial'] = {'seconds': round(time.perf_counter() - start, 3), 'peak_rss_kib': _peak_rss_kib()}
+        timings = []
+        for _ in range(args.refreshes):
+            statsapp.LAST_CACHE_UPDATE = datetime.datetime.min
+            start = time.perf_counter(); statsapp.get_cached_raid_data(); timings.append((time.perf_counter() - start) * 1000)
+        phases['get_cached_raid_data_refresh_unchanged'] = dict(_latency_report(timings, 'refreshes'), peak_rss_kib=_peak_rss_kib())
+        timings = []
+        for round_number in range(args.refreshes):
+            new_files = []
+            for filepath in incoming[round_number * args.new_files:(round_number + 1) * args.new_files]:
+                shutil.copy(filepath, folder); new_files.append(os.path.basename(filepath))
+            statsapp.LAST_CACHE_UPDATE = datetime.datetime.min
+            try:
+                start = time.perf_counter(); statsapp.get_cached_raid_data(); timings.append((time.perf_counter() - start) * 1000)
+            finally:
+                for filename in new_files: os.remove(os.path.join(folder, filename))
+            statsapp.LAST_CACHE_UPDATE = datetime.datetime.min; statsapp.get_cached_raid_data() # Poza pomiarem: usunięte pliki znikają z cache
+        phases['get_cached_raid_data_refresh_new_files'] = dict(_latency_report(timings, 'refreshes'), new_files_per_refresh=args.new_files,
+                                                               peak_rss_kib=_peak_rss_kib())
+
+        # Trasy Flaska przez test client (cache jest już ciepły)
+        cached_data = statsapp.get_cached_raid_data()
+        players = cached_data['players_summary']
+        busiest = max(players, key=lambda nickname: players[nickname]['raid_count']) if players else 'brak'
+        newest = cached_data['all_raids'][0]['filename'] if cached_data['all_raids'] else 'brak.json'
+        urls, skipped = _route_urls(statsapp.app, {'nickname': busiest, 'filename': newest})
+        client = statsapp.app.test_client()
+        routes = {}
+        for rule, url in sorted(urls.items()):
+            status = client.get(url).status_code # Rozgrzewka (szablony, szczegóły rajdu w lru_cache)
+            timings = []
+            for _ in range(args.requests):
+                start = time.perf_counter(); response = client.get(url); response.get_data(); timings.append((time.perf_counter() - start) * 1000)
+            routes[rule] = dict(_latency_report(timings, 'requests'), url=url, status=status)
+        phases['routes'] = routes
+        report['skipped_routes'] = skipped
+        report['peak_rss_kib'] = _peak_rss_kib()
+    finally:
+        (statsapp.DEBUG_LOGS_FOLDER, statsapp.RAID_INDEX_PATH, statsapp.RAID_INDEX_ENABLED, statsapp.RAID_FILE_SETTLE_SECONDS,
+         statsapp.CACHE_REFRESH_IN_BACKGROUND) = original
+        _reset_app_state()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+
+def bench_suite(args):
+    scales = [int(scale) for scale in args.scales.split(',') if scale.strip()]
+    report = {'benchmark': 'suite', 'created': datetime.datetime.now().isoformat(timespec='seconds'),
+              'python': sys.version.split()[0], 'platform': sys.platform, 'version': _code_version(),
+              'orjson': statsapp.orjson is not None, 'ijson': statsapp.ijson is not None, 'scales': {}}
+    common = ['--seed', str(args.seed), '--data-dir', args.data_dir, '--requests', str(args.requests), '--sample', str(args.sample),
+              '--refreshes', str(args.refreshes), '--new-files', str(args.new_files)] + (['--full-profile'] if args.full_profile else [])
+    for scale in scales:
+        _incoming_files(args, _dataset_folder(args, scale), scale) # Generowanie poza mierzonym procesem - nie zawyża jego peak RSS
+        print(f"Skala {scale}...", file=sys.stderr)
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), 'scale', '--raids', str(scale)] + common,
+                                stdout=subprocess.PIPE, check=True)
+        report['scales'][str(scale)] = json.loads(result.stdout)
+    return report
+
+
+# --- Load: współbieżni klienci HTTP, serwer wątkowy (app.run) vs ASGI (asgi.py + uvicorn) ---
+LOAD_SERVERS = ('threaded', 'asgi')
+LOAD_MIX = (('raid', 6), ('player_raids', 3), ('player_page', 1)) # Wagi: szczegóły rajdu (odczyt indeksu/pliku), historia gracza, strona Jinja
+
+
+def bench_serve(args):
+    """Serwer dla pomiaru load, uruchamiany w osobnym procesie na wygenerowanym zbiorze z tymczasowym indeksem."""
+    statsapp.DEBUG_LOGS_FOLDER = _dataset_folder(args, args.raids); statsapp.RAID_FILE_SETTLE_SECONDS = 0
+    statsapp.RAID_INDEX_PATH = os.path.join(tempfile.mkdtemp(prefix='statsmods_load_'), 'raid_index.sqlite3')
+    statsapp.get_cached_raid_data()
+    if args.server == 'threaded':
+        logging.getLogger('werkzeug').setLevel(logging.ERROR) # Log każdego żądania zaniżałby przepustowość
+        statsapp.app.run(host='127.0.0.1', port=args.port, threaded=True, debug=False, use_reloader=False)
+    else:
+        import uvicorn
+        import asgi
+        asgi.ASGI_START_WATCHER = False # Jak w app.run bez debug - porównujemy samą obsługę żądań
+        uvicorn.run(asgi.app, host='127.0.0.1', port=args.port, log_level='warning', access_log=False)
+
+
+async def _http_get(reader, writer, path):
+    """Jedno żądanie GET na otwartym połączeniu keep-alive. Zwraca (status, czy serwer zamyka połączenie)."""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    headers = dict((name.strip().lower(), value.strip()) for name, _, value in (line.partition(':') for line in head[1:] if line))
+    if 'content-length' in headers: await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size: break
+    else: await reader.read(); return int(head[0].split()[1]), True
+    return int(head[0].split()[1]), headers.get('connection', '').lower() == 'close'
+
+
+async def _load_client(port, paths, deadline, rng, timings, errors):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        try:
+            if writer is None: reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            start = time.perf_counter(); status, close = await _http_get(reader, writer, path)
+            timings.append((time.perf_counter() - start) * 1000)
+            if status != 200: errors[str(status)] = errors.get(str(status), 0) + 1
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1; close = True
+        if close and writer is not None: writer.close(); writer = None
+    if writer is not None: writer.close()
+
+
+async def _load_round(port, paths, clients, duration, sse_clients, seed):
+    """clients pętli żądanie-odpowiedź przez duration sekund; sse_clients połączeń SSE otwartych przez cały pomiar."""
+    streams = []
+    for _ in range(sse_clients):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b"GET /api/stream/raids HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n"); await writer.drain()
+        await reader.readuntil(b'\r\n\r\n'); streams.append(writer)
+    timings, errors = [], {}
+    started = time.perf_counter(); deadline = started + duration
+    await asyncio.gather(*(_load_client(port, paths, deadline, random.Random(seed * 1000 + index), timings, errors) for index in range(clients)))
+    elapsed = time.perf_counter() - started
+    for writer in streams: writer.close()
+    return {'requests': len(timings), 'requests_per_second': round(len(timings) / elapsed, 1), 'errors': errors,
+            'p50_ms': _percentile(timings, 50) and round(_percentile(timings, 50), 2), 'p95_ms': _percentile(timings, 95) and round(_percentile(timings, 95), 2),
+            'p99_ms': _percentile(timings, 99) and round(_percentile(timings, 99), 2)}
+
+
+def _wait_for_server(port, process, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None: return False
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/leaderboards?board=kills", timeout=5) as response: return response.status == 200
+        except OSError: time.sleep(0.2)
+    return False
+
+
+def bench_load(args):
+    folder = _dataset_folder(args, args.raids) # Generowanie przed startem serwerów - oba dostają gotowy zbiór
+    filenames = [os.path.basename(filepath) for filepath in _raid_files(folder)]
+    client_counts = [int(count) for count in args.clients.split(',') if count.strip()]
+    report = {'benchmark': 'load', 'version': _code_version(), 'raids': len(filenames), 'duration_seconds': args.duration,
+              'sse_clients': args.sse_clients, 'mix': dict(LOAD_MIX), 'servers': {}}
+    common = ['--raids', str(args.raids), '--seed', str(args.seed), '--data-dir', args.data_dir] + (['--full-profile'] if args.full_profile else [])
+    for server in args.servers.split(','):
+        if server == 'asgi' and importlib.util.find_spec('uvicorn') is None:
+            report['servers'][server] = {'skipped': "brak uvicorn (pip install uvicorn)"}; continue
+        print(f"Serwer {server}...", file=sys.stderr)
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--server', server, '--port', str(args.port)] + common,
+                                   stdout=subprocess.DEVNULL)
+        try:
+            if not _wait_for_server(args.port, process): sys.exit(f"Serwer {server} nie wystartował")
+            with urllib.request.urlopen(f"http://127.0.0.1:{args.port}/api/leaderboards?board=kills") as response:
+                nicknames = [row['nickname'] for row in json.load(response)['data']['boards']['kills']]
+            pools = {'raid': [f"/api/raid/{urllib.parse.quote(filename)}" for filename in filenames], # Wiele plików - większość żądań omija LRU
+                     'player_raids': [f"/api/player/{urllib.parse.quote(nickname)}/raids?limit=20" for nickname in nicknames],
+                     'player_page': [f"/player/{urllib.parse.quote(nickname)}" for nickname in nicknames]}
+            rng = random.Random(args.seed)
+            paths = [rng.choice(pools[kind]) for kind, weight in LOAD_MIX for _ in range(weight * 200)]
+            asyncio.run(_load_round(args.port, paths, 1, 1, 0, args.seed)) # Rozgrzewka
+            report['servers'][server] = {str(clients): asyncio.run(_load_round(args.port, paths, clients, args.duration, args.sse_clients, args.seed))
+                                         for clients in client_counts}
+        finally:
+            process.terminate(); process.wait(timeout=30)
+    return report
+
+
+def _code_version():
+    """Commit gita (z dopiskiem -dirty), żeby wyniki różnych wersji dało się porównać."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=statsapp.BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=statsapp.BASE_DIR, capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError): return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarki StatsMods Tarkov (wynik w formacie JSON).")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parsers_cmd = subparsers.add_parser('parsers', help="Porównanie ścieżek wczytywania JSON rajdu.")
+    parsers_cmd.add_argument('--folder', default=statsapp.DEBUG_LOGS_FOLDER)
+    parsers_cmd.add_argument('--repeat', type=int, default=5)
+    parsers_cmd.set_defaults(handler=bench_parsers)
+
+    memory_cmd = subparsers.add_parser('memory', help="Pamięć na 1000 rajdów: pełne dane vs RaidSummary.")
+    memory_cmd.add_argument('--folder', default=statsapp.DEBUG_LOGS_FOLDER)
+    memory_cmd.add_argument('--raids', type=int, default=1000)
+    memory_cmd.set_defaults(handler=bench_memory)
+
+    translations_cmd = subparsers.add_parser('translations', help="Czas ekstrakcji rajdu: dawne get_item_name vs płaska tabela.")
+    translations_cmd.add_argument('--folder', default=statsapp.DEBUG_LOGS_FOLDER)
+    translations_cmd.add_argument('--repeat', type=int, default=20)
+    translations_cmd.set_defaults(handler=bench_translations)
+
+    generate_cmd = subparsers.add_parser('generate', help="Generuje syntetyczne pliki rajdów na bazie próbek.")
+    generate_cmd.add_argument('--folder', default=statsapp.DEBUG_LOGS_FOLDER, help="Folder z próbkami")
+    generate_cmd.add_argument('--out', required=True)
+    generate_cmd.add_argument('--raids', type=int, default=1000)
+    generate_cmd.add_argument('--seed', type=int, default=1)
+    generate_cmd.add_argument('--full-profile', action='store_true', help="Zachowaj duże, nieużywane gałęzie profilu (Quests, Encyclopedia...)")
+    generate_cmd.set_defaults(handler=bench_generate)
+
+    for name, help_text in (('suite', "Pełny benchmark na syntetycznych danych dla kilku skal."),
+                            ('scale', "Jedna skala suite w bieżącym procesie.")):
+        command = subparsers.add_parser(name, help=help_text)
+        if name == 'suite': command.add_argument('--scales', default='100,1000,10000,100000')
+        else: command.add_argument('--raids', type=int, required=True)
+        command.add_argument('--data-dir', default=os.path.join(statsapp.BASE_DIR, 'benchmark_data'), help="Gdzie trzymać wygenerowane zbiory")
+        command.add_argument('--seed', type=int, default=1)
+        command.add_argument('--full-profile', action='store_true')
+        command.add_argument('--requests', type=int, default=50, help="Żądań na trasę")
+        command.add_argument('--sample', type=int, default=200, help="Plików do pomiaru process_single_raid_file")
+        command.add_argument('--refreshes', type=int, default=5, help="Powtórzeń pomiaru odświeżenia cache")
+        command.add_argument('--new-files', type=int, default=10, help="Nowych plików na jedno odświeżenie")
+        command.set_defaults(handler=bench_suite if name == 'suite' else bench_scale)
+
+    load_cmd = subparsers.add_parser('load', help="Przepustowość przy współbieżnych klientach: serwer wątkowy vs ASGI.")
+    serve_cmd = subparsers.add_parser('serve', help="Serwer dla pomiaru load (uruchamiany przez load).")
+    for command in (load_cmd, serve_cmd):
+        command.add_argument('--raids', type=int, default=1000)
+        command.add_argument('--data-dir', default=os.path.join(statsapp.BASE_DIR, 'benchmark_data'), help="Gdzie trzymać wygenerowane zbiory")
+        command.add_argument('--seed', type=int, default=1)
+        command.add_argument('--full-profile', action='store_true')
+        command.add_argument('--port', type=int, default=5099)
+    load_cmd.add_argument('--servers', default=','.join(LOAD_SERVERS))
+    load_cmd.add_argument('--clients', default='1,8,32,128', help="Liczby współbieżnych klientów")
+    load_cmd.add_argument('--duration', type=float, default=5.0, help="Sekund na jedną liczbę klientów")
+    load_cmd.add_argument('--sse-clients', type=int, default=0, help="Dodatkowe połączenia SSE otwarte w trakcie pomiaru")
+    load_cmd.set_defaults(handler=bench_load)
+    serve_cmd.add_argument('--server', choices=LOAD_SERVERS, required=True)
+    serve_cmd.set_defaults(handler=bench_serve)
+
+    args = parser.parse_args(argv)
+    with contextlib.redirect_stdout(sys.stderr): report = args.handler(args)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Wspólne fixture'y testów. Rajdy są syntetyczne (benchmark.generate_raids, mutacje próbek z debug_logs),
+a każdy test dostaje własny folder logów, indeks SQLite i pusty stan cache."""
+import os
+import sys
+import json
+import shutil
+import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as statsapp
+import benchmark
+
+RAID_POOL_SIZE = 200
+
+
+@pytest.fixture(scope='session')
+def raid_pool(tmp_path_factory):
+    """Folder z RAID_POOL_SIZE wygenerowanymi rajdami (wspólny dla wszystkich testów) i lista ich nazw."""
+    folder = str(tmp_path_factory.mktemp('raid_pool'))
+    filenames = benchmark.generate_raids(folder, RAID_POOL_SIZE, seed=7, folder=statsapp.DEBUG_LOGS_FOLDER)
+    return folder, sorted(filenames, key=statsapp.get_timestamp_from_filename)
+
+
+class RaidLogs:
+    """Folder logów testu: kopiuje rajdy z puli, usuwa je i modyfikuje (zawsze z nowym mtime)."""
+
+    def __init__(self, folder, pool_folder, pool):
+        self.folder = folder; self.pool_folder = pool_folder; self.pool = pool
+        self._mtime_ns = 1_700_000_000 * 10**9
+
+    def path(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def _touch(self, filename):
+        self._mtime_ns += 10**9; os.utime(self.path(filename), ns=(self._mtime_ns, self._mtime_ns))
+
+    def add(self, filenames):
+        for filename in filenames: shutil.copy(os.path.join(self.pool_folder, filename), self.folder); self._touch(filename)
+
+    def remove(self, filenames):
+        for filename in filenames: os.remove(self.path(filename))
+
+    def rewrite(self, filename, nickname):
+        """Zmienia treść pliku: rajd przechodzi do innego gracza."""
+        with open(self.path(filename), encoding='utf-8') as f: data = json.load(f)
+        data['results']['profile']['Info']['Nickname'] = nickname
+        with open(self.path(filename), 'w', encoding='utf-8') as f: json.dump(data, f)
+        self._touch(filename)
+
+    def write(self, filename, text):
+        with open(self.path(filename), 'w', encoding='utf-8') as f: f.write(text)
+        self._touch(filename)
+
+    def present(self):
+        return sorted(name for name in os.listdir(self.folder) if name.endswith('.json'))
+
+
+@pytest.fixture
+def raid_logs(raid_pool, tmp_path, monkeypatch):
+    """Izolowane środowisko aplikacji: pusty folder logów, własny indeks i plik współdzielonego cache, czysty stan."""
+    folder = tmp_path / 'debug_logs'; folder.mkdir()
+    monkeypatch.setattr(statsapp, 'DEBUG_LOGS_FOLDER', str(folder))
+    monkeypatch.setattr(statsapp, 'RAID_INDEX_PATH', str(tmp_path / 'raid_index.sqlite3'))
+    monkeypatch.setattr(statsapp, 'RAID_SHARED_CACHE_PATH', str(tmp_path / 'raid_snapshot.pickle'))
+    monkeypatch.setattr(statsapp, 'RAID_CACHE_BACKEND', 'memory')
+    monkeypatch.setattr(statsapp, 'RAID_FILE_SETTLE_SECONDS', 0)
+    monkeypatch.setattr(statsapp, 'PARSE_WORKERS', 1)
+    monkeypatch.setattr(statsapp, 'CACHE_REFRESH_IN_BACKGROUND', False)
+    monkeypatch.setattr(statsapp, 'RAID_INGEST_STATE', statsapp._new_ingest_state())
+    monkeypatch.setattr(statsapp, 'RAID_DATA_CACHE', {})
+    monkeypatch.setattr(statsapp, 'LAST_CACHE_UPDATE', datetime.datetime.min)
+    monkeypatch.setitem(statsapp._cache_refresh, 'published', None)
+    monkeypatch.setitem(statsapp._raid_archive, 'folder', None)
+    statsapp._load_raid_details.cache_clear()
+    yield RaidLogs(str(folder), *raid_pool)
+    statsapp._load_raid_details.cache_clear()
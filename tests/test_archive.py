@@ -0,0 +1,75 @@
+"""Archiwum debug_logs (segmenty .dat + indeksy .idx): spakowane pliki czyta się jak z folderu, z tą samą sygnaturą."""
+import os
+import datetime
+
+import pytest
+
+import app as statsapp
+
+CODECS = ['gzip'] + (['zstd'] if statsapp.zstandard is not None else [])
+
+
+def _contents(raid_logs, filenames):
+    result = {}
+    for filename in filenames:
+        with open(raid_logs.path(filename), 'rb') as f: result[filename] = f.read()
+    return result
+
+
+@pytest.mark.parametrize('codec', CODECS)
+def test_pack_round_trip(raid_logs, codec):
+    raid_logs.add(raid_logs.pool[:30])
+    state = statsapp._new_ingest_state(); statsapp.refresh_raid_data(state, settle_seconds=0)
+    signatures = statsapp.scan_raid_files(); packed = raid_logs.pool[:20]; contents = _contents(raid_logs, packed)
+    count, raw_bytes, packed_bytes = statsapp.pack_raid_archive(packed, codec)
+    assert count == 20 and raw_bytes == sum(map(len, contents.values())) and packed_bytes < raw_bytes
+    assert raid_logs.present() == sorted(raid_logs.pool[20:30])
+    for filename, content in contents.items():
+        entry = statsapp.lookup_raid_archive(filename)
+        assert entry[3:] == signatures[filename]
+        with statsapp.open_raid_file(raid_logs.path(filename)) as f: assert f.read() == content
+    assert statsapp.scan_raid_files() == signatures
+    assert statsapp.refresh_raid_data(state, settle_seconds=0) == 0 # Spakowanie nie jest zmianą pliku
+
+
+def test_archived_raids_load_without_index(raid_logs, monkeypatch):
+    raid_logs.add(raid_logs.pool[:10])
+    expected = statsapp._new_ingest_state(); statsapp.refresh_raid_data(expected, settle_seconds=0)
+    statsapp.pack_raid_archive(raid_logs.pool[:10])
+    monkeypatch.setattr(statsapp, 'RAID_INDEX_PATH', str(raid_logs.path('brak-indeksu.sqlite3')))
+    state = statsapp._new_ingest_state(); statsapp.refresh_raid_data(state, settle_seconds=0)
+    assert list(state['all_raids']) == list(expected['all_raids']) and not state['errors']
+    statsapp.LAST_CACHE_UPDATE = datetime.datetime.min; statsapp.get_cached_raid_data()
+    assert statsapp.get_raid_details(raid_logs.pool[0])['nickname'] == expected['file_cache'][raid_logs.pool[0]]['nickname']
+
+
+def test_segments_roll_over(raid_logs, monkeypatch):
+    monkeypatch.setattr(statsapp, 'RAID_ARCHIVE_SEGMENT_MAX_BYTES', 64 * 1024)
+    raid_logs.add(raid_logs.pool[:40]); contents = _contents(raid_logs, raid_logs.pool[:40])
+    statsapp.pack_raid_archive(raid_logs.pool[:20]); statsapp.pack_raid_archive(raid_logs.pool[20:40])
+    segments = [name for name in os.listdir(statsapp.raid_archive_folder()) if name.endswith('.dat')]
+    assert len(segments) > 1
+    catalog = statsapp.load_raid_archive_catalog()
+    assert {filename: statsapp.read_archived_raid(entry, filename) for filename, entry in catalog.items()} == contents
+
+
+def test_interrupted_pack_only_removes_original(raid_logs):
+    raid_logs.add(raid_logs.pool[:3]); filename = raid_logs.pool[0]
+    stat = os.stat(raid_logs.path(filename)); content = _contents(raid_logs, [filename])[filename]
+    statsapp.pack_raid_archive([filename])
+    # Oryginał, który przetrwał przerwane pakowanie: ta sama treść i sygnatura co rekord w archiwum
+    with open(raid_logs.path(filename), 'wb') as f: f.write(content)
+    os.utime(raid_logs.path(filename), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert statsapp.pack_raid_archive([filename]) == (0, 0, 0)
+    assert not os.path.exists(raid_logs.path(filename))
+    assert len(statsapp.load_raid_archive_catalog()) == 1
+
+
+def test_corrupt_record_raises_value_error(raid_logs):
+    raid_logs.add(raid_logs.pool[:2]); statsapp.pack_raid_archive(raid_logs.pool[:2])
+    entry = statsapp.lookup_raid_archive(raid_logs.pool[1])
+    with pytest.raises(ValueError): statsapp.read_archived_raid(entry, raid_logs.pool[0]) # Wpis wskazuje rekord innego pliku
+    segment_path, offset = entry[:2]
+    with open(segment_path, 'r+b') as f: f.seek(offset); f.write(b'XXXX')
+    with pytest.raises(ValueError): statsapp.read_archived_raid(entry, raid_logs.pool[1])
+    with pytest.raises(ValueError): statsapp.open_raid_file(raid_logs.path(raid_logs.pool[1]))
@@ -0,0 +1,56 @@
+"""Tryb ASGI (asgi.py): natywne trasy JSON zwracają to samo co trasy Flaska, a strony Jinja przechodzą przez call_flask."""
+import asyncio
+from collections import OrderedDict
+
+import pytest
+
+httpx = pytest.importorskip('httpx')
+
+import app as statsapp
+import asgi
+
+IDENTITY = {'Accept-Encoding': 'identity'}
+
+
+@pytest.fixture
+def clients(raid_logs, monkeypatch):
+    monkeypatch.setattr(statsapp, '_rendered_pages', {'etag': None, 'entries': OrderedDict(), 'lock': statsapp.threading.Lock()})
+    raid_logs.add(raid_logs.pool[:30]); statsapp.get_cached_raid_data()
+    return statsapp.app.test_client(), raid_logs
+
+
+def _asgi_get(urls, headers=IDENTITY):
+    async def fetch():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            return [await client.get(url, headers=headers) for url in urls]
+    return asyncio.run(fetch())
+
+
+def _top_player():
+    players = statsapp.RAID_DATA_CACHE['players_summary']
+    return max(players, key=lambda nickname: players[nickname]['raid_count'])
+
+
+def test_native_routes_match_flask(clients):
+    flask_client, raid_logs = clients; nickname = _top_player()
+    urls = [f'/api/raid/{raid_logs.pool[0]}', f'/api/raid/{raid_logs.pool[29]}', '/api/raid/brak.json',
+            f'/api/player/{nickname}/raids?limit=5', f'/api/player/{nickname}/raids?limit=5&map=nie-ma', '/api/player/nikt/raids',
+            f'/api/player/{nickname}/raids?cursor=nie-kursor']
+    for url, response in zip(urls, _asgi_get(urls)):
+        expected = flask_client.get(url, headers=IDENTITY)
+        assert response.status_code == expected.status_code, url
+        assert response.json() == expected.get_json(), url
+        assert response.headers.get('etag') == expected.headers.get('ETag'), url
+    etag = flask_client.get(urls[0], headers=IDENTITY).headers['ETag']
+    assert _asgi_get(urls[:1], dict(IDENTITY, **{'If-None-Match': etag}))[0].status_code == 304
+
+
+def test_jinja_pages_go_through_flask(clients):
+    flask_client, _ = clients; nickname = _top_player()
+    urls = ['/', '/players', f'/player/{nickname}', '/leaderboards', '/analytics', '/nie-ma-takiej-strony']
+    for url, response in zip(urls, _asgi_get(urls)):
+        expected = flask_client.get(url, headers=IDENTITY)
+        assert response.status_code == expected.status_code, url
+        assert response.content == expected.get_data(), url
+        assert response.headers.get('content-type') == expected.headers.get('Content-Type'), url
@@ -0,0 +1,33 @@
+"""Stale-while-revalidate: przeterminowana migawka jest zwracana od razu, a odświeża ją jeden wątek w tle."""
+import datetime
+import threading
+
+import app as statsapp
+
+
+def test_stale_snapshot_is_refreshed_once(raid_logs, monkeypatch):
+    raid_logs.add(raid_logs.pool[:10]); old = statsapp.get_cached_raid_data()
+    monkeypatch.setattr(statsapp, 'CACHE_REFRESH_IN_BACKGROUND', True)
+    refresh_raid_data = statsapp.refresh_raid_data; calls = []; release = threading.Event()
+    def slow_refresh(*args, **kwargs):
+        calls.append(threading.current_thread().name); release.wait(10)
+        return refresh_raid_data(*args, **kwargs)
+    monkeypatch.setattr(statsapp, 'refresh_raid_data', slow_refresh)
+    raid_logs.add(raid_logs.pool[10:15]); statsapp.LAST_CACHE_UPDATE = datetime.datetime.min
+
+    start = threading.Barrier(8); results = []
+    def request(): start.wait(); results.append(statsapp.get_cached_raid_data())
+    callers = [threading.Thread(target=request) for _ in range(8)]
+    for caller in callers: caller.start()
+    for caller in callers: caller.join(timeout=5)
+    assert len(results) == 8 and all(result is old for result in results) # Nikt nie czekał na odświeżenie
+    assert [thread.name for thread in threading.enumerate()].count('raid-cache-refresh') == 1
+    release.set(); statsapp._cache_refresh['thread'].join(timeout=10)
+    assert calls == ['raid-cache-refresh']
+
+    new = statsapp.get_cached_raid_data()
+    assert new is not old and calls == ['raid-cache-refresh']
+    assert len(old['all_raids']) == 10 # Poprzednia migawka nie zmieniła się w trakcie odświeżania
+    assert [raid['filename'] for raid in new['all_raids']] == raid_logs.pool[:15][::-1]
+    assert set(new['file_signatures']) == set(raid_logs.pool[:15])
+    assert sum(player['raid_count'] for player in new['players_summary'].values()) == 15
@@ -0,0 +1,56 @@
+"""Eksport rajdów: NDJSON z API i z CLI to jeden rajd na linię z pełnymi danymi, Parquet - te same rajdy i kolumny."""
+import json
+
+import pytest
+
+import app as statsapp
+
+
+@pytest.fixture
+def exported(raid_logs, monkeypatch):
+    monkeypatch.setattr(statsapp, 'EXPORT_BATCH_SIZE', 7) # Kilka partii odczytu z indeksu i kilka porcji odpowiedzi
+    raid_logs.add(raid_logs.pool[:30]); raid_logs.write(raid_logs.pool[5], '{uszkodzony')
+    cached_data = statsapp.get_cached_raid_data()
+    return [statsapp.get_raid_details(raid['filename']) for raid in reversed(cached_data['all_raids'])] # Od najstarszego
+
+
+def _expected_lines(raids):
+    return [json.loads(statsapp.export_raid_json(raid_data)) for raid_data in raids]
+
+
+def test_api_ndjson_round_trips(exported):
+    client = statsapp.app.test_client()
+    response = client.get('/api/export/raids')
+    lines = response.get_data(as_text=True).splitlines()
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    assert len(lines) == len(exported) == 29 and response.headers['X-Export-Raids'] == '29'
+    assert [json.loads(line) for line in lines] == _expected_lines(exported)
+    assert json.loads(lines[0])['timestamp'] == exported[0]['timestamp'].isoformat()
+    since = response.headers['X-Export-Next-Since']
+    assert client.get('/api/export/raids', query_string={'since': since}).get_data() == b''
+    nickname = exported[0]['nickname']
+    lines = client.get('/api/export/raids', query_string={'nickname': nickname}).get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == _expected_lines(raid for raid in exported if raid['nickname'] == nickname)
+    assert client.get('/api/export/raids?from=nie-data').status_code == 400
+
+
+def test_cli_ndjson_matches_api(exported, tmp_path):
+    out_path = tmp_path / 'raids.ndjson'
+    result = statsapp.app.test_cli_runner().invoke(args=['export', 'raids', '--out', str(out_path)])
+    assert result.exit_code == 0, result.output
+    assert f"Wyeksportowano {len(exported)} rajdów" in result.output
+    lines = out_path.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == _expected_lines(exported)
+    assert out_path.read_bytes() == statsapp.app.test_client().get('/api/export/raids').get_data()
+
+
+def test_cli_parquet(exported, tmp_path):
+    pytest.importorskip('pyarrow')
+    out_path = tmp_path / 'raids.parquet'
+    result = statsapp.app.test_cli_runner().invoke(args=['export', 'raids', '--out', str(out_path)])
+    assert result.exit_code == 0, result.output
+    rows = statsapp.pyarrow.parquet.read_table(out_path).to_pylist()
+    assert [row['filename'] for row in rows] == [raid['filename'] for raid in exported]
+    for row, raid_data in zip(rows, exported):
+        assert (row['nickname'], row['level'], row['timestamp']) == (raid_data['nickname'], raid_data['level'], raid_data['timestamp'])
+        assert json.loads(row['victims']) == json.loads(statsapp.export_raid_json(raid_data['victims']))
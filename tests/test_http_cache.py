@@ -0,0 +1,90 @@
+"""Cache HTTP: ETag migawki i 304 dla stron z niej liczonych, warianty skompresowane i ETag szczegółów rajdu."""
+import gzip
+import datetime
+from collections import OrderedDict
+
+import pytest
+
+import app as statsapp
+
+ENCODINGS = ['gzip'] + (['br'] if statsapp.brotli is not None else [])
+
+
+@pytest.fixture
+def client(raid_logs, monkeypatch):
+    monkeypatch.setattr(statsapp, '_rendered_pages', {'etag': None, 'entries': OrderedDict(), 'lock': statsapp.threading.Lock()})
+    raid_logs.add(raid_logs.pool[:20])
+    return statsapp.app.test_client()
+
+
+def _refresh(raid_logs, filenames):
+    raid_logs.add(filenames); statsapp.LAST_CACHE_UPDATE = datetime.datetime.min
+
+
+def test_page_has_snapshot_etag_and_304(client):
+    response = client.get('/', headers={'Accept-Encoding': 'identity'})
+    etag, weak = response.get_etag()
+    assert response.status_code == 200 and not weak
+    assert etag == statsapp.snapshot_etag(statsapp.get_cached_raid_data())
+    assert response.headers['Cache-Control'] == 'no-cache' and 'Accept-Encoding' in response.vary
+    not_modified = client.get('/', headers={'If-None-Match': f'"{etag}"'})
+    assert not_modified.status_code == 304 and not_modified.get_data() == b''
+    assert not_modified.get_etag() == (etag, False) and 'Accept-Encoding' in not_modified.vary
+
+
+def test_new_snapshot_changes_etag(client, raid_logs):
+    first = client.get('/'); etag, _ = first.get_etag()
+    _refresh(raid_logs, raid_logs.pool[20:25])
+    response = client.get('/', headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+    assert response.get_data() != first.get_data() # Nowe ostatnie rajdy, nie zapamiętana strona poprzedniej migawki
+
+
+def test_rendered_page_is_reused_until_next_snapshot(client, raid_logs, monkeypatch):
+    rendered = []
+    render_template = statsapp.render_template
+    monkeypatch.setattr(statsapp, 'render_template', lambda *args, **kwargs: rendered.append(args[0]) or render_template(*args, **kwargs))
+    first = client.get('/'); second = client.get('/')
+    assert rendered == ['index.html'] and first.get_data() == second.get_data()
+    _refresh(raid_logs, raid_logs.pool[20:21]); client.get('/')
+    assert rendered == ['index.html'] * 2
+
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+def test_compressed_variant_has_own_etag(client, encoding):
+    plain = client.get('/', headers={'Accept-Encoding': 'identity'})
+    response = client.get('/', headers={'Accept-Encoding': encoding})
+    etag, _ = plain.get_etag()
+    assert response.headers['Content-Encoding'] == encoding
+    assert response.get_etag() == (f"{etag}-{encoding}", False)
+    body = gzip.decompress(response.get_data()) if encoding == 'gzip' else statsapp.brotli.decompress(response.get_data())
+    assert body == plain.get_data()
+    not_modified = client.get('/', headers={'Accept-Encoding': encoding, 'If-None-Match': f'"{etag}-{encoding}"'})
+    assert not_modified.status_code == 304 and not_modified.get_etag()[0] == f"{etag}-{encoding}"
+
+
+def test_raid_details_etag_follows_file_signature(client, raid_logs):
+    filename = raid_logs.pool[0]
+    response = client.get(f'/api/raid/{filename}', headers={'Accept-Encoding': 'identity'})
+    etag, _ = response.get_etag()
+    assert response.status_code == 200 and etag
+    assert response.headers['Cache-Control'] == f"public, max-age={statsapp.RAID_DETAILS_MAX_AGE}"
+    assert client.get(f'/api/raid/{filename}', headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+    raid_logs.rewrite(filename, 'Przeniesiony'); statsapp.LAST_CACHE_UPDATE = datetime.datetime.min
+    response = client.get(f'/api/raid/{filename}', headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 200 and response.get_etag()[0] != etag
+    assert response.get_json()['data']['nickname'] == 'Przeniesiony'
+
+
+def test_failed_raid_details_are_not_cached(client, raid_logs, monkeypatch):
+    filename = raid_logs.pool[1]; failing = [True]
+    statsapp.get_cached_raid_data(); statsapp._load_raid_details.cache_clear()
+    process_single_raid_file = statsapp.process_single_raid_file
+    monkeypatch.setattr(statsapp, '_open_raid_index_safe', lambda: None)
+    monkeypatch.setattr(statsapp, 'process_single_raid_file',
+                        lambda filepath: (None, 'Błąd odczytu') if failing[0] else process_single_raid_file(filepath))
+    assert client.get(f'/api/raid/{filename}').status_code == 404
+    failing[0] = False # Np. chwilowy błąd odczytu - ten sam plik, ta sama sygnatura
+    response = client.get(f'/api/raid/{filename}')
+    assert response.status_code == 200 and response.get_json()['data']['filename'] == filename
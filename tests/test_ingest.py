@@ -0,0 +1,105 @@
+"""Przyrostowe wczytywanie: stan po serii odświeżeń (nowe, usunięte, zmienione i błędne pliki) musi być taki sam
+jak stan zbudowany od zera z tego samego folderu."""
+import random
+import datetime
+
+import app as statsapp
+
+START = datetime.datetime.now()
+
+
+def _rebuild(now):
+    state = statsapp._new_ingest_state(); state['leaderboards'] = statsapp._new_leaderboards(now)
+    statsapp.refresh_raid_data(state, settle_seconds=0)
+    return state
+
+
+def _churn(raid_logs, steps=6, removed_fraction=0.2):
+    """Lista (migawka przyrostowa, migawka zbudowana od zera) po każdym kroku. Migawki przyrostowe są budowane względem
+    poprzedniej, jak przy publikacji; okna rankingów przesuwają się o 3 dni na krok. Testy porównują migawki dopiero
+    po wszystkich krokach, więc sprawdzają też, że kolejne odświeżenia nie zmieniają wcześniej opublikowanych."""
+    rng = random.Random(11)
+    state = statsapp._new_ingest_state(); state['leaderboards'] = statsapp._new_leaderboards(START); previous = None; snapshots = []
+    for step in range(steps):
+        present = [name for name in raid_logs.present() if name != raid_logs.pool[-1]] # Ostatni z puli: plik uszkodzony w kroku 3
+        raid_logs.add(rng.sample([name for name in raid_logs.pool[:-1] if name not in present], 40))
+        if present: raid_logs.remove(rng.sample(present, int(len(present) * removed_fraction)))
+        if step == 2: raid_logs.rewrite(raid_logs.present()[0], 'Przeniesiony')
+        if step == 3: raid_logs.write(raid_logs.pool[-1], '{uszkodzony')
+        if step == 4: raid_logs.remove([raid_logs.pool[-1]])
+        now = START + datetime.timedelta(days=3 * step)
+        statsapp.refresh_raid_data(state, settle_seconds=0); statsapp.advance_leaderboards(state, now)
+        previous = statsapp.snapshot_ingest_state(state, previous)
+        snapshots.append((previous, statsapp.snapshot_ingest_state(_rebuild(now))))
+    return snapshots
+
+
+def test_incremental_refresh_matches_full_rebuild(raid_logs):
+    for step, (incremental, full) in enumerate(_churn(raid_logs)):
+        assert [raid['filename'] for raid in incremental['all_raids']] == [raid['filename'] for raid in full['all_raids']]
+        assert list(incremental['all_raids']) == list(full['all_raids'])
+        assert dict(incremental['file_signatures']) == dict(full['file_signatures'])
+        assert dict(incremental['file_cache']) == dict(full['file_cache'])
+        assert incremental['errors'] == full['errors']
+        if step == 2: assert any(raid['nickname'] == 'Przeniesiony' for raid in incremental['all_raids'])
+        if step == 3: assert len(incremental['errors']) == 1
+    assert len(incremental['all_raids']) == len(raid_logs.present())
+
+
+def test_refresh_reports_only_changed_files(raid_logs):
+    raid_logs.add(raid_logs.pool[:10])
+    state = statsapp._new_ingest_state()
+    assert statsapp.refresh_raid_data(state, settle_seconds=0) == 10
+    assert statsapp.refresh_raid_data(state, settle_seconds=0) == 0
+    raid_logs.remove(raid_logs.pool[:2]); raid_logs.add(raid_logs.pool[10:13])
+    assert statsapp.refresh_raid_data(state, settle_seconds=0) == 5
+    assert [raid['filename'] for raid in state['new_raids']] == raid_logs.pool[10:13]
+    assert statsapp.refresh_raid_data(state, filenames=[raid_logs.pool[5]], settle_seconds=0) == 0
+
+
+def test_player_indexes_and_aggregates_match_full_rebuild(raid_logs):
+    for incremental, full in _churn(raid_logs):
+        assert incremental['players_summary'] == full['players_summary']
+        assert [player['nickname'] for player in incremental['players_list']] == [player['nickname'] for player in full['players_list']]
+        assert incremental['indexes'] == full['indexes']
+        for nickname, player in incremental['players_summary'].items():
+            bucket = incremental['indexes']['nickname'][nickname]
+            assert list(player['raid_ids']) == [raid['filename'] for raid in reversed(bucket['raids'])]
+            assert player['raid_count'] == len(bucket['raids'])
+            assert player['longest_kill_distance'] == max((raid['longest_kill_distance'] for raid in bucket['raids']), default=0)
+
+
+def test_analytics_columns_match_full_rebuild(raid_logs, monkeypatch):
+    # Małe kawałki i częste sprzątanie, żeby kilka kroków przeszło przez zamknięte kawałki i compact()
+    monkeypatch.setattr(statsapp, 'ANALYTICS_CHUNK_ROWS', 16); monkeypatch.setattr(statsapp, 'ANALYTICS_COMPACT_MIN_DEAD', 8)
+    for incremental, full in _churn(raid_logs, removed_fraction=0.6):
+        nickname = max(full['players_summary'], key=lambda name: full['players_summary'][name]['raid_count'])
+        for args in ({}, {'nickname': nickname}, {'map': full['all_raids'][0]['location']}):
+            for view in statsapp.ANALYTICS_VIEWS:
+                assert statsapp._run_analytics(view, incremental, args) == statsapp._run_analytics(view, full, args), (view, args)
+
+
+def test_leaderboards_match_full_rebuild(raid_logs, monkeypatch):
+    # Pula to ~200 rajdów z całego roku: w oknach 7d i 24h prawie nic by nie było, a przesuwanie okien niczego by nie odejmowało
+    windows = {'all': None, '60d': datetime.timedelta(days=60), '20d': datetime.timedelta(days=20)}
+    monkeypatch.setattr(statsapp, 'LEADERBOARD_WINDOWS', windows)
+    filled = set()
+    for incremental, full in _churn(raid_logs):
+        assert incremental['leaderboards'] == full['leaderboards']
+        filled.update(window for window, leaderboards in full['leaderboards'].items() if leaderboards['boards']['kills'])
+    assert filled == set(windows)
+
+
+def _rounded_series(timeseries):
+    # Sumy float (skill_points) po dodaniu i odjęciu rajdu zostawiają resztki rzędu 1e-12
+    return {key: (series['keys'], {bucket: tuple(round(value, 6) for value in totals) for bucket, totals in series['values'].items()})
+            for key, series in timeseries.items()}
+
+
+def test_timeseries_match_full_rebuild(raid_logs):
+    for incremental, full in _churn(raid_logs, removed_fraction=0.4):
+        assert _rounded_series(incremental['timeseries']) == _rounded_series(full['timeseries'])
+        nickname = max(full['players_summary'], key=lambda name: full['players_summary'][name]['raid_count'])
+        for period in statsapp.ANALYTICS_BUCKETS:
+            assert (statsapp.query_timeseries(incremental['timeseries'], nickname, None, period, None, None, 50)
+                    == statsapp.query_timeseries(full['timeseries'], nickname, None, period, None, None, 50))
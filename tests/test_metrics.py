@@ -0,0 +1,36 @@
+"""Endpoint /metrics: po odświeżeniu cache i renderze strony są w nim histogramy etapów i liczniki."""
+import re
+from collections import OrderedDict, defaultdict
+
+import app as statsapp
+
+
+def _samples(text):
+    """{(nazwa, etykiety): wartość} z formatu tekstowego Prometheus."""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('#'): continue
+        match = re.fullmatch(r'(\w+)(?:\{(.*)\})? (\S+)', line); assert match, line
+        labels = tuple(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ''))
+        samples[match.group(1), labels] = float(match.group(3))
+    return samples
+
+
+def test_refresh_and_render_are_measured(raid_logs, monkeypatch):
+    monkeypatch.setattr(statsapp, '_metrics', {'counters': defaultdict(float), 'histograms': {}})
+    monkeypatch.setattr(statsapp, '_rendered_pages', {'etag': None, 'entries': OrderedDict(), 'lock': statsapp.threading.Lock()})
+    raid_logs.add(raid_logs.pool[:10]); raid_logs.write(raid_logs.pool[0], '{uszkodzony')
+    client = statsapp.app.test_client()
+    assert client.get('/').status_code == 200
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    samples = _samples(response.get_data(as_text=True))
+    for stage, count in {'refresh': 1, 'scan': 1, 'aggregate': 1, 'parse': 9, 'extract': 9}.items():
+        assert samples['statsmods_stage_seconds_count', (('stage', stage),)] == count, stage
+        assert samples['statsmods_stage_seconds_bucket', (('stage', stage), ('le', '+Inf'))] == count
+    assert samples['statsmods_render_seconds_count', (('endpoint', 'index'), ('template', 'index.html'))] == 1
+    assert samples['statsmods_cache_requests_total', (('result', 'miss'),)] == 1
+    assert samples['statsmods_cache_rebuilds_total', (('kind', 'full'),)] == 1
+    assert samples['statsmods_raid_parse_errors_total', (('filename', raid_logs.pool[0]),)] == 1
+    assert samples['statsmods_raids', ()] == 9 and samples['statsmods_raid_files_with_errors', ()] == 1
+    assert '# TYPE statsmods_stage_seconds histogram' in response.get_data(as_text=True)
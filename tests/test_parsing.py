@@ -0,0 +1,59 @@
+"""Parsowanie plików rajdów: pula procesów daje to samo co parsowanie szeregowe (z ustawieniami procesu głównego),
+a szybsze parsery JSON to samo co stdlib json."""
+import json
+
+import pytest
+
+import app as statsapp
+
+
+@pytest.fixture
+def translation_file(tmp_path, monkeypatch):
+    """Własny pl.json testu (tylko nazwy map); globalne tłumaczenia modułu wracają po teście."""
+    for name in ('translations', 'translations_hash', 'translations_mtime_ns', 'item_names', '_raid_index_versions'):
+        monkeypatch.setattr(statsapp, name, getattr(statsapp, name))
+    path = tmp_path / 'pl.json'; monkeypatch.setattr(statsapp, 'TRANSLATION_FILE_PATH', str(path))
+    path.write_text(json.dumps({'Woods': 'Las z testu', 'Interchange': 'Węzeł z testu'}), encoding='utf-8')
+    assert statsapp.load_translations()
+
+
+def _parsed(results):
+    return [(summary, error, inputs) for summary, error, inputs, _, _, _ in results]
+
+
+@pytest.mark.skipif(statsapp.ijson is None, reason="brak ijson")
+def test_pool_matches_serial_with_parent_settings(raid_logs, translation_file, monkeypatch, capsys):
+    monkeypatch.setattr(statsapp, 'RAID_JSON_PARSER', 'selective') # Inny niż domyślny 'auto'
+    filenames = raid_logs.pool[:statsapp.PARALLEL_PARSE_MIN_FILES + 8]; raid_logs.add(filenames)
+    raid_logs.write(filenames[3], '{"results": {"profile": {"Info": ') # Komunikat błędu zależy od parsera
+    serial = statsapp.parse_raid_files(filenames, workers=1)
+    parallel = statsapp.parse_raid_files(filenames, workers=2)
+    assert 'przechodzę w tryb szeregowy' not in capsys.readouterr().out
+    assert _parsed(parallel) == _parsed(serial)
+    locations = {summary['location'] for summary, _, _, _, _, _ in parallel if summary}
+    assert {'Las z testu', 'Węzeł z testu'} <= locations
+    monkeypatch.setattr(statsapp, 'RAID_JSON_PARSER', 'json')
+    assert parallel[3][1] != statsapp.parse_raid_files(filenames[3:4], workers=1)[0][1]
+
+
+PARSERS = [pytest.param('selective', marks=pytest.mark.skipif(statsapp.ijson is None, reason="brak ijson")),
+           pytest.param('orjson', marks=pytest.mark.skipif(statsapp.orjson is None, reason="brak orjson"))]
+
+
+def _process_with(parser, monkeypatch, filepath):
+    monkeypatch.setattr(statsapp, 'RAID_JSON_PARSER', parser)
+    return statsapp.process_single_raid_file(filepath)
+
+
+@pytest.mark.parametrize('parser', PARSERS)
+def test_parser_matches_stdlib_json(raid_logs, monkeypatch, parser):
+    filenames = raid_logs.pool[:20]; raid_logs.add(filenames)
+    with open(raid_logs.path(filenames[0]), encoding='utf-8') as f: content = f.read()
+    raid_logs.write(filenames[0], content[:len(content) // 2]) # Plik ucięty w trakcie zapisu
+    for filename in filenames:
+        expected = _process_with('json', monkeypatch, raid_logs.path(filename))
+        result = _process_with(parser, monkeypatch, raid_logs.path(filename))
+        assert result[0] == expected[0], filename
+        # Komunikat błędu pochodzi od parsera - porównujemy tylko jego rodzaj
+        assert [error.split(':')[0] if error else None for error in (result[1], expected[1])] == [
+            f"Błąd parsowania JSON w pliku {filename}" if filename == filenames[0] else None] * 2
@@ -0,0 +1,78 @@
+"""Trwały indeks przetworzonych rajdów (SQLite): trafienia bez parsowania i unieważnianie wpisów przy zmianie wersji."""
+import os
+import sys
+import shutil
+import sqlite3
+import subprocess
+
+import pytest
+
+import app as statsapp
+
+
+def _refuse_parsing(filenames, *args, **kwargs):
+    if filenames: raise AssertionError(f"parsowanie {len(filenames)} plików zamiast odczytu z indeksu")
+    return []
+
+
+def _index_rows():
+    with sqlite3.connect(statsapp.RAID_INDEX_PATH) as conn: return conn.execute("SELECT COUNT(*) FROM raids").fetchone()[0]
+
+
+def test_cold_start_reads_summaries_from_index(raid_logs, monkeypatch):
+    raid_logs.add(raid_logs.pool[:30])
+    parsed = statsapp._new_ingest_state(); statsapp.refresh_raid_data(parsed, settle_seconds=0)
+    assert _index_rows() == 30
+    monkeypatch.setattr(statsapp, 'parse_raid_files', _refuse_parsing)
+    cold = statsapp._new_ingest_state(); statsapp.refresh_raid_data(cold, settle_seconds=0)
+    assert dict(cold['file_cache']) == dict(parsed['file_cache'])
+    assert isinstance(cold['file_cache'][raid_logs.pool[0]], statsapp.RaidSummary)
+
+
+def test_touched_file_with_same_content_is_an_index_hit(raid_logs, monkeypatch):
+    raid_logs.add(raid_logs.pool[:5])
+    statsapp.refresh_raid_data(statsapp._new_ingest_state(), settle_seconds=0)
+    raid_logs.add(raid_logs.pool[:1]) # Ta sama treść, nowy mtime
+    monkeypatch.setattr(statsapp, 'parse_raid_files', _refuse_parsing)
+    state = statsapp._new_ingest_state(); statsapp.refresh_raid_data(state, settle_seconds=0)
+    assert len(state['all_raids']) == 5
+
+
+def test_version_change_drops_index_entries(raid_logs, monkeypatch):
+    raid_logs.add(raid_logs.pool[:5])
+    statsapp.refresh_raid_data(statsapp._new_ingest_state(), settle_seconds=0)
+    version = statsapp.compute_raid_index_version()
+    monkeypatch.setattr(statsapp, 'translations_hash', 'inne-tlumaczenia')
+    assert statsapp.compute_raid_index_version() != version
+    statsapp.open_raid_index().close()
+    assert _index_rows() == 0
+
+
+@pytest.mark.parametrize('blob', [b'', b'\x80\x05nie pickle'])
+def test_broken_index_entry_is_a_miss(raid_logs, blob):
+    raid_logs.add(raid_logs.pool[:1])
+    statsapp.refresh_raid_data(statsapp._new_ingest_state(), settle_seconds=0)
+    with sqlite3.connect(statsapp.RAID_INDEX_PATH) as conn:
+        conn.execute("UPDATE raids SET summary = ?, mtime_ns = 0", (blob,))
+    state = statsapp._new_ingest_state(); statsapp.refresh_raid_data(state, settle_seconds=0)
+    assert len(state['all_raids']) == 1
+
+
+# Indeks budowany przez `python app.py` (klasy w module __main__), a czytany przez `flask --app app`, gunicorn lub asgi.py.
+# Kopia app.py w osobnym folderze ma tam własne debug_logs i indeks (ścieżki względem BASE_DIR); app.run() jest pomijane.
+RUN_AS_SCRIPT = "import sys, runpy, flask; flask.Flask.run = lambda *args, **kwargs: None; runpy.run_path(sys.argv[1], run_name='__main__')"
+
+
+def test_index_built_by_another_entry_point_loads(raid_logs, tmp_path, monkeypatch):
+    raid_logs.add(raid_logs.pool[:20])
+    deployment = tmp_path / 'deployment'; deployment.mkdir()
+    shutil.copy(statsapp.__file__, deployment / 'app.py')
+    os.symlink(statsapp.TRANSLATE_FOLDER, deployment / os.path.basename(statsapp.TRANSLATE_FOLDER))
+    os.symlink(raid_logs.folder, deployment / os.path.basename(statsapp.DEBUG_LOGS_FOLDER))
+    subprocess.run([sys.executable, '-c', RUN_AS_SCRIPT, str(deployment / 'app.py')], check=True, capture_output=True)
+    monkeypatch.setattr(statsapp, 'RAID_INDEX_PATH', str(deployment / os.path.basename(statsapp.RAID_INDEX_PATH)))
+    assert _index_rows() == 20
+    monkeypatch.setattr(statsapp, 'parse_raid_files', _refuse_parsing)
+    state = statsapp._new_ingest_state(); statsapp.refresh_raid_data(state, settle_seconds=0)
+    assert len(state['all_raids']) == 20
+    assert all(type(raid) is statsapp.RaidSummary for raid in state['all_raids'])
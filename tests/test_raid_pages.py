@@ -0,0 +1,71 @@
+"""Stronicowanie historii rajdów gracza (/api/player/<nick>/raids): kursor po (timestamp, filename), filtry i zakres dat."""
+import datetime
+
+import pytest
+
+import app as statsapp
+
+
+@pytest.fixture
+def client(raid_logs):
+    raid_logs.add(raid_logs.pool[:150])
+    return statsapp.app.test_client()
+
+
+def _top_player():
+    players = statsapp.get_cached_raid_data()['players_summary']
+    return max(players, key=lambda nickname: players[nickname]['raid_count'])
+
+
+def _walk(client, nickname, query=''):
+    """Wszystkie strony po kolei; zwraca (nazwy plików, liczba stron)."""
+    filenames = []; cursor = None; pages = 0
+    while True:
+        url = f"/api/player/{nickname}/raids?limit=4&fields=filename,location,raid_result{query}" + (f"&cursor={cursor}" if cursor else '')
+        response = client.get(url); assert response.status_code == 200
+        payload = response.get_json(); pages += 1
+        filenames.extend(raid['filename'] for raid in payload['data'])
+        cursor = payload['next_cursor']
+        if cursor is None: return filenames, pages
+
+
+def _player_raids(nickname):
+    return list(statsapp.get_cached_raid_data()['indexes']['nickname'][nickname]['raids']) # Od najnowszego
+
+
+def test_pages_cover_history_newest_first(client):
+    nickname = _top_player(); raids = _player_raids(nickname)
+    filenames, pages = _walk(client, nickname)
+    assert filenames == [raid['filename'] for raid in raids]
+    assert pages == -(-len(raids) // 4)
+
+
+def test_filters_apply_across_pages(client):
+    nickname = _top_player(); raids = _player_raids(nickname)
+    location = raids[0]['location']
+    filenames, _ = _walk(client, nickname, f"&map={location}&result=Survived")
+    assert filenames == [raid['filename'] for raid in raids if raid['location'] == location and raid['raid_result'] == 'Survived']
+
+
+def test_date_range(client):
+    nickname = _top_player(); raids = _player_raids(nickname)
+    date_from = raids[-1]['timestamp'].date() + datetime.timedelta(days=30); date_to = raids[0]['timestamp'].date() - datetime.timedelta(days=30)
+    filenames, _ = _walk(client, nickname, f"&from={date_from.isoformat()}&to={date_to.isoformat()}")
+    assert filenames == [raid['filename'] for raid in raids if date_from <= raid['timestamp'].date() <= date_to]
+
+
+def test_cursor_is_stable_when_new_raids_arrive(client, raid_logs):
+    nickname = _top_player()
+    first = client.get(f"/api/player/{nickname}/raids?limit=5").get_json()
+    raid_logs.add(raid_logs.pool[150:]); statsapp.LAST_CACHE_UPDATE = datetime.datetime.min
+    second = client.get(f"/api/player/{nickname}/raids?limit=5&cursor={first['next_cursor']}").get_json()
+    raids = _player_raids(nickname); position = [raid['filename'] for raid in raids].index(first['data'][-1]['filename'])
+    assert position > 4 # Nowsze rajdy pojawiły się przed pierwszą stroną, a druga strona dalej zaczyna się za kursorem
+    assert [raid['filename'] for raid in second['data']] == [raid['filename'] for raid in raids[position + 1:position + 6]]
+
+
+def test_invalid_parameters(client):
+    nickname = _top_player()
+    assert client.get(f"/api/player/{nickname}/raids?cursor=nie-kursor").status_code == 400
+    assert client.get(f"/api/player/{nickname}/raids?limit=x").status_code == 400
+    assert client.get("/api/player/nikt/raids").status_code == 404
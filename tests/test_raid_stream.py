@@ -0,0 +1,48 @@
+"""Strumień SSE nowych rajdów: jedno zdarzenie na nowo wczytany rajd, a pełna kolejka klienta nie blokuje rozsyłania."""
+import json
+import queue
+import threading
+
+import app as statsapp
+
+
+def _events(chunks):
+    """Zdarzenia 'raid' do pierwszego podtrzymania połączenia (': ping')."""
+    events = []
+    for chunk in chunks:
+        chunk = chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+        if chunk.startswith(': ping'): return events
+        if 'data: ' in chunk: events.append(chunk)
+
+
+def test_new_raid_is_streamed_once(raid_logs, monkeypatch):
+    monkeypatch.setattr(statsapp, 'RAID_STREAM_HEARTBEAT_SECONDS', 0.2)
+    raid_logs.add(raid_logs.pool[:10]); statsapp.get_cached_raid_data()
+    response = statsapp.app.test_client().get('/api/stream/raids', buffered=False)
+    try:
+        chunks = iter(response.response)
+        assert next(chunks) == b"retry: 5000\n\n"
+        filename = raid_logs.pool[10]; raid_logs.add([filename])
+        with statsapp.RAID_INGEST_LOCK: assert statsapp._refresh_cache() == 1
+        events = _events(chunks)
+    finally: response.close()
+    assert len(events) == 1
+    lines = dict(line.split(': ', 1) for line in events[0].strip().split('\n'))
+    assert lines['id'] == filename and lines['event'] == 'raid'
+    cached_data = statsapp.RAID_DATA_CACHE; raid = cached_data['file_cache'][filename]
+    expected = statsapp.build_recent_raid_summary(raid, cached_data['players_summary'])
+    assert json.loads(lines['data']) == dict(expected, side_translated=statsapp.get_item_name(expected['side']))
+    assert not statsapp._raid_stream_subscribers # Zamknięcie połączenia wyrejestrowuje klienta
+
+
+def test_full_queue_drops_messages(raid_logs):
+    raid_logs.add(raid_logs.pool[:10]); cached_data = statsapp.get_cached_raid_data()
+    slow = queue.Queue(maxsize=2); fast = queue.Queue()
+    assert statsapp.subscribe_raid_stream(slow) and statsapp.subscribe_raid_stream(fast)
+    try:
+        raids = list(cached_data['all_raids'])[:5]
+        broadcast = threading.Thread(target=statsapp.broadcast_new_raids, args=(raids,), daemon=True); broadcast.start(); broadcast.join(timeout=5)
+        assert not broadcast.is_alive()
+    finally: statsapp.unsubscribe_raid_stream(slow); statsapp.unsubscribe_raid_stream(fast)
+    assert slow.qsize() == 2 and fast.qsize() == 5
+    assert [slow.get_nowait() for _ in range(2)] == [fast.get_nowait() for _ in range(2)]
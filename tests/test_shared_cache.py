@@ -0,0 +1,76 @@
+"""Backend 'shared': dziennik zmian zapisany przez proces wczytujący, nałożony na stan procesu czytającego,
+daje tę samą migawkę (łącznie z generacją i ETagiem) - także po zapisaniu dziennika od nowa."""
+import random
+import datetime
+
+import pytest
+
+import app as statsapp
+
+START = datetime.datetime.now()
+
+
+@pytest.fixture
+def shared_log(raid_logs, monkeypatch):
+    for key, value in {'identity': None, 'generation': 0, 'write_log': None, 'write_size': 0, 'base_size': 0,
+                       'read_log': None, 'read_offset': 0, 'read_ok': False}.items():
+        monkeypatch.setitem(statsapp._shared_cache, key, value)
+    return raid_logs
+
+
+def _reset_reader():
+    statsapp.RAID_INGEST_STATE.clear(); statsapp.RAID_INGEST_STATE.update(statsapp._new_ingest_state())
+    statsapp._shared_cache.update(identity=None, read_log=None, read_offset=0, read_ok=False)
+
+
+def _comparable(snapshot):
+    timeseries = {key: {bucket: tuple(round(value, 6) for value in totals) for bucket, totals in series['values'].items()}
+                  for key, series in snapshot['timeseries'].items()}
+    return (snapshot['generation'], snapshot['etag'], list(snapshot['all_raids']), dict(snapshot['file_signatures']), snapshot['errors'],
+            snapshot['players_summary'], snapshot['indexes'], snapshot['leaderboards'], timeseries)
+
+
+def test_reader_follows_log(shared_log):
+    rng = random.Random(5); raid_logs = shared_log
+    state = statsapp._new_ingest_state(); state['leaderboards'] = statsapp._new_leaderboards(START); previous = None
+    for step in range(6):
+        present = raid_logs.present()
+        raid_logs.add(rng.sample([name for name in raid_logs.pool if name not in present], 30))
+        if present: raid_logs.remove(rng.sample(present, len(present) // 4))
+        if step == 2: raid_logs.write(raid_logs.present()[0], '{uszkodzony')
+        now = START + datetime.timedelta(days=step)
+        statsapp.refresh_raid_data(state, settle_seconds=0); statsapp.advance_leaderboards(state, now)
+        previous = statsapp.snapshot_ingest_state(state, previous)
+        previous.update(generation=step + 1, etag=f"g{step + 1}-lider")
+        statsapp.write_shared_snapshot(state, previous, now, base=step == 4) # Krok 4: dziennik od nowa (np. po zmianie tłumaczeń)
+        assert statsapp.load_shared_snapshot()
+        assert _comparable(statsapp.RAID_DATA_CACHE) == _comparable(previous)
+        assert not statsapp.load_shared_snapshot() # Bez nowych rekordów nie ma nowej publikacji
+    # Proces uruchomiony później czyta migawkę bazową z kroku 4 i dopisane po niej zmiany
+    _reset_reader()
+    assert statsapp.load_shared_snapshot()
+    assert _comparable(statsapp.RAID_DATA_CACHE) == _comparable(previous)
+
+
+def test_log_is_rewritten_after_growth(shared_log, monkeypatch):
+    monkeypatch.setattr(statsapp, 'RAID_SHARED_LOG_MAX_GROWTH', 0.05)
+    raid_logs = shared_log; state = statsapp._new_ingest_state(); logs = set()
+    for step, chunk in enumerate(range(0, 100, 10)):
+        raid_logs.add(raid_logs.pool[chunk:chunk + 10]); statsapp.refresh_raid_data(state, settle_seconds=0)
+        snapshot = statsapp.snapshot_ingest_state(state); snapshot.update(generation=step + 1, etag=f"g{step + 1}-lider")
+        statsapp.write_shared_snapshot(state, snapshot, START)
+        logs.add(statsapp._shared_cache['write_log'])
+        assert statsapp._shared_cache['write_size'] <= 2.05 * statsapp._shared_cache['base_size']
+        assert statsapp.load_shared_snapshot()
+        assert list(statsapp.RAID_DATA_CACHE['all_raids']) == list(snapshot['all_raids'])
+    assert len(logs) > 1
+
+
+def test_log_from_other_version_is_skipped(shared_log, monkeypatch):
+    shared_log.add(shared_log.pool[:5])
+    state = statsapp._new_ingest_state(); statsapp.refresh_raid_data(state, settle_seconds=0)
+    snapshot = statsapp.snapshot_ingest_state(state); snapshot.update(generation=1, etag='g1-lider')
+    statsapp.write_shared_snapshot(state, snapshot, START)
+    monkeypatch.setattr(statsapp, 'translations_hash', 'inne-tlumaczenia')
+    assert not statsapp.load_shared_snapshot()
+    assert not statsapp.RAID_INGEST_STATE['all_raids']
@@ -0,0 +1,56 @@
+"""Tablica nazw z pl.json: pierwszeństwo kluczy, przeładowanie pliku i wpływ na wersję indeksu rajdów."""
+import os
+import json
+
+import pytest
+
+import app as statsapp
+
+
+@pytest.fixture
+def translation_file(tmp_path, monkeypatch):
+    """Własny pl.json testu; globalne tłumaczenia modułu wracają po teście."""
+    for name in ('translations', 'translations_hash', 'translations_mtime_ns', 'item_names', '_raid_index_versions'):
+        monkeypatch.setattr(statsapp, name, getattr(statsapp, name))
+    path = tmp_path / 'pl.json'; monkeypatch.setattr(statsapp, 'TRANSLATION_FILE_PATH', str(path))
+    def write(content, mtime_ns):
+        path.write_text(content if isinstance(content, str) else json.dumps(content), encoding='utf-8')
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    write({'abc Name': 'Pełna', 'abc ShortName': 'Krótka', 'def Name': 'Tylko pełna', 'ghi': 'Goły klucz'}, 10**18)
+    assert statsapp.load_translations()
+    return write
+
+
+def test_lookup_precedence(translation_file):
+    assert statsapp.get_item_name('abc') == 'Krótka'
+    assert statsapp.get_item_name('def') == 'Tylko pełna'
+    assert statsapp.get_item_name('ghi') == 'Goły klucz'
+    assert statsapp.get_item_name('bossKilla') == statsapp.ITEM_NAME_FALLBACKS['bossKilla']
+
+
+def test_reload_changes_index_version(translation_file):
+    version = statsapp.compute_raid_index_version()
+    translation_file({'abc ShortName': 'Nowa'}, 2 * 10**18)
+    assert statsapp.reload_translations_if_changed()
+    assert statsapp.get_item_name('abc') == 'Nowa'
+    assert statsapp.compute_raid_index_version() != version
+    assert not statsapp.reload_translations_if_changed()
+
+
+def test_failed_reload_keeps_previous_table(translation_file):
+    version = statsapp.compute_raid_index_version()
+    translation_file('{"abc ShortName": "Ucięty', 2 * 10**18)
+    assert not statsapp.reload_translations_if_changed()
+    assert statsapp.get_item_name('abc') == 'Krótka'
+    assert statsapp.compute_raid_index_version() == version
+    assert not statsapp.reload_translations_if_changed() # Ponowna próba dopiero po kolejnej zmianie pliku
+    translation_file({'abc ShortName': 'Naprawiona'}, 3 * 10**18)
+    assert statsapp.reload_translations_if_changed()
+    assert statsapp.get_item_name('abc') == 'Naprawiona'
+
+
+def test_index_version_includes_fallbacks(translation_file, monkeypatch):
+    version = statsapp.compute_raid_index_version()
+    monkeypatch.setitem(statsapp.ITEM_NAME_FALLBACKS, 'bossKilla', 'Inna nazwa')
+    monkeypatch.setattr(statsapp, '_raid_index_versions', {})
+    assert statsapp.compute_raid_index_version() != version
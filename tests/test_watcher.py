@@ -0,0 +1,44 @@
+"""Watcher w trybie polling: plik jeszcze zapisywany czeka w unsettled_files, a gotowy i usunięty trafia do cache."""
+import os
+import time
+
+import pytest
+
+import app as statsapp
+
+
+@pytest.fixture
+def watcher(raid_logs, monkeypatch):
+    monkeypatch.setattr(statsapp, 'RAID_WATCHER_POLL_INTERVAL', 0.05)
+    monkeypatch.setattr(statsapp, 'RAID_FILE_SETTLE_SECONDS', 1.0)
+    raid_logs.add(raid_logs.pool[:5])
+    statsapp.start_raid_watcher('poll')
+    yield raid_logs
+    statsapp.stop_raid_watcher()
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "watcher nie wprowadził zmiany"
+        time.sleep(0.02)
+
+
+def _cached_files():
+    return set(statsapp.RAID_DATA_CACHE.get('file_signatures', {}))
+
+
+def test_poll_waits_for_file_to_settle(watcher):
+    raid_logs = watcher; filename = raid_logs.pool[5]
+    _wait_for(lambda: _cached_files() == set(raid_logs.pool[:5]))
+    with open(os.path.join(raid_logs.pool_folder, filename), encoding='utf-8') as f: content = f.read()
+    with open(raid_logs.path(filename), 'w', encoding='utf-8') as f: f.write(content[:len(content) // 2]) # mtime = teraz
+    _wait_for(lambda: filename in statsapp.RAID_INGEST_STATE['unsettled_files'])
+    assert filename not in _cached_files() and not statsapp.RAID_DATA_CACHE['errors']
+    with open(raid_logs.path(filename), 'w', encoding='utf-8') as f: f.write(content) # Mod skończył zapis
+    _wait_for(lambda: filename in _cached_files())
+    assert not statsapp.RAID_INGEST_STATE['unsettled_files'] and not statsapp.RAID_DATA_CACHE['errors']
+    assert statsapp.RAID_DATA_CACHE['file_cache'][filename]['filename'] == filename
+    raid_logs.remove([filename])
+    _wait_for(lambda: filename not in _cached_files())
+    assert _cached_files() == set(raid_logs.pool[:5])